@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Compare the asyncio command engine with one thread per command.
+
+Both sides run the same fake adb command (see fake_adb.py) that prints --lines lines; the
+thread model emits once per line, like CommandThread, the engine batches output.
+
+    python benchmarks/bench_async_engine.py --jobs 500 --lines 200
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from utils.async_engine import EVENT_FINISHED, EVENT_OUTPUT, AsyncCommandRunner  # noqa: E402
+
+FAKE_ADB = [sys.executable, os.path.join(HERE, "fake_adb.py")]
+MODES = {"threads": "thread-per-command", "engine": "async engine"}
+
+
+class Sampler:
+
+    def __init__(self):
+        self.peak_threads = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(0.01):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_threads(argv, jobs):
+    emits = [0]
+    lock = threading.Lock()
+
+    def worker():
+        proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        for _ in iter(proc.stdout.readline, b""):
+            with lock:
+                emits[0] += 1
+        proc.wait()
+        with lock:
+            emits[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(jobs)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return emits[0]
+
+
+def run_engine(argv, jobs, max_in_flight):
+    emits = [0]
+    finished = [0]
+    lines = [0]
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def emit(job_id, kind, payload):
+        with lock:
+            emits[0] += 1
+            if kind == EVENT_OUTPUT:
+                lines[0] += len(payload)
+            elif kind == EVENT_FINISHED:
+                finished[0] += 1
+                if finished[0] == jobs:
+                    done.set()
+
+    runner = AsyncCommandRunner(emit, max_in_flight)
+    for _ in range(jobs):
+        runner.submit(argv)
+    done.wait()
+    runner.shutdown()
+    return emits[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=500)
+    parser.add_argument("--max-in-flight", type=int, default=2048)
+    parser.add_argument("--mode", choices=MODES)
+    args = parser.parse_args()
+
+    if args.mode is None:
+        # One process per model so max RSS is measured independently.
+        for mode in MODES:
+            subprocess.run([sys.executable, __file__, "--mode", mode, "--jobs", str(args.jobs),
+                            "--lines", str(args.lines), "--max-in-flight", str(args.max_in_flight)],
+                           check=True)
+        return
+
+    argv = FAKE_ADB + ["-s", "bench", "shell", f"seq 1 {args.lines}"]
+    sampler = Sampler()
+    start = time.perf_counter()
+    if args.mode == "threads":
+        emits = run_threads(argv, args.jobs)
+    else:
+        emits = run_engine(argv, args.jobs, args.max_in_flight)
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{MODES[args.mode]:20s} {args.jobs} jobs x {args.lines} lines: {elapsed:6.2f}s, "
+          f"{emits} emits, peak threads {sampler.peak_threads}, max RSS {rss_mb:.0f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Commands per second per device: one adb shell per command vs a persistent session.
+
+Uses fake_adb.py, whose FAKE_ADB_DELAY stands in for adb's per-connection setup cost.
+
+    python benchmarks/bench_shell_sessions.py --devices 4 --commands 100
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from utils.shell_sessions import ShellSessionManager  # noqa: E402
+
+FAKE_ADB = [sys.executable, os.path.join(HERE, "fake_adb.py")]
+COMMAND = "getprop ro.product.model 2>/dev/null || echo Pixel"
+
+
+def one_shot(device, command):
+    return subprocess.run(FAKE_ADB + ["-s", device, "shell", command],
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT).returncode
+
+
+def bench(devices, commands, run):
+    def worker(device):
+        for _ in range(commands):
+            run(device, COMMAND)
+
+    threads = [threading.Thread(target=worker, args=(f"bench-{i}",)) for i in range(devices)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return commands / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--commands", type=int, default=100)
+    args = parser.parse_args()
+
+    manager = ShellSessionManager(shell_argv=lambda device: FAKE_ADB + ["-s", device, "shell"])
+    try:
+        for name, run in (("adb shell per command", one_shot), ("persistent session", manager.run)):
+            rate = bench(args.devices, args.commands, run)
+            print(f"{name:22s} {args.devices} devices x {args.commands} commands: "
+                  f"{rate:8.1f} commands/s per device")
+    finally:
+        manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Stand-in for the adb binary used by the benchmarks.
+
+Supports ``fake_adb.py -s SERIAL shell [COMMAND...]``: it sleeps for FAKE_ADB_DELAY seconds
+(default 0.03, roughly the cost of a real adb connection setup) and then runs COMMAND with
+/bin/sh, or starts an interactive /bin/sh when no command is given.
+"""
+import os
+import sys
+import time
+
+
+def main(argv):
+    if len(argv) >= 2 and argv[0] == "-s":
+        argv = argv[2:]
+    if not argv or argv[0] != "shell":
+        sys.stderr.write("fake adb: only 'shell' is supported\n")
+        return 1
+    time.sleep(float(os.environ.get("FAKE_ADB_DELAY", "0.03")))
+    sys.stdout.flush()
+    if len(argv) == 1:
+        os.execv("/bin/sh", ["sh"])
+    os.execv("/bin/sh", ["sh", "-c", " ".join(argv[1:])])
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,214 @@
+import os
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+
+from utils.adb_client import AdbClient, AdbConnectionError, AdbError
+
+
+def _recv_exact(conn, n):
+    buf = b""
+    while len(buf) < n:
+        data = conn.recv(n - len(buf))
+        if not data:
+            raise EOFError
+        buf += data
+    return buf
+
+
+def _read_request(conn):
+    return _recv_exact(conn, int(_recv_exact(conn, 4), 16)).decode()
+
+
+def _hex(payload):
+    return b"%04x" % len(payload) + payload
+
+
+class FakeAdbServer:
+    # Speaks the adb smart-socket protocol on a loopback port; `handler(conn, request)`
+    # answers each host request, `services[service](conn)` each request made after a transport.
+
+    def __init__(self):
+        self.requests = []
+        self.pushed = {}
+        self.fail_push = None
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(16)
+        self.port = self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._sock.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        try:
+            request = _read_request(conn)
+            self.requests.append(request)
+            if request == "host:version":
+                conn.sendall(b"OKAY" + _hex(b"0029"))
+            elif request == "host:devices":
+                conn.sendall(b"OKAY" + _hex(b"emulator-5554\tdevice\nR58M123\toffline\n"))
+            elif request == "host:track-devices":
+                conn.sendall(b"OKAY" + _hex(b"emulator-5554\tdevice\n") + _hex(b""))
+            elif request == "host-serial:emulator-5554:features":
+                conn.sendall(b"OKAY" + _hex(b"shell_v2,cmd"))
+            elif request == "host-serial:legacy:features":
+                conn.sendall(b"OKAY" + _hex(b""))
+            elif request == "host:truncated":
+                conn.sendall(b"OKAY" + b"0010abc")
+            elif request.startswith("host:transport:"):
+                serial = request.split(":", 2)[2]
+                if serial not in ("emulator-5554", "legacy"):
+                    conn.sendall(b"FAIL" + _hex(f"device '{serial}' not found".encode()))
+                    return
+                conn.sendall(b"OKAY")
+                self._service(conn, _read_request(conn))
+            else:
+                conn.sendall(b"FAIL" + _hex(b"unknown host service"))
+        except EOFError:
+            pass
+        finally:
+            conn.close()
+
+    def _service(self, conn, service):
+        self.requests.append(service)
+        if service.startswith("shell,v2,raw:"):
+            conn.sendall(b"OKAY")
+            out, err = b"hello\nwor", b"oops\n"
+            conn.sendall(struct.pack("<BI", 1, len(out)) + out)
+            conn.sendall(struct.pack("<BI", 2, len(err)) + err)
+            conn.sendall(struct.pack("<BI", 1, 3) + b"ld\n")
+            conn.sendall(struct.pack("<BI", 3, 1) + b"\x07")
+        elif service.startswith("shell:"):
+            conn.sendall(b"OKAY" + b"legacy output\n")
+        elif service.startswith("exec:"):
+            conn.sendall(b"OKAY" + b"\x00\x01binary\xff")
+        elif service == "sync:":
+            conn.sendall(b"OKAY")
+            self._sync(conn)
+        else:
+            conn.sendall(b"FAIL" + _hex(b"closed"))
+
+    def _sync(self, conn):
+        path, data = None, b""
+        while True:
+            header = _recv_exact(conn, 8)
+            command, length = header[:4], struct.unpack("<I", header[4:])[0]
+            if command == b"SEND":
+                path = _recv_exact(conn, length).decode().rsplit(",", 1)[0]
+            elif command == b"DATA":
+                data += _recv_exact(conn, length)
+            elif command == b"DONE":
+                if self.fail_push:
+                    message = self.fail_push.encode()
+                    conn.sendall(b"FAIL" + struct.pack("<I", len(message)) + message)
+                    return
+                self.pushed[path] = data
+                conn.sendall(b"OKAY" + struct.pack("<I", 0))
+            elif command == b"STAT":
+                _recv_exact(conn, length)
+                conn.sendall(b"STAT" + struct.pack("<III", 0o100644, 1234, 1700000000))
+            elif command == b"QUIT":
+                return
+
+
+class AdbClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeAdbServer()
+        self.client = AdbClient("127.0.0.1", self.server.port, timeout=5)
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_host_queries_are_length_prefixed(self):
+        self.assertEqual(self.client.version(), 0x29)
+        self.assertEqual(self.client.devices(), [("emulator-5554", "device"), ("R58M123", "offline")])
+        self.assertEqual(self.server.requests[:2], ["host:version", "host:devices"])
+
+    def test_fail_reply_raises_with_server_message(self):
+        with self.assertRaises(AdbError) as ctx:
+            self.client._query("host:bogus")
+        self.assertEqual(str(ctx.exception), "unknown host service")
+
+    def test_fail_on_transport_raises(self):
+        with self.assertRaises(AdbError) as ctx:
+            self.client.exec_out("missing", "true")
+        self.assertIn("not found", str(ctx.exception))
+
+    def test_truncated_reply_raises(self):
+        with self.assertRaises(AdbError):
+            self.client._query("host:truncated")
+
+    def test_connection_refused_is_connection_error(self):
+        self.server.close()
+        probe = socket.socket()
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+        probe.close()
+        with self.assertRaises(AdbConnectionError):
+            AdbClient("127.0.0.1", port, timeout=1).devices()
+
+    def test_shell_v2_frames_split_streams_and_exit_code(self):
+        stream = self.client.shell_stream("emulator-5554", "echo hello")
+        data = stream.read_all()
+        self.assertEqual(data, b"hello\nwor" + b"oops\n" + b"ld\n")
+        self.assertEqual(bytes(stream.stderr), b"oops\n")
+        self.assertEqual(stream.returncode, 7)
+        self.assertIn("shell,v2,raw:echo hello", self.server.requests)
+
+    def test_shell_v1_without_feature(self):
+        rc, out = self.client.shell("legacy", "getprop")
+        self.assertEqual((rc, out), (0, b"legacy output\n"))
+        self.assertIn("shell:getprop", self.server.requests)
+
+    def test_exec_out_is_binary_clean(self):
+        self.assertEqual(self.client.exec_out("emulator-5554", "cat f"), b"\x00\x01binary\xff")
+
+    def test_sync_push_and_stat(self):
+        fd, path = tempfile.mkstemp()
+        try:
+            payload = os.urandom(200 * 1024)
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            seen = []
+            sent = self.client.push("emulator-5554", path, "/data/local/tmp/x.apk",
+                                    progress=lambda done, total: seen.append((done, total)))
+            self.assertEqual(sent, len(payload))
+            self.assertEqual(self.server.pushed["/data/local/tmp/x.apk"], payload)
+            self.assertEqual(seen[-1], (len(payload), len(payload)))
+            self.assertEqual(self.client.stat("emulator-5554", "/data/local/tmp/x.apk"),
+                             (0o100644, 1234, 1700000000))
+        finally:
+            os.remove(path)
+
+    def test_sync_push_fail(self):
+        self.server.fail_push = "No space left on device"
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with self.assertRaises(AdbError) as ctx:
+                self.client.push("emulator-5554", path, "/sdcard/x")
+            self.assertEqual(str(ctx.exception), "No space left on device")
+        finally:
+            os.remove(path)
+
+    def test_track_devices_frames(self):
+        stream = self.client.track_devices()
+        self.assertEqual(list(stream), [[("emulator-5554", "device")], []])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from utils.apk_installer import pm_install_staged
+
+
+class FakeShell:
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.commands = []
+
+    def __call__(self, command):
+        self.commands.append(command)
+        return self.replies.pop(0)
+
+
+class PmInstallStagedTest(unittest.TestCase):
+
+    def test_single_apk_failure_with_zero_exit_code(self):
+        shell = FakeShell([(0, "Failure [INSTALL_FAILED_VERSION_DOWNGRADE]\n")])
+        rc, out = pm_install_staged(shell, ["/data/local/tmp/a.apk"], [10], ["-r"])
+        self.assertEqual(rc, 1)
+        self.assertIn("INSTALL_FAILED_VERSION_DOWNGRADE", out)
+        self.assertEqual(shell.commands, ["pm install -r /data/local/tmp/a.apk"])
+
+    def test_single_apk_success(self):
+        shell = FakeShell([(0, "Success\n")])
+        self.assertEqual(pm_install_staged(shell, ["/data/local/tmp/a.apk"], [10], [])[0], 0)
+
+    def test_split_write_failure_abandons_session(self):
+        shell = FakeShell([
+            (0, "Success: created install session [42]\n"),
+            (0, "Success: streamed 10 bytes\n"),
+            (0, "Failure [INSTALL_FAILED_INSUFFICIENT_STORAGE]\n"),
+            (0, "Success\n"),
+        ])
+        rc, _out = pm_install_staged(shell, ["/t/0.apk", "/t/1.apk"], [10, 20], [])
+        self.assertEqual(rc, 1)
+        self.assertEqual(shell.commands[-1], "pm install-abandon 42")
+
+    def test_split_commit_failure(self):
+        shell = FakeShell([
+            (0, "Success: created install session [7]\n"),
+            (0, "Success: streamed\n"),
+            (0, "Success: streamed\n"),
+            (0, "Failure [INSTALL_FAILED_INVALID_APK]\n"),
+        ])
+        rc, _out = pm_install_staged(shell, ["/t/0.apk", "/t/1.apk"], [10, 20], [])
+        self.assertEqual(rc, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
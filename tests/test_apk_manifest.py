@@ -0,0 +1,102 @@
+import os
+import struct
+import tempfile
+import unittest
+import zipfile
+
+from utils.apk_manifest import ApkInfo, ManifestError, parse_binary_manifest, read_apk_info, try_read_apk_info
+
+NO_STRING = 0xFFFFFFFF
+TYPE_STRING, TYPE_INT_DEC = 0x03, 0x10
+ATTR_VERSION_CODE, ATTR_VERSION_NAME, ATTR_VERSION_CODE_MAJOR = 0x0101021B, 0x0101021C, 0x01010576
+
+
+def _string_pool(strings, utf8):
+    data, offsets = b"", []
+    for s in strings:
+        offsets.append(len(data))
+        if utf8:
+            encoded = s.encode("utf-8")
+            data += bytes([len(s), len(encoded)]) + encoded + b"\0"
+        else:
+            data += struct.pack("<H", len(s)) + s.encode("utf-16-le") + b"\0\0"
+    data += b"\0" * (-len(data) % 4)
+    header_size = 28
+    strings_start = header_size + 4 * len(strings)
+    body = struct.pack("<IIIII", len(strings), 0, 0x100 if utf8 else 0, strings_start, 0)
+    body += struct.pack(f"<{len(offsets)}I", *offsets) + data
+    return struct.pack("<HHI", 0x0001, header_size, 8 + len(body)) + body
+
+
+def _resource_map(ids):
+    return struct.pack("<HHI", 0x0180, 8, 8 + 4 * len(ids)) + struct.pack(f"<{len(ids)}I", *ids)
+
+
+def _start_element(name, attrs):
+    body = struct.pack("<II", 1, NO_STRING) + struct.pack("<IIHHHHHH", NO_STRING, name, 20, 20, len(attrs), 0, 0, 0)
+    for attr_name, raw, dtype, value in attrs:
+        body += struct.pack("<IIIHBBI", NO_STRING, attr_name, raw, 8, 0, dtype, value)
+    return struct.pack("<HHI", 0x0102, 16, 8 + len(body)) + body
+
+
+def manifest(attrs, strings, res_ids=(), utf8=False, root="manifest"):
+    strings = list(strings) + [root]
+    chunks = _string_pool(strings, utf8) + _resource_map(list(res_ids)) + _start_element(len(strings) - 1, attrs)
+    return struct.pack("<HHI", 0x0003, 8, 8 + len(chunks)) + chunks
+
+
+def example(utf8=False, root="manifest"):
+    # Attribute names come first so they line up with the resource map, as aapt lays them out.
+    strings = ["versionCode", "versionName", "package", "com.example.app", "1.4.2"]
+    attrs = [(0, NO_STRING, TYPE_INT_DEC, 42), (1, 4, TYPE_STRING, 4), (2, 3, TYPE_STRING, 3)]
+    return manifest(attrs, strings, [ATTR_VERSION_CODE, ATTR_VERSION_NAME], utf8, root)
+
+
+class ParseBinaryManifestTest(unittest.TestCase):
+
+    def test_utf16_and_utf8_string_pools(self):
+        for utf8 in (False, True):
+            with self.subTest(utf8=utf8):
+                self.assertEqual(parse_binary_manifest(example(utf8)), ApkInfo("com.example.app", 42, "1.4.2"))
+
+    def test_version_code_major_and_string_version_code(self):
+        # Obfuscated attribute names: the resource ids still identify them.
+        strings = ["a", "b", "package", "com.example.big", "7"]
+        attrs = [(0, 4, TYPE_STRING, 4), (1, NO_STRING, TYPE_INT_DEC, 3), (2, 3, TYPE_STRING, 3)]
+        info = parse_binary_manifest(manifest(attrs, strings, [ATTR_VERSION_CODE, ATTR_VERSION_CODE_MAJOR]))
+        self.assertEqual(info, ApkInfo("com.example.big", (3 << 32) | 7, ""))
+
+    def test_rejects_non_manifests(self):
+        with self.assertRaises(ManifestError):
+            parse_binary_manifest(b"<?xml version='1.0'?><manifest/>")
+        with self.assertRaises(ManifestError):
+            parse_binary_manifest(example(root="application"))
+        with self.assertRaises(ManifestError):
+            parse_binary_manifest(manifest([(0, NO_STRING, TYPE_INT_DEC, 1)], ["versionCode"], [ATTR_VERSION_CODE]))
+
+
+class ReadApkInfoTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".apk")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def test_reads_manifest_from_apk(self):
+        with zipfile.ZipFile(self.path, "w") as zf:
+            zf.writestr("AndroidManifest.xml", example())
+            zf.writestr("classes.dex", b"dex\n035\0")
+        self.assertEqual(read_apk_info(self.path), ApkInfo("com.example.app", 42, "1.4.2"))
+
+    def test_malformed_apks(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a zip")
+        self.assertIsNone(try_read_apk_info(self.path))
+        with zipfile.ZipFile(self.path, "w") as zf:
+            zf.writestr("AndroidManifest.xml", example()[:60])
+        with self.assertRaises(ManifestError):
+            read_apk_info(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import threading
+import time
+import unittest
+
+from utils.job_scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE, JobScheduler, blocked
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+class JobSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = JobScheduler(max_workers=8, per_host_limit=2)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def test_one_job_per_device_at_a_time(self):
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def job():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        jobs = [self.scheduler.submit(job, "d0") for _ in range(5)]
+        _wait_for(lambda: all(j.done for j in jobs))
+        self.assertEqual(peak[0], 1)
+        self.assertEqual(self.scheduler.stats()["completed"], 5)
+
+    def test_per_host_limit_caps_concurrency(self):
+        self.scheduler.set_host_limit("h", 3)
+        running, peak = {"h": 0, "other": 0}, {"h": 0, "other": 0}
+        lock = threading.Lock()
+
+        def job(host):
+            with lock:
+                running[host] += 1
+                peak[host] = max(peak[host], running[host])
+            time.sleep(0.05)
+            with lock:
+                running[host] -= 1
+
+        jobs = [self.scheduler.submit(lambda: job("h"), f"d{i}", host="h") for i in range(8)]
+        jobs += [self.scheduler.submit(lambda: job("other"), f"o{i}", host="other") for i in range(4)]
+        _wait_for(lambda: all(j.done for j in jobs))
+        self.assertEqual(peak, {"h": 3, "other": 2})
+
+    def test_priority_orders_queued_jobs(self):
+        scheduler = JobScheduler(max_workers=1)
+        self.addCleanup(scheduler.shutdown)
+        gate, order = threading.Event(), []
+        first = scheduler.submit(lambda: gate.wait(5), "busy")
+        _wait_for(lambda: first.started_at is not None)
+        jobs = [scheduler.submit(lambda: order.append("bulk"), "a", priority=PRIORITY_BULK),
+                scheduler.submit(lambda: order.append("normal"), "b"),
+                scheduler.submit(lambda: order.append("interactive"), "c", priority=PRIORITY_INTERACTIVE)]
+        gate.set()
+        _wait_for(lambda: all(j.done for j in jobs))
+        self.assertEqual(order, ["interactive", "normal", "bulk"])
+
+    def test_cancel_pending_skips_jobs_and_calls_on_cancelled(self):
+        gate, ran, cancelled = threading.Event(), [], []
+        first = self.scheduler.submit(lambda: gate.wait(5), "d0")
+        _wait_for(lambda: first.started_at is not None)
+        queued = [self.scheduler.submit(lambda i=i: ran.append(i), "d0", on_cancelled=lambda i=i: cancelled.append(i))
+                  for i in range(3)]
+        other = self.scheduler.submit(lambda: ran.append("other"), "d1")
+        self.assertEqual(self.scheduler.cancel_pending("d0"), 3)
+        gate.set()
+        _wait_for(lambda: all(j.done for j in queued + [other]))
+        self.assertEqual(ran, ["other"])
+        self.assertEqual(sorted(cancelled), [0, 1, 2])
+        self.assertTrue(all(j.started_at is None for j in queued))
+        self.assertEqual(self.scheduler.stats()["cancelled"], 3)
+
+    def test_failed_job_is_counted_and_keeps_error(self):
+        job = self.scheduler.submit(lambda: 1 / 0, "d0")
+        _wait_for(lambda: job.done)
+        self.assertIsInstance(job.error, ZeroDivisionError)
+        self.assertEqual(self.scheduler.stats()["failed"], 1)
+
+    def test_blocked_job_waits_for_host_capacity_before_resuming(self):
+        release_blocked, release_others = threading.Event(), threading.Event()
+        peak = [0]
+
+        def track():
+            peak[0] = max(peak[0], self.scheduler.stats()["per_host"].get("h", 0))
+
+        def blocking_job():
+            with blocked():
+                release_blocked.wait(5)
+            track()
+
+        def other_job():
+            track()
+            release_others.wait(5)
+
+        jobs = [self.scheduler.submit(blocking_job, "d0", host="h")]
+        _wait_for(lambda: self.scheduler.stats()["per_host"].get("h", 0) == 0)
+        jobs += [self.scheduler.submit(other_job, f"d{i}", host="h") for i in (1, 2)]
+        _wait_for(lambda: self.scheduler.stats()["per_host"].get("h", 0) == 2)
+        release_blocked.set()
+        time.sleep(0.2)
+        self.assertFalse(jobs[0].done)
+        self.assertEqual(self.scheduler.stats()["per_host"]["h"], 2)
+        release_others.set()
+        _wait_for(lambda: all(job.done for job in jobs))
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(self.scheduler.stats()["per_host"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
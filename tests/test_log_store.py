@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from utils import log_store
+from utils.log_store import _DATA_SUFFIX, _INDEX_SUFFIX, LogStore, parse_query
+from utils.logcat_binary import PRIORITY_DEBUG, PRIORITY_ERROR, PRIORITY_INFO, LogRecord
+
+T0 = 1700000000.0
+
+
+def records(count, tag="Tag", priority=PRIORITY_INFO, pid=10, start=0, text="message {i}"):
+    return [LogRecord(T0 + start + i, pid, pid + 1, priority, tag, text.format(i=start + i)) for i in range(count)]
+
+
+def messages(results):
+    return [record.message for _device, record in results]
+
+
+class LogStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def open(self, **kwargs):
+        store = LogStore(self.dir, **kwargs)
+        store.BLOCK_RECORDS = 4
+        self.addCleanup(store.close)
+        return store
+
+    def test_query_filters(self):
+        store = self.open()
+        store.append("dev-a", records(5, tag="ActivityManager"))
+        store.append("dev-b", records(3, tag="Camera", priority=PRIORITY_ERROR, pid=20, start=5))
+        store.append("dev-b", records(2, tag="Camera", priority=PRIORITY_DEBUG, pid=20, start=8))
+        self.assertEqual(len(store.query()), 10)
+        self.assertEqual(messages(store.query(devices=["dev-b"], min_priority=PRIORITY_ERROR)),
+                         ["message 5", "message 6", "message 7"])
+        self.assertEqual(len(store.query(tags=["ActivityManager"])), 5)
+        self.assertEqual(len(store.query(pids=[20])), 5)
+        self.assertEqual(messages(store.query(start=T0 + 2, end=T0 + 3)), ["message 2", "message 3"])
+        self.assertEqual(messages(store.query(text="SAGE 9")), ["message 9"])
+        self.assertEqual(len(store.query(limit=4)), 4)
+        self.assertEqual(store.query(devices=["missing"]), [])
+        self.assertEqual(store.devices(), ["dev-a", "dev-b"])
+        self.assertEqual(store.latest_ts(), T0 + 9)
+
+    def test_sealed_segment_reloads_from_index(self):
+        store = self.open()
+        store.append("dev", records(10))
+        store.close()
+        reopened = self.open()
+        self.assertEqual(messages(reopened.query(text="message 7")), ["message 7"])
+        self.assertEqual(reopened.stats()["records"], 10)
+
+    def test_unsealed_segment_is_rebuilt_and_torn_tail_dropped(self):
+        store = self.open()
+        store.append("dev", records(10))
+        store.flush()
+        path = store._active.path
+        with open(path + _DATA_SUFFIX, "ab") as f:
+            f.write(b"\x00torn")
+        # Simulate the app stopping before the active segment was sealed.
+        store._file.close()
+        store._file = store._active = None
+        self.assertFalse(os.path.exists(path + _INDEX_SUFFIX))
+
+        rebuilt = self.open()
+        self.assertEqual(messages(rebuilt.query(devices=["dev"], text="message 3")), ["message 3"])
+        self.assertEqual(rebuilt.stats()["records"], 10)
+        self.assertTrue(os.path.exists(path + _INDEX_SUFFIX))
+        self.assertEqual(os.path.getsize(path + _DATA_SUFFIX), rebuilt.stats()["bytes"])
+
+    def test_trigrams_prune_blocks(self):
+        store = self.open()
+        words = ["alpha", "bravo", "charlie", "delta"]
+        for n, word in enumerate(words):
+            store.append("dev", records(4, start=4 * n, text=word + " {i}"))
+        active = store._query_segments()[0]
+        self.assertEqual(active.candidate_blocks(None, None, 0, None, None, None, "charlie"), 0b0100 | 0b1000)
+        store.close()
+        sealed = self.open()._query_segments()[0]
+        self.assertEqual(sealed.candidate_blocks(None, None, 0, None, None, None, "charlie"), 0b0100)
+        self.assertEqual(sealed.candidate_blocks(None, None, 0, None, None, None, "zulu"), 0)
+        self.assertEqual(messages(self.open().query(text="harli")), [f"charlie {i}" for i in range(8, 12)])
+
+    def test_without_trigrams_text_still_matches(self):
+        store = self.open(trigrams=False)
+        store.append("dev", records(8))
+        self.assertEqual(messages(store.query(text="message 6")), ["message 6"])
+
+    def test_retention_drops_oldest_sealed_segments(self):
+        store = self.open(max_bytes=2000)
+        store.SEGMENT_BYTES = 500
+        for n in range(10):
+            store.append("dev", records(10, start=10 * n))
+        self.assertLessEqual(store.stats()["bytes"], 2000 + store.SEGMENT_BYTES)
+        remaining = messages(store.query())
+        self.assertEqual(remaining[-1], "message 99")
+        self.assertNotIn("message 0", remaining)
+
+    def test_segment_rolls_over_when_tag_ids_run_out(self):
+        with mock.patch.object(log_store, "_MAX_IDS", 4):
+            store = self.open()
+            store.append("dev", [LogRecord(T0 + i, 1, 1, PRIORITY_INFO, f"tag{i}", f"m{i}") for i in range(10)])
+            self.assertGreaterEqual(store.stats()["segments"], 3)
+            self.assertEqual([r.tag for _d, r in store.query()], [f"tag{i}" for i in range(10)])
+            self.assertEqual(messages(store.query(tags=["tag7"])), ["m7"])
+
+
+class ParseQueryTest(unittest.TestCase):
+
+    def test_keys_and_free_text(self):
+        query = parse_query('level:e tag:Camera device:R58 pid:42 "fatal error" crash')
+        self.assertEqual(query, {"min_priority": PRIORITY_ERROR, "tags": {"Camera"}, "devices": {"R58"},
+                                 "pids": {42}, "text": "fatal error crash"})
+
+    def test_time_range_uses_reference_date(self):
+        query = parse_query("from:10:02 to:10:05:30.5", reference=T0)
+        self.assertEqual(query["end"] - query["start"], 210.5)
+
+    def test_invalid_values(self):
+        for text in ("level:Q", "pid:abc", "from:25:99"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_query(text)
+
+
+if __name__ == "__main__":
+    unittest.main()
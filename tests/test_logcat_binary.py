@@ -0,0 +1,89 @@
+import struct
+import time
+import unittest
+
+from utils.logcat_binary import (LOG_ID_EVENTS, PRIORITY_DEBUG, PRIORITY_ERROR, PRIORITY_INFO, BinaryLogParser,
+                                 format_threadtime, parse_records, parse_threadtime, priority_for_level)
+
+
+def entry(version, priority, tag, message, pid=100, tid=101, sec=1700000000, nsec=500000000, lid=0):
+    payload = bytes([priority]) + tag.encode() + b"\0" + message.encode() + b"\0"
+    if version == 1:
+        header = struct.pack("<HHiIII", len(payload), 0, pid, tid, sec, nsec)
+    elif version == 3:
+        header = struct.pack("<HHiIIII", len(payload), 24, pid, tid, sec, nsec, lid)
+    else:
+        header = struct.pack("<HHiIIIII", len(payload), 28, pid, tid, sec, nsec, lid, 1000)
+    return header + payload
+
+
+def fields(records):
+    return [(r.ts, r.pid, r.tid, r.priority, r.tag, r.message) for r in records]
+
+
+class BinaryLogParserTest(unittest.TestCase):
+
+    def test_header_versions(self):
+        for version in (1, 3, 4):
+            with self.subTest(version=version):
+                records = parse_records(entry(version, PRIORITY_INFO, "ActivityManager", "Start proc"))
+                self.assertEqual(fields(records), [(1700000000.5, 100, 101, PRIORITY_INFO, "ActivityManager",
+                                                    "Start proc")])
+                self.assertEqual(records[0].level, "I")
+
+    def test_entries_split_across_reads(self):
+        data = b"".join(entry(v, PRIORITY_DEBUG, f"T{v}", f"m{v}\n") for v in (4, 1, 3, 4))
+        parser = BinaryLogParser()
+        records = []
+        for i in range(0, len(data), 7):
+            records += parser.feed(data[i:i + 7])
+        self.assertEqual([(r.tag, r.message) for r in records], [("T4", "m4"), ("T1", "m1"), ("T3", "m3"),
+                                                                  ("T4", "m4")])
+        self.assertEqual(parser.pending(), 0)
+
+    def test_binary_buffers_and_low_priorities_are_dropped(self):
+        data = (entry(4, PRIORITY_INFO, "evt", "x", lid=LOG_ID_EVENTS)
+                + entry(3, PRIORITY_DEBUG, "dbg", "x")
+                + entry(4, PRIORITY_ERROR, "err", "boom"))
+        self.assertEqual([r.tag for r in parse_records(data, min_priority=PRIORITY_INFO)], ["err"])
+
+    def test_short_v3_binary_entry_at_end_of_read(self):
+        # 24-byte header plus a 2-byte payload: less than a v4 header, but the log id is still there.
+        data = entry(3, PRIORITY_INFO, "Tag", "ok") + struct.pack("<HHiIIII", 2, 24, 1, 1, 0, 0, LOG_ID_EVENTS) + b"\x04\x00"
+        self.assertEqual([r.tag for r in parse_records(data)], ["Tag"])
+
+    def test_resyncs_after_garbage(self):
+        garbage = b"\xff\xfe--------- beginning of main\n"
+        parser = BinaryLogParser()
+        records = parser.feed(garbage + entry(4, PRIORITY_INFO, "Tag", "after"))
+        self.assertEqual([(r.tag, r.message) for r in records], [("Tag", "after")])
+        self.assertEqual(parser.skipped_bytes, len(garbage))
+
+
+class ThreadtimeTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        record = parse_records(entry(4, PRIORITY_ERROR, "AndroidRuntime", "FATAL EXCEPTION",
+                                     sec=int(time.time())))[0]
+        line = format_threadtime(record)
+        parsed = parse_threadtime(line)
+        self.assertEqual((parsed.pid, parsed.tid, parsed.priority, parsed.tag, parsed.message),
+                         (100, 101, PRIORITY_ERROR, "AndroidRuntime", "FATAL EXCEPTION"))
+        self.assertAlmostEqual(parsed.ts, record.ts, places=3)
+
+    def test_multiline_messages_repeat_the_prefix(self):
+        record = parse_records(entry(4, PRIORITY_INFO, "T", "one\ntwo"))[0]
+        self.assertEqual([parse_threadtime(l).message for l in format_threadtime(record).splitlines()],
+                         ["one", "two"])
+
+    def test_non_entry_lines_are_kept(self):
+        record = parse_threadtime("--------- beginning of main\n")
+        self.assertEqual((record.priority, record.message), (0, "--------- beginning of main"))
+
+    def test_priority_for_level(self):
+        self.assertEqual(priority_for_level("e"), PRIORITY_ERROR)
+        self.assertEqual(priority_for_level(""), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
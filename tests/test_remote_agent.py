@@ -0,0 +1,141 @@
+import json
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+from utils import remote_agent
+from utils.remote_agent import (FRAME_CANCEL, FRAME_EXIT, FRAME_OPEN, FrameWriter, _AgentServer, read_frame,
+                                spawn_local_agent, start_agent)
+
+PY = f'"{sys.executable}"'
+
+
+class _Pipe:
+    # Blocking in-memory byte pipe for driving _AgentServer in-process.
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def write(self, data):
+        with self._cond:
+            self._buf += data
+            self._cond.notify_all()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def read(self, n):
+        with self._cond:
+            while not self._buf and not self._closed:
+                self._cond.wait()
+            data = bytes(self._buf[:n])
+            del self._buf[:n]
+            return data
+
+
+class RemoteAgentTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.agent = spawn_local_agent()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.agent.close()
+
+    def test_open_streams_stdout_and_exit_code(self):
+        proc = self.agent.popen(f"{PY} -c \"print('one'); print('two'); raise SystemExit(3)\"")
+        out, _ = proc.communicate(timeout=10)
+        self.assertEqual(out.splitlines(), ["one", "two"])
+        self.assertEqual(proc.returncode, 3)
+
+    def test_stderr_is_merged_into_stdout(self):
+        proc = self.agent.popen(f"{PY} -c \"import sys; sys.stderr.write('boom\\n')\"")
+        out, _ = proc.communicate(timeout=10)
+        self.assertEqual(out, "boom\n")
+        self.assertEqual(proc.returncode, 0)
+
+    def test_concurrent_requests_are_multiplexed(self):
+        procs = [self.agent.popen(f"{PY} -c \"print({i})\"") for i in range(5)]
+        self.assertEqual([p.communicate(timeout=10)[0] for p in procs], [f"{i}\n" for i in range(5)])
+        self.assertEqual(self.agent.in_flight(), 0)
+
+    def test_cancel_kills_running_command(self):
+        proc = self.agent.popen(f"{PY} -c \"import time; print('started', flush=True); time.sleep(60)\"")
+        self.assertEqual(next(iter(proc.stdout)), "started\n")
+        start = time.monotonic()
+        proc.kill()
+        self.assertNotEqual(proc.wait(timeout=10), 0)
+        self.assertLess(time.monotonic() - start, 10)
+
+
+class AgentServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.to_agent, self.from_agent = _Pipe(), _Pipe()
+        self.server = _AgentServer(self.to_agent, self.from_agent)
+        self.client = FrameWriter(self.to_agent)
+
+    def test_cancel_before_process_starts_is_not_dropped(self):
+        started = threading.Event()
+        real_popen = subprocess.Popen
+
+        def slow_popen(*args, **kwargs):
+            started.set()
+            time.sleep(0.3)
+            return real_popen(*args, **kwargs)
+
+        with mock.patch.object(remote_agent.subprocess, "Popen", side_effect=slow_popen):
+            threading.Thread(target=self.server.serve, daemon=True).start()
+            read_frame(self.from_agent)
+            self.client.send(1, FRAME_OPEN, json.dumps({"command": f"{PY} -c \"import time; time.sleep(60)\""}).encode())
+            self.assertTrue(started.wait(5))
+            self.client.send(1, FRAME_CANCEL)
+            exits = []
+            reader = threading.Thread(target=self._read_exit, args=(exits,), daemon=True)
+            reader.start()
+            reader.join(10)
+        self.to_agent.close()
+        self.assertEqual(len(exits), 1, "cancelled request never exited")
+        self.assertEqual(exits[0][0], 1)
+        self.assertNotEqual(exits[0][1], b"\0\0\0\0")
+
+    def _read_exit(self, exits):
+        while True:
+            req_id, kind, payload = read_frame(self.from_agent)
+            if kind == FRAME_EXIT:
+                exits.append((req_id, payload))
+                return
+
+
+class StartAgentTest(unittest.TestCase):
+
+    def test_failed_handshake_reaps_launched_process(self):
+        launched = []
+
+        def launcher(_argv):
+            proc = subprocess.Popen([sys.executable, "-c", "import sys; sys.stdin.read()"],
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            launched.append(proc)
+            return proc
+
+        with mock.patch.object(remote_agent.AgentConnection, "__init__",
+                               side_effect=ConnectionError("remote agent exited during start-up")):
+            with self.assertRaises(ConnectionError):
+                start_agent(launcher, pythons=("python3", "python"))
+        self.assertEqual(len(launched), 2)
+        self.assertTrue(all(proc.poll() is not None for proc in launched))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import threading
+import time
+import unittest
+
+from utils.shell_sessions import ShellSessionManager, is_one_shot
+
+
+class ShellSessionManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = ShellSessionManager(max_sessions=1, shell_argv=lambda device: ["sh"])
+
+    def tearDown(self):
+        self.manager.close_all()
+
+    def test_output_and_exit_code(self):
+        lines = []
+        rc = self.manager.run("a", "echo one; echo two; false", on_line=lines.append, timeout=10)
+        self.assertEqual((rc, lines), (1, ["one", "two"]))
+        self.assertEqual(self.manager.run("a", "(exit 4)", timeout=10), 4)
+
+    def test_busy_session_is_not_evicted_at_capacity(self):
+        lines, result = [], []
+        busy = threading.Thread(target=lambda: result.append(
+            self.manager.run("a", "sleep 0.5; echo done", on_line=lines.append, timeout=10)))
+        busy.start()
+        time.sleep(0.2)
+        self.assertEqual(self.manager.run("b", "echo other", timeout=10), 0)
+        busy.join(10)
+        self.assertEqual((result, lines), ([0], ["done"]))
+        self.assertEqual(list(self.manager._sessions), ["a"])
+
+    def test_free_session_is_evicted_at_capacity(self):
+        self.manager.run("a", "true", timeout=10)
+        self.manager.run("b", "true", timeout=10)
+        self.assertEqual(list(self.manager._sessions), ["b"])
+
+
+class OneShotTest(unittest.TestCase):
+
+    def test_classification(self):
+        self.assertTrue(is_one_shot("getprop ro.product.model"))
+        self.assertTrue(is_one_shot("settings get global adb_enabled | grep 1"))
+        self.assertTrue(is_one_shot("am start -n com.example/.Main"))
+        self.assertFalse(is_one_shot("am instrument -w com.example.test"))
+        self.assertFalse(is_one_shot("logcat -d"))
+        self.assertFalse(is_one_shot("echo 'unterminated"))
+
+
+if __name__ == "__main__":
+    unittest.main()
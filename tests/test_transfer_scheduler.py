@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+
+from utils.job_scheduler import JobScheduler
+from utils.transfer_scheduler import LinkController, TransferScheduler
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+def _period(link, nbytes, saturated=True):
+    # Closes one adjustment period that moved nbytes, without waiting for it in real time.
+    with link._cond:
+        link._period_bytes = nbytes
+        link._saturated = saturated
+        link._adjust_locked(link._period_start + link.ADJUST_PERIOD_S)
+
+
+class LinkControllerTest(unittest.TestCase):
+
+    def test_slot_caps_active_transfers(self):
+        link = LinkController("l", initial=2, max_limit=2)
+        peak = [0]
+
+        def transfer():
+            with link.slot("d"):
+                peak[0] = max(peak[0], link.stats()["active"])
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=transfer) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(link.stats()["active"], 0)
+
+    def test_limit_grows_while_throughput_improves_and_backs_off(self):
+        link = LinkController("l", initial=2, max_limit=4)
+        _period(link, 1000)
+        self.assertEqual(link.limit, 3)
+        _period(link, 1100)
+        self.assertEqual(link.limit, 4)
+        _period(link, 2000)
+        self.assertEqual(link.limit, 4)
+        _period(link, 500)
+        self.assertEqual(link.limit, 3)
+        self.assertEqual(link.rate, 500 / link.ADJUST_PERIOD_S)
+
+    def test_limit_holds_when_link_was_not_saturated(self):
+        link = LinkController("l", initial=2)
+        _period(link, 1000, saturated=False)
+        self.assertEqual(link.limit, 2)
+
+    def test_record_with_free_slots_marks_period_unsaturated(self):
+        link = LinkController("l", initial=2)
+        with link.slot("d") as transfer:
+            transfer.update(100)
+            transfer.update(250)
+            transfer.update(200)
+        self.assertEqual(transfer.sent, 250)
+        self.assertFalse(link._saturated)
+        self.assertEqual(link._device_bytes, {"d": 250})
+
+    def test_waiting_for_a_slot_lends_out_the_job_worker(self):
+        scheduler = JobScheduler(max_workers=1)
+        self.addCleanup(scheduler.shutdown)
+        link = LinkController("l", initial=1, max_limit=1)
+        held, ran = link.slot("outside"), []
+        held.__enter__()
+
+        def transfer_job():
+            with link.slot("d0"):
+                ran.append("transfer")
+
+        transfer = scheduler.submit(transfer_job, "d0")
+        _wait_for(lambda: link.stats()["waiting"] == 1)
+        other = scheduler.submit(lambda: ran.append("other"), "d1")
+        _wait_for(lambda: other.done)
+        self.assertFalse(transfer.done)
+        held.__exit__(None, None, None)
+        _wait_for(lambda: transfer.done)
+        self.assertEqual(ran, ["other", "transfer"])
+
+
+class TransferSchedulerTest(unittest.TestCase):
+
+    def test_links_are_created_once_per_name(self):
+        scheduler = TransferScheduler(initial=3, max_limit=5)
+        link = scheduler.link("host-a")
+        self.assertIs(scheduler.link("host-a"), link)
+        self.assertEqual((link.limit, link.max_limit), (3, 5))
+        self.assertEqual(set(scheduler.stats()), {"host-a"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,31 +1,62 @@
+import html
 import subprocess
 from datetime import datetime
 
-from PyQt6.QtCore import Qt, QProcess
+from PyQt6.QtCore import Qt, QProcess, QTimer, pyqtSignal
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QGridLayout,
-    QFileDialog, QMessageBox, QProgressDialog, QApplication,
+    QFileDialog, QMessageBox, QProgressDialog,
     QTextEdit, QPushButton, QComboBox, QSizePolicy, QInputDialog, QCheckBox,
-    QScrollArea, QLayout
+    QScrollArea, QLayout, QTabWidget
 )
 
+from ui.logcat_view import LogcatView
+from utils.apk_installer import APK_SET_SUFFIXES
+from utils.async_engine import AsyncCommandEngine, EVENT_OUTPUT
 from utils.command_thread import CommandThread
 from utils.data_management import DataManager
 from utils.delete_command_dialog import DeleteCommandDialog
-from utils.device_status import update_device_status_ui, get_device_status
+from utils.device_status import update_device_status_ui
+from utils.device_props import get_device_props, local_fetcher
+from utils.device_tracker import DeviceTracker
+from utils.fleet_status import get_fleet_status, local_poller
+from utils.job_scheduler import get_scheduler, LOCAL_HOST, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from utils.log_sink import segment_pattern
+from utils.log_store import get_log_store
 from utils.log_viewer import run_log_viewer, LogHighlighter
+from utils.logcat_binary import parse_threadtime
+from utils.logcat_filter import LogcatFilter, LogcatFilterError
 from utils.logcat_thread import LogcatThread
+from utils.output_pipeline import OutputPipeline
+from utils.scrcpy_launcher import ScrcpyLauncher, ScrcpyLaunch
+from utils.transfer_progress import FleetProgress, format_bytes
+from utils.transfer_scheduler import get_transfer_scheduler
 
 
 class ControlTab(QWidget):
+    fleet_updated = pyqtSignal(str)
+
     BUTTON_WIDTH = 150
     BUTTON_HEIGHT = 23
+    TRACK_DEVICES = True
+    OUTPUT_MAX_LINES = 50000
+    LOGCAT_MAX_ROWS = 2000000
+    ASYNC_ENGINE = False
+    PROGRESS_REFRESH_MS = 250
+    DEVICE_PROPS_WAIT_S = 2.0
+    LOGCAT_BINARY = True
+    LOG_STORE = False
     
     def __init__(self, devices, commands):
         super().__init__()
         self.selected_log_level = None
+        self.logcat_filter = None
+        self.logcat_filter_text = ""
         self.highlighter = None
         self.output_text = None
+        self.output_pipeline = None
+        self.output_tabs = None
+        self.logcat_view = None
         self.command_combobox = None
         
         self.devices_grid = None
@@ -40,6 +71,15 @@ class ControlTab(QWidget):
         self.device_checkboxes = []
         self.logcat_threads = {}
         self.command_threads = {}
+        self.device_jobs = {}
+        self.command_engine = None
+        self.engine_jobs = {}
+        self.progress_dialog = None
+        self.fleet_progress = FleetProgress()
+        self.last_progress = None
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(self.PROGRESS_REFRESH_MS)
+        self.progress_timer.timeout.connect(self._render_progress)
         self.highlight_text = ""
         self.highlight_positions = []
         self.current_highlight_index = -1
@@ -49,8 +89,19 @@ class ControlTab(QWidget):
         
         self.init_ui()
         
+        self.fleet_status = get_fleet_status()
+        self.fleet_updated.connect(self._on_fleet_updated)
+        self.fleet_status.add_listener(self.fleet_updated.emit)
+        self.fleet_status.register_host(self.scheduler_host(), self.device_poller())
+        
+        self.device_tracker = None
         self.check_device_status()
         
+        if self.TRACK_DEVICES:
+            self.device_tracker = DeviceTracker(self)
+            self.device_tracker.devices_changed.connect(self._on_devices_changed)
+            self.device_tracker.start()
+        
         self.setAcceptDrops(True)
     
     def init_ui(self):
@@ -107,7 +158,7 @@ class ControlTab(QWidget):
         urls = event.mimeData().urls()
         if urls and urls[0].isLocalFile():
             file_path = urls[0].toLocalFile()
-            if file_path.endswith(".apk"):
+            if file_path.lower().endswith((".apk",) + APK_SET_SUFFIXES):
                 if " " in file_path or any(ord(ch) > 127 for ch in file_path):
                     file_path = f'"{file_path}"'
                 current_text = self.command_combobox.currentText()
@@ -154,7 +205,7 @@ class ControlTab(QWidget):
     
     def select_file_for_install(self):
         file_dialog = QFileDialog(self)
-        file_dialog.setNameFilter("APK Files (*.apk);;All Files (*)")
+        file_dialog.setNameFilter("APK Files (*.apk);;APK Sets (*.apks *.xapk *.apkm);;All Files (*)")
         file_dialog.setAcceptMode(QFileDialog.AcceptMode.AcceptOpen)
         if file_dialog.exec():
             file_path = file_dialog.selectedFiles()[0]
@@ -171,7 +222,7 @@ class ControlTab(QWidget):
     
     def execute_apk_command(self, action, parameter, reinstall=False):
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.output_text.append(f"<strong>{action.upper()} COMMAND</strong>: {current_time}\n")
+        self.append_html(f"<strong>{action.upper()} COMMAND</strong>: {current_time}\n")
         
         selected_devices = [checkbox.text() for checkbox in self.device_checkboxes if checkbox.isChecked()]
         if not selected_devices:
@@ -182,31 +233,128 @@ class ControlTab(QWidget):
             thread = CommandThread(device, f"{action} {parameter}", reinstall)
             thread.command_output.connect(self.append_output)
             thread.command_finished.connect(self.command_finished)
-            self.command_threads[device] = thread
-            thread.start()
+            self.submit_device_job(device, thread, PRIORITY_BULK)
+    
+    def scheduler_host(self):
+        return LOCAL_HOST
+    
+    def submit_device_job(self, device, thread, priority):
+        self.command_threads[device] = thread
+        self.device_jobs[device] = get_scheduler().submit(
+            thread.run, device=device, host=self.scheduler_host(), priority=priority,
+            on_cancelled=lambda: thread.command_finished.emit(device, thread.command, False, 0.0),
+        )
     
     def append_output(self, output):
-        self.output_text.append(output)
+        if isinstance(output, list):
+            self.output_pipeline.extend(output)
+        else:
+            self.output_pipeline.append(output)
+    
+    def append_html(self, text):
+        self.output_pipeline.append(text, html=True)
     
     def command_finished(self, device, command, success, elapsed):
         if success:
-            self.output_text.append(f"<strong>COMMAND {command} finished for device: {device}</strong>\n")
+            self.append_html(f"<strong>COMMAND {command} finished for device: {device}</strong>\n")
         else:
-            self.output_text.append(f"<strong>COMMAND {command} failed for device: {device}</strong>\n")
+            self.append_html(f"<strong>COMMAND {command} failed for device: {device}</strong>\n")
         if device in self.command_threads:
             del self.command_threads[device]
+        self.device_jobs.pop(device, None)
     
     def refresh_device_list(self):
         self.check_device_status()
     
     def check_device_status(self):
-        device_status, connected_devices = get_device_status()
-        all_devices = sorted(set(self.devices) | set(connected_devices))
-        self.update_device_grid(all_devices)
+        # Shows what the tracker or the last background poll knows and asks for a fresh poll;
+        # the `adb devices` fallback runs on the fleet poller thread, never here.
+        host = self.scheduler_host()
+        if self.device_tracker:
+            states = self.device_tracker.snapshot()
+        else:
+            states = self.fleet_status.devices(host)
+        self._apply_device_status(states, rebuild=True)
+        self.fleet_status.poll_now(host)
+    
+    def device_poller(self):
+        return local_poller
+    
+    def props_fetcher(self):
+        return local_fetcher
+    
+    def _props_items(self, devices):
+        fetcher = self.props_fetcher()
+        return [(f"{self.scheduler_host()}/{dev}", dev, fetcher) for dev in devices]
+    
+    def warm_device_props(self, device_status):
+        online = [dev for dev, st in device_status.items() if st == "device"]
+        if online:
+            get_device_props().refresh(self._props_items(online))
+    
+    def device_titles(self, devices):
+        # Cached titles only (the serial for unknown devices); stale props refresh in the background.
+        props = get_device_props()
+        items = self._props_items(devices)
+        props.refresh(items)
+        return {dev: props.title(key, dev) for key, dev, _fetcher in items}
+    
+    def fetch_device_title(self, dev, wait_s=None):
+        # Waits up to DEVICE_PROPS_WAIT_S for a device with no cached props: never call on the GUI thread.
+        props = get_device_props()
+        items = self._props_items([dev])
+        key = items[0][0]
+        if not props.get(key):
+            props.fetch_many(items, timeout=self.DEVICE_PROPS_WAIT_S if wait_s is None else wait_s)
+        return props.title(key, dev)
+    
+    def _prepare_scrcpy_title(self, launch: ScrcpyLaunch) -> bool:
+        # Runs on the launcher's prepare thread.
+        if "--window-title" in launch.args:
+            launch.args[launch.args.index("--window-title") + 1] = self.fetch_device_title(launch.device)
+        return True
+    
+    def _on_fleet_updated(self, host):
+        if host != self.scheduler_host() or self.device_tracker or self.fleet_status is None:
+            return
+        self._apply_device_status(self.fleet_status.devices(host))
+    
+    def _grid_devices(self, device_status):
+        return sorted(set(self.devices) | set(device_status))
+    
+    def _apply_device_status(self, device_status, rebuild=False):
+        devices = self._grid_devices(device_status)
+        if rebuild or devices != sorted(cb.text() for cb in self.device_checkboxes):
+            self.update_device_grid(devices)
+        for checkbox in self.device_checkboxes:
+            update_device_status_ui(checkbox, device_status.get(checkbox.text(), "offline"))
+        self.warm_device_props(device_status)
+    
+    def _on_devices_changed(self, added, removed, changed):
+        known = {cb.text() for cb in self.device_checkboxes}
+        if any(dev not in known for dev in added):
+            self.update_device_grid(sorted(known | set(added)))
+            states = self.device_tracker.snapshot() if self.device_tracker else dict(added)
+            for checkbox in self.device_checkboxes:
+                update_device_status_ui(checkbox, states.get(checkbox.text(), "offline"))
+            return
+        
+        updates = dict.fromkeys(removed, "offline")
+        updates.update(added)
+        updates.update(changed)
         for checkbox in self.device_checkboxes:
-            device_name = checkbox.text()
-            status = device_status.get(device_name, "offline")
-            update_device_status_ui(checkbox, status)
+            status = updates.get(checkbox.text())
+            if status is not None:
+                update_device_status_ui(checkbox, status)
+    
+    def stop_device_tracking(self):
+        if self.device_tracker:
+            self.device_tracker.stop()
+            self.device_tracker = None
+        if self.fleet_status is not None:
+            self.fleet_status.remove_listener(self.fleet_updated.emit)
+            self.fleet_status.unregister_host(self.scheduler_host())
+            self.fleet_status = None
     
     def update_device_grid(self, devices=None, remove_device_combo_box=None):
         if devices is None:
@@ -462,9 +610,15 @@ class ControlTab(QWidget):
         
         self.output_text = QTextEdit()
         self.output_text.setReadOnly(True)
-        layout.addWidget(self.output_text)
+        self.logcat_view = LogcatView(self.LOGCAT_MAX_ROWS)
+        
+        self.output_tabs = QTabWidget()
+        self.output_tabs.addTab(self.output_text, "Commands")
+        self.output_tabs.addTab(self.logcat_view, "Logcat")
+        layout.addWidget(self.output_tabs)
         
         self.highlighter = LogHighlighter(self.output_text.document())
+        self.output_pipeline = OutputPipeline(self.output_text, max_lines=self.OUTPUT_MAX_LINES)
         
         search_button = QPushButton("Search")
         search_button.clicked.connect(self.open_log_viewer)
@@ -472,12 +626,21 @@ class ControlTab(QWidget):
         
         return layout
     
+    def current_output_text(self):
+        if self.output_tabs.currentWidget() is self.logcat_view:
+            return self.logcat_view.plain_text()
+        return self.output_pipeline.plain_text()
+    
     def open_log_viewer(self):
-        log_text = self.output_text.toPlainText()
-        run_log_viewer(log_text)
+        log_text = self.current_output_text()
+        queryable = self.LOG_STORE and self.output_tabs.currentWidget() is self.logcat_view
+        run_log_viewer(log_text, store=get_log_store if queryable else None)
     
     def clear_output(self):
-        self.output_text.clear()
+        if self.output_tabs.currentWidget() is self.logcat_view:
+            self.logcat_view.clear()
+            return
+        self.output_pipeline.clear()
         self.highlight_positions = []
         self.current_highlight_index = -1
     
@@ -494,7 +657,7 @@ class ControlTab(QWidget):
                 return
             try:
                 with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(self.output_text.toPlainText())
+                    f.write(self.current_output_text())
                 QMessageBox.information(self, "Success", "Output saved successfully!")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to save output: {e}")
@@ -504,7 +667,7 @@ class ControlTab(QWidget):
     
     def execute_device_command(self, command):
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.output_text.append(f"<strong>{command.upper()} COMMAND</strong>: {current_time}\n")
+        self.append_html(f"<strong>{command.upper()} COMMAND</strong>: {current_time}\n")
         
         self.selected_devices_exec = [cb.text() for cb in self.device_checkboxes if cb.isChecked()]
         if not self.selected_devices_exec:
@@ -526,47 +689,110 @@ class ControlTab(QWidget):
         self.progress_dialog.setRange(0, 0)
         self.progress_dialog.setMinimumWidth(400)
         self.progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progress_dialog.canceled.connect(self.cancel_device_jobs)
         self.progress_dialog.show()
+        self.start_progress_tracking()
+        
+        if self.ASYNC_ENGINE and not self.is_install_cmd_exec:
+            self._submit_to_engine(command)
+            return
         
+        priority = PRIORITY_BULK if self.is_install_cmd_exec else PRIORITY_INTERACTIVE
         for device in self.selected_devices_exec:
             self.device_start_times[device] = datetime.now()
             thread = CommandThread(device, command)
             thread.command_output.connect(self.append_output)
             thread.command_finished.connect(self._device_finished)
             thread.progress_signal.connect(self._update_progress)
-            self.command_threads[device] = thread
-            thread.start()
+            thread.transfer_progress.connect(self.fleet_progress.update)
+            self.submit_device_job(device, thread, priority)
+    
+    def _submit_to_engine(self, command):
+        if self.command_engine is None:
+            self.command_engine = AsyncCommandEngine(parent=self)
+            self.command_engine.event.connect(self._on_engine_event)
+        argv = CommandThread._split_command(command.strip())
+        for device in self.selected_devices_exec:
+            self.device_start_times[device] = datetime.now()
+            job_id = self.command_engine.submit(["adb", "-s", device] + argv)
+            self.engine_jobs[job_id] = (device, command)
+    
+    def _on_engine_event(self, job_id, kind, payload):
+        if kind == EVENT_OUTPUT:
+            self.append_output(payload)
+            return
+        device, command = self.engine_jobs.pop(job_id, (None, None))
+        if device is not None:
+            success, elapsed = payload
+            self._device_finished(device, command, success, elapsed)
+    
+    def start_progress_tracking(self):
+        self.fleet_progress.reset()
+        self.last_progress = None
+        self.progress_timer.start()
+    
+    def cancel_device_jobs(self):
+        self.progress_timer.stop()
+        for job in self.device_jobs.values():
+            job.cancel()
+        for thread in self.command_threads.values():
+            thread.cancel()
+        if self.command_engine:
+            for job_id in list(self.engine_jobs):
+                self.command_engine.cancel(job_id)
     
     def _device_finished(self, device, command, success, elapsed):
         self.completed_devices_exec += 1
-        
-        if self.progress_dialog.minimum() == 0 and self.progress_dialog.maximum() == 0:
-            self.progress_dialog.setRange(0, self.total_devices_exec)
-        
-        self.progress_dialog.setValue(self.completed_devices_exec)
-        self.progress_dialog.setLabelText(
-            f"{'Installing' if self.is_install_cmd_exec else 'Executing'} on {device} "
-            f"({self.completed_devices_exec} of {self.total_devices_exec})"
-        )
+        self.device_jobs.pop(device, None)
+        self.fleet_progress.finish(device)
         
         color = "green" if success else "red"
         status = "SUCCESS" if success else "FAILED"
-        self.output_text.append(
+        self.append_html(
             f"<span style='color:{color};'><strong>{command} {status}</strong> on {device} "
             f"({elapsed:.2f} sec)</span>\n"
         )
         
+        if self.progress_dialog.wasCanceled():
+            return
+        
+        if self.progress_dialog.minimum() == 0 and self.progress_dialog.maximum() == 0:
+            self.progress_dialog.setRange(0, self.total_devices_exec)
+        
+        self.progress_dialog.setValue(self.completed_devices_exec)
+        self.last_progress = (device, None)
+        self._render_progress()
+        
         if self.completed_devices_exec >= self.total_devices_exec:
+            self.progress_timer.stop()
             self.progress_dialog.close()
             QMessageBox.information(self, "Execution Complete",
                                     f"{command} completed for all devices")
     
     def _update_progress(self, device, percent):
-        self.progress_dialog.setLabelText(
+        self.last_progress = (device, percent)
+    
+    def _render_progress(self):
+        if self.progress_dialog is None or self.progress_dialog.wasCanceled() or self.last_progress is None:
+            return
+        device, percent = self.last_progress
+        stats = get_scheduler().stats()
+        lines = [
             f"{'Installing' if self.is_install_cmd_exec else 'Executing'} on {device} "
-            f"({self.completed_devices_exec} of {self.total_devices_exec}) — {percent}%"
-        )
-        QApplication.processEvents()
+            f"({self.completed_devices_exec} of {self.total_devices_exec})"
+            + (f" — {percent}%" if percent is not None else ""),
+            f"queued {stats['queued']}, running {stats['running']}, {stats['throughput']:.1f} jobs/s",
+        ]
+        transfer = self.fleet_progress.summary()
+        if transfer:
+            lines.append(transfer)
+        if self.is_install_cmd_exec:
+            link = get_transfer_scheduler().link(self.scheduler_host()).stats()
+            lines.append(
+                f"link {self.scheduler_host()}: {link['active']}/{link['limit']} concurrent transfers, "
+                f"{format_bytes(link['rate'])}/s"
+            )
+        self.progress_dialog.setLabelText("\n".join(lines))
     
     def select_all_devices(self):
         all_selected = all(cb.isChecked() for cb in self.device_checkboxes)
@@ -594,7 +820,31 @@ class ControlTab(QWidget):
             self.selected_log_level = level[0]
             description = level_descriptions[self.selected_log_level]
             QMessageBox.information(self, "Log Level Description", description)
-            callback()
+            if self.logcat_filter_dialog():
+                callback()
+    
+    def logcat_filter_dialog(self):
+        while True:
+            text, ok = QInputDialog.getText(
+                self, "Logcat Filter",
+                "Optional filter (tags, --package, --pid, -e regex, -b buffers):\n"
+                "e.g. ActivityManager:I MyApp:D --package=com.example.app -e \"crash|anr\" -b main,crash",
+                text=self.logcat_filter_text,
+            )
+            if not ok:
+                return False
+            try:
+                self.logcat_filter = LogcatFilter.parse(text, self.selected_log_level or "V")
+            except LogcatFilterError as e:
+                QMessageBox.warning(self, "Logcat Filter", f"Invalid filter: {e}")
+                continue
+            self.logcat_filter_text = text.strip()
+            return True
+    
+    def logcat_filter_note(self):
+        if self.logcat_filter is None or self.logcat_filter.is_empty():
+            return ""
+        return f" [{html.escape(self.logcat_filter.describe())}]"
     
     def start_logcat(self):
         selected_devices = [checkbox.text() for checkbox in self.device_checkboxes if checkbox.isChecked()]
@@ -604,12 +854,15 @@ class ControlTab(QWidget):
         
         for device in selected_devices:
             if device not in self.logcat_threads:
-                logcat_thread = LogcatThread(device, log_level=self.selected_log_level)
+                logcat_thread = LogcatThread(device, log_level=self.selected_log_level, binary=self.LOGCAT_BINARY,
+                                             log_filter=self.logcat_filter, store_logs=self.LOG_STORE)
                 logcat_thread.logcat_output.connect(self.append_logcat_output)
+                logcat_thread.logcat_records.connect(self.append_logcat_records)
                 logcat_thread.finished.connect(self.logcat_finished)
                 self.logcat_threads[device] = logcat_thread
                 logcat_thread.start()
-                self.output_text.append(f"<strong>Started logcat for device: {device}</strong>\n")
+                self.append_html(f"<strong>Started logcat for device: {device}</strong>{self.logcat_filter_note()}\n")
+                self.output_tabs.setCurrentWidget(self.logcat_view)
     
     def start_logcat_to_file(self):
         selected_devices = [checkbox.text() for checkbox in self.device_checkboxes if checkbox.isChecked()]
@@ -619,8 +872,8 @@ class ControlTab(QWidget):
         
         file_dialog = QFileDialog(self)
         file_dialog.setAcceptMode(QFileDialog.AcceptMode.AcceptSave)
-        file_dialog.setNameFilter("Text Files (*.txt);;All Files (*)")
-        file_dialog.setDefaultSuffix("txt")
+        file_dialog.setNameFilter("Logcat Capture (*.log.gz);;All Files (*)")
+        file_dialog.setDefaultSuffix("log.gz")
         file_dialog.setWindowTitle("Save Logcat Output")
         
         if file_dialog.exec():
@@ -631,11 +884,14 @@ class ControlTab(QWidget):
             for device in selected_devices:
                 if device not in self.logcat_threads:
                     log_level = self.selected_log_level or "V"
-                    logcat_thread = LogcatThread(device, log_level=log_level, output_file=file_path)
+                    logcat_thread = LogcatThread(device, log_level=log_level, output_file=file_path,
+                                                 binary=self.LOGCAT_BINARY, log_filter=self.logcat_filter)
                     self.logcat_threads[device] = logcat_thread
                     logcat_thread.finished.connect(self.logcat_finished)
+                    logcat_thread.capture_error.connect(self.logcat_capture_failed)
                     logcat_thread.start()
-                    self.output_text.append(f"<strong>Started logcat to file for device: {device}</strong>\n")
+                    self.append_html(f"<strong>Started logcat to file for device: {device}</strong>{self.logcat_filter_note()} "
+                                     f"-> {html.escape(segment_pattern(file_path, device))}\n")
     
     def stop_logcat(self):
         selected_devices = [checkbox.text() for checkbox in self.device_checkboxes if checkbox.isChecked()]
@@ -647,40 +903,25 @@ class ControlTab(QWidget):
             thread = self.logcat_threads.get(device)
             if thread:
                 thread.stop()
-                self.output_text.append(f"<strong>Stopped logcat for device: {device}</strong>\n")
+                self.append_html(f"<strong>Stopped logcat for device: {device}</strong>\n")
     
-    def append_logcat_output(self, output):
-        parts = output.split(' ', 4)
-        if len(parts) < 5:
-            self.output_text.append(f"<span style='color:blue;'>{output}</span>")
-            return
-        
-        timestamp_date, timestamp_time, pid, tid, message = parts[:5]
-        
-        timestamp_formatted = f"<span style='font-weight:bold;color:#888888;'>{timestamp_date} {timestamp_time}</span>"
-        pid_tid_formatted = f"<span style='color:#ff6e00;'>{pid} {tid}</span>"
-        
-        color = '#a9b7c6'
-        if ' E ' in message:
-            color = '#cc7832'
-        elif ' W ' in message:
-            color = '#ffc66d'
-        elif ' I ' in message:
-            color = '#6a8759'
-        elif ' D ' in message:
-            color = '#6897bb'
-        
-        self.output_text.append(
-            f"{timestamp_formatted} {pid_tid_formatted} <span style='color:{color};'>{message}</span>")
+    def append_logcat_output(self, device, lines):
+        self.logcat_view.append_records(device, [parse_threadtime(line) for line in lines])
+    
+    def append_logcat_records(self, device, records):
+        self.logcat_view.append_records(device, records)
+    
+    def logcat_capture_failed(self, device, message):
+        self.append_html(f"<span style='color:red;'><strong>Logcat capture stopped for device: {html.escape(device)}"
+                         f"</strong> ({html.escape(message)})</span>\n")
     
     def logcat_finished(self, device):
-        self.output_text.append(f"<strong>Logcat finished for device: {device}</strong>\n")
+        self.append_html(f"<strong>Logcat finished for device: {device}</strong>\n")
         if device in self.logcat_threads:
             del self.logcat_threads[device]
     
     def view_screen_of_selected_devices(self):
-        import shutil, subprocess
-        from PyQt6.QtCore import QTimer
+        import shutil
         
         scrcpy_path = shutil.which("scrcpy")
         if not scrcpy_path:
@@ -692,91 +933,32 @@ class ControlTab(QWidget):
             QMessageBox.information(self, "No device selected", "Выберите хотя бы одно устройство.")
             return
         
-        self._scrcpy_processes = [p for p in getattr(self, "_scrcpy_processes", [])
-                                  if p.state() != QProcess.ProcessState.NotRunning]
-        
-        device_titles: dict[str, str] = {}
-        for dev in selected:
-            title = dev
-            try:
-                res = subprocess.run(
-                    ["adb", "-s", dev, "shell", "getprop", "ro.product.model"],
-                    capture_output=True, text=True, timeout=6
-                )
-                model = (res.stdout or "").strip()
-                if model:
-                    title = f"{model} ({dev})"
-            except Exception:
-                pass
-            device_titles[dev] = title
-        
-        base_x, base_y, step = 40, 40, 40
-        
-        retry_left: dict[str, int] = {dev: 2 for dev in selected}
-        
-        def start_one(idx: int, dev: str, delay_ms: int = 0):
-            
-            def _do_start():
-                p = QProcess(self)
-                p.setProgram(scrcpy_path)
-                args = [
-                    "-s", dev,
-                    "--max-size=800",
-                    "--max-fps=30",
-                    "--video-bit-rate=3M",
-                    "--video-buffer=60",
-                    "--no-clipboard-autosync",
-                    "-V", "error",
-                    "--window-title", device_titles.get(dev, dev),
-                    "--window-x", str(base_x + step * idx),
-                    "--window-y", str(base_y + step * idx),
-                ]
-                p.setArguments(args)
-                
-                def _on_err():
-                    data = bytes(p.readAllStandardError()).decode(errors="ignore")
-                    print(f"[{dev}] scrcpy ERR:", data)
-                
-                def _on_out():
-                    data = bytes(p.readAllStandardOutput()).decode(errors="ignore")
-                    print(f"[{dev}] scrcpy OUT:", data)
-                
-                p.readyReadStandardError.connect(_on_err)
-                p.readyReadStandardOutput.connect(_on_out)
-                
-                def _on_finished(code, status):
-                    nonlocal retry_left
-                    err_tail = bytes(p.readAllStandardError()).decode(errors="ignore")
-                    out_tail = bytes(p.readAllStandardOutput()).decode(errors="ignore")
-                    text = (err_tail + "\n" + out_tail).lower()
-                    
-                    if code != 0 and "connection refused" in text and retry_left.get(dev, 0) > 0:
-                        left = retry_left[dev] - 1
-                        retry_left[dev] = left
-                        backoff = 700 * (2 - left)  # 700ms → 1400ms
-                        print(f"[{dev}] scrcpy retry due to 'Connection refused' (left={left}) in {backoff} ms")
-                        QTimer.singleShot(backoff, lambda: start_one(idx, dev))
-                        return
-                    
-                    print(f"[{dev}] scrcpy finished rc={code}")
-                
-                p.finished.connect(_on_finished)
-                
-                p.start()
-                if p.waitForStarted(3000):
-                    self._scrcpy_processes.append(p)
-                else:
-                    if retry_left.get(dev, 0) > 0:
-                        left = retry_left[dev] - 1
-                        retry_left[dev] = left
-                        print(f"[{dev}] scrcpy failed to start, retry in 1000 ms (left={left})")
-                        QTimer.singleShot(1000, lambda: start_one(idx, dev))
-                    else:
-                        QMessageBox.warning(self, "scrcpy", f"Не удалось запустить scrcpy для {dev}.")
-            
-            if delay_ms > 0:
-                QTimer.singleShot(delay_ms, _do_start)
-            else:
-                _do_start()
+        device_titles = self.device_titles(selected)
+        launcher = self.scrcpy_launcher(scrcpy_path)
         for idx, dev in enumerate(selected):
-            start_one(idx, dev, delay_ms=600 * idx)
+            launcher.submit(ScrcpyLaunch(dev, self.scrcpy_args(dev, device_titles.get(dev, dev), idx),
+                                         prepare=self._prepare_scrcpy_title))
+    
+    def scrcpy_launcher(self, scrcpy_path):
+        launcher = getattr(self, "_scrcpy_launcher", None)
+        if launcher is None or launcher.scrcpy_path != scrcpy_path:
+            launcher = ScrcpyLauncher(scrcpy_path, self)
+            launcher.launch_failed.connect(
+                lambda dev, msg: self.append_output(f"[scrcpy] {dev}: failed to start: {msg}"))
+            self._scrcpy_launcher = launcher
+        return launcher
+    
+    def scrcpy_args(self, dev, title, idx):
+        base_x, base_y, step = 40, 40, 40
+        return [
+            "-s", dev,
+            "--max-size=800",
+            "--max-fps=30",
+            "--video-bit-rate=3M",
+            "--video-buffer=60",
+            "--no-clipboard-autosync",
+            "-V", "info",
+            "--window-title", title,
+            "--window-x", str(base_x + step * idx),
+            "--window-y", str(base_y + step * idx),
+        ]
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+from array import array
+from typing import Dict, List, Sequence
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt6.QtGui import QBrush, QColor, QFontDatabase
+from PyQt6.QtWidgets import QAbstractItemView, QHeaderView, QTableView
+
+from utils.logcat_binary import (LEVEL_CHARS, PRIORITY_DEBUG, PRIORITY_ERROR, PRIORITY_INFO, PRIORITY_WARN,
+                                 LogRecord, format_timestamp)
+
+COLUMNS = ("Time", "Device", "PID", "TID", "Level", "Tag", "Message")
+COL_TIME, COL_DEVICE, COL_PID, COL_TID, COL_LEVEL, COL_TAG, COL_MESSAGE = range(len(COLUMNS))
+
+LEVEL_COLORS = {
+    PRIORITY_DEBUG: "#6897bb",
+    PRIORITY_INFO: "#6a8759",
+    PRIORITY_WARN: "#ffc66d",
+    PRIORITY_ERROR: "#cc7832",
+}
+DEFAULT_COLOR = "#a9b7c6"
+
+
+class LogcatRecordStore:
+    # Column-wise ring buffer: numeric fields live in typed arrays, device and tag
+    # strings are interned, so a retained row costs little more than its message.
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.ts = array("d")
+        self.pid = array("i")
+        self.tid = array("i")
+        self.priority = array("B")
+        self.device = array("H")
+        self.tag: List[str] = []
+        self.message: List[str] = []
+        self.devices: List[str] = []
+        self._device_ids: Dict[str, int] = {}
+        self._tags: Dict[str, str] = {}
+        self._start = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def slot(self, row: int) -> int:
+        return (self._start + row) % self.capacity
+
+    def _device_id(self, device: str) -> int:
+        device_id = self._device_ids.get(device)
+        if device_id is None:
+            device_id = self._device_ids[device] = len(self.devices)
+            self.devices.append(device)
+        return device_id
+
+    def drop_front(self, n: int):
+        n = min(n, self._count)
+        self._start = self.slot(n)
+        self._count -= n
+
+    def extend(self, device: str, records: Sequence[LogRecord]):
+        device_id = self._device_id(device)
+        tags = self._tags
+        for record in records[-self.capacity:]:
+            if self._count == self.capacity:
+                self.drop_front(1)
+            tag = tags.setdefault(record.tag, record.tag)
+            slot = self.slot(self._count)
+            if slot == len(self.message):
+                self.ts.append(record.ts)
+                self.pid.append(record.pid)
+                self.tid.append(record.tid)
+                self.priority.append(record.priority)
+                self.device.append(device_id)
+                self.tag.append(tag)
+                self.message.append(record.message)
+            else:
+                self.ts[slot] = record.ts
+                self.pid[slot] = record.pid
+                self.tid[slot] = record.tid
+                self.priority[slot] = record.priority
+                self.device[slot] = device_id
+                self.tag[slot] = tag
+                self.message[slot] = record.message
+            self._count += 1
+
+    def record(self, row: int) -> LogRecord:
+        slot = self.slot(row)
+        return LogRecord(self.ts[slot], self.pid[slot], self.tid[slot], self.priority[slot],
+                         self.tag[slot], self.message[slot])
+
+    def device_of(self, row: int) -> str:
+        return self.devices[self.device[self.slot(row)]]
+
+    def clear(self):
+        self.__init__(self.capacity)
+
+
+class LogcatTableModel(QAbstractTableModel):
+
+    def __init__(self, capacity: int, parent=None):
+        super().__init__(parent)
+        self.store = LogcatRecordStore(capacity)
+        self._brushes = {p: QBrush(QColor(c)) for p, c in LEVEL_COLORS.items()}
+        self._default_brush = QBrush(QColor(DEFAULT_COLOR))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.store)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        store = self.store
+        slot = store.slot(index.row())
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == COL_MESSAGE:
+                message = store.message[slot]
+                return message.replace("\n", " ⏎ ") if "\n" in message else message
+            if col == COL_TIME:
+                return format_timestamp(store.ts[slot])
+            if col == COL_DEVICE:
+                return store.devices[store.device[slot]]
+            if col == COL_PID:
+                return store.pid[slot]
+            if col == COL_TID:
+                return store.tid[slot]
+            if col == COL_LEVEL:
+                priority = store.priority[slot]
+                return LEVEL_CHARS[priority] if priority < len(LEVEL_CHARS) else "?"
+            if col == COL_TAG:
+                return store.tag[slot]
+        elif role == Qt.ItemDataRole.ForegroundRole:
+            priority = store.priority[slot]
+            if priority > PRIORITY_ERROR:
+                priority = PRIORITY_ERROR
+            return self._brushes.get(priority, self._default_brush)
+        elif role == Qt.ItemDataRole.ToolTipRole and col == COL_MESSAGE:
+            return store.message[slot]
+        return None
+
+    def append_records(self, device: str, records: Sequence[LogRecord]):
+        if not records:
+            return
+        store = self.store
+        records = records[-store.capacity:]
+        overflow = len(store) + len(records) - store.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            store.drop_front(overflow)
+            self.endRemoveRows()
+        first = len(store)
+        self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+        store.extend(device, records)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.store.clear()
+        self.endResetModel()
+
+    def plain_text(self) -> str:
+        store = self.store
+        lines = []
+        for row in range(len(store)):
+            record = store.record(row)
+            lines.append(f"{format_timestamp(record.ts)} {store.device_of(row)} {record.pid:5d} {record.tid:5d} "
+                         f"{record.level} {record.tag}: {record.message}")
+        return "\n".join(lines)
+
+
+class LogcatView(QTableView):
+
+    def __init__(self, capacity: int, parent=None):
+        super().__init__(parent)
+        self.logcat_model = LogcatTableModel(capacity, self)
+        self.setModel(self.logcat_model)
+        self.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.setWordWrap(False)
+        self.setShowGrid(False)
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+
+        # Fixed row heights and non-content column sizing keep painting to the visible rows.
+        vertical = self.verticalHeader()
+        vertical.setVisible(False)
+        vertical.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        vertical.setDefaultSectionSize(self.fontMetrics().height() + 4)
+
+        horizontal = self.horizontalHeader()
+        horizontal.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        horizontal.setStretchLastSection(True)
+        char = self.fontMetrics().horizontalAdvance("0")
+        for col, width in ((COL_TIME, 19), (COL_DEVICE, 18), (COL_PID, 7), (COL_TID, 7), (COL_LEVEL, 6),
+                           (COL_TAG, 24)):
+            self.setColumnWidth(col, char * width)
+
+    def append_records(self, device: str, records: Sequence[LogRecord]):
+        scrollbar = self.verticalScrollBar()
+        follow = scrollbar.value() >= scrollbar.maximum() - 2
+        self.logcat_model.append_records(device, records)
+        if follow:
+            self.scrollToBottom()
+
+    def clear(self):
+        self.logcat_model.clear()
+
+    def plain_text(self) -> str:
+        return self.logcat_model.plain_text()
@@ -10,6 +10,8 @@ from ui.control_tab import ControlTab
 from utils.data_management import DataManager
 from ui.remote_control_tab import RemoteControlTab
 from ui.ssh_connect_dialog import SSHConnectDialog
+from utils.shell_sessions import get_session_manager
+from utils.log_store import close_log_store
 
 APP_ORG = "ADBTools"
 APP_NAME = "ADB Manager"
@@ -41,8 +43,6 @@ class ADBManager(QWidget):
         self.init_menu()
         self.restore_state()
 
-        self.tab_control.refresh_device_list()
-
     def init_ui(self):
         layout = QVBoxLayout(self)
         self.tabs = QTabWidget()
@@ -169,6 +169,12 @@ class ADBManager(QWidget):
         except Exception:
             pass
 
+        self.tab_control.stop_device_tracking()
+        get_session_manager().close_all()
+        for remote_tab in list(self._ssh_tabs):
+            remote_tab.shutdown()
+        close_log_store()
+
         self.save_state()
         super().closeEvent(event)
 
@@ -195,6 +201,8 @@ class ADBManager(QWidget):
         
         w = self.tabs.widget(index)
         self._ssh_tabs.pop(w, None)
+        if isinstance(w, RemoteControlTab):
+            w.shutdown()
         
         self.tabs.removeTab(index)
         if w:
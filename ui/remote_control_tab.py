@@ -1,18 +1,31 @@
 from __future__ import annotations
 
-from PyQt6.QtCore import QTimer, QProcess, QProcessEnvironment
+from PyQt6.QtCore import QTimer, QProcessEnvironment
 from PyQt6.QtWidgets import QMessageBox
 
 from ui.control_tab import ControlTab
-from utils.ssh_exec import ssh_popen
+from utils.ssh_exec import clear_agent, get_agent, set_agent, start_remote_agent
+from utils.ssh_mux import acquire_mux, release_mux
+from utils.adb_forward import REMOTE_ADB_PORT, acquire_adb_forward, release_adb_forward
+from utils.fleet_status import ssh_poller
+from utils.device_props import ssh_fetcher
+from utils.port_pool import get_remote_port_pool
+from utils.ssh_tunnels import acquire_tunnels, release_tunnels
+from utils.scrcpy_launcher import ScrcpyLaunch
 from utils.ssh_command_thread import SSHCommandThread
 from utils.ssh_logcat_thread import SSHLogcatThread
+from utils.log_sink import segment_pattern
+from utils.job_scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE
 
-import socket, shutil
+import html, shutil, threading
 
 class RemoteControlTab(ControlTab):
 
     VERBOSE_SSH = False
+    TRACK_DEVICES = False
+    REMOTE_AGENT = True
+    ADB_FORWARD = True
+    AGENT_CHECK_MS = 30000
     
     def _log(self, text: str):
         if getattr(self, "VERBOSE_SSH", False):
@@ -20,48 +33,83 @@ class RemoteControlTab(ControlTab):
 
     def __init__(self, ssh_cfg: dict, devices: list[str], commands: list[str], parent=None):
         self.ssh_cfg = dict(ssh_cfg or {})
+        self.ssh_mux = acquire_mux(self.ssh_cfg)
+        self.ssh_tunnels = acquire_tunnels(self.ssh_cfg)
+        self.adb_forward = acquire_adb_forward(self.ssh_cfg) if self.ADB_FORWARD else None
+        self.remote_agent = None
+        self._agent_starting = False
+        self._fleet_error = ""
         super().__init__(devices, commands)
 
+        self.agent_timer = QTimer(self)
+        self.agent_timer.setInterval(self.AGENT_CHECK_MS)
+        self.agent_timer.timeout.connect(self.ensure_remote_agent)
+        if self.REMOTE_AGENT:
+            self.agent_timer.start()
+            self.ensure_remote_agent()
+
         QTimer.singleShot(0, self.refresh_device_list)
     
-    def check_device_status(self):
-        import subprocess
-        device_status = {}
-        connected_devices = []
-        try:
-            proc = ssh_popen(self.ssh_cfg, ["adb", "devices"])
-            out, _ = proc.communicate(timeout=8)
-            if proc.returncode != 0:
-                raise RuntimeError(out or "adb devices failed")
-            
-            lines = (out or "").strip().splitlines()
-            if lines and lines[0].lower().startswith("list of devices"):
-                lines = lines[1:]
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                parts = line.split("\t")
-                if len(parts) == 2:
-                    dev, st = parts
-                    device_status[dev] = st
-                    connected_devices.append(dev)
-        except subprocess.TimeoutExpired:
-            self.append_output("[SSH] 'adb devices' timeout; showing empty list.")
-            self.update_device_grid([])
-            return
-        except Exception as e:
-            self.append_output(f"[SSH] devices check failed: {e}")
-            self.update_device_grid([])
+    def ensure_remote_agent(self):
+        if self._agent_starting or get_agent(self.ssh_cfg) is not None:
             return
-        
-        self.update_device_grid(sorted(set(connected_devices)))
-        for checkbox in self.device_checkboxes:
-            dev = checkbox.text()
-            st = device_status.get(dev, "offline")
-            from utils.device_status import update_device_status_ui
-            update_device_status_ui(checkbox, st)
+        self._agent_starting = True
+        threading.Thread(target=self._start_remote_agent, name="remote-agent-start", daemon=True).start()
+
+    def _start_remote_agent(self):
+        try:
+            agent = start_remote_agent(self.ssh_cfg)
+        except (ConnectionError, OSError):
+            # No python on the host (or no shell access): stay on one ssh process per command.
+            pass
+        else:
+            self.remote_agent = agent
+            set_agent(self.ssh_cfg, agent)
+        finally:
+            self._agent_starting = False
+
+    def shutdown(self):
+        self.agent_timer.stop()
+        if self.remote_agent is not None:
+            clear_agent(self.ssh_cfg, self.remote_agent)
+            self.remote_agent.close()
+            self.remote_agent = None
+        for th in list(self.logcat_threads.values()):
+            try:
+                th.stop()
+            except Exception:
+                pass
+        self.logcat_threads.clear()
+        self.cancel_device_jobs()
+        self.stop_device_tracking()
+        if self.adb_forward is not None:
+            release_adb_forward(self.adb_forward)
+            self.adb_forward = None
+        release_tunnels(self.ssh_tunnels)
+        release_mux(self.ssh_mux)
+
+    def scheduler_host(self):
+        return f"ssh:{self.ssh_cfg.get('host')}:{self.ssh_cfg.get('port', 22)}"
     
+    def device_poller(self):
+        return ssh_poller(self.ssh_cfg)
+
+    def props_fetcher(self):
+        return ssh_fetcher(self.ssh_cfg)
+
+    def _grid_devices(self, device_status):
+        return sorted(device_status)
+
+    def _on_fleet_updated(self, host):
+        if host != self.scheduler_host() or self.fleet_status is None:
+            return
+        state = self.fleet_status.host_state(host)
+        error = state.error if state is not None and not state.ok else ""
+        if error and error != self._fleet_error:
+            self.append_output(f"[SSH] devices check failed: {error}")
+        self._fleet_error = error
+        self._apply_device_status(self.fleet_status.devices(host))
+
     def execute_device_command(self, command: str):
         current_text = (command or "").strip()
         if not current_text:
@@ -70,7 +118,7 @@ class RemoteControlTab(ControlTab):
 
         from datetime import datetime
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.output_text.append(f"<strong>{current_text.upper()} COMMAND</strong>: {current_time}\n")
+        self.append_html(f"<strong>{current_text.upper()} COMMAND</strong>: {current_time}\n")
 
         self.selected_devices_exec = [cb.text() for cb in self.device_checkboxes if cb.isChecked()]
         if not self.selected_devices_exec:
@@ -94,16 +142,20 @@ class RemoteControlTab(ControlTab):
         self.progress_dialog.setRange(0, 0)
         self.progress_dialog.setMinimumWidth(400)
         self.progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progress_dialog.canceled.connect(self.cancel_device_jobs)
         self.progress_dialog.show()
+        self.start_progress_tracking()
 
         self.command_threads = {}
+        self.device_jobs = {}
+        priority = PRIORITY_BULK if self.is_install_cmd_exec else PRIORITY_INTERACTIVE
         for device in self.selected_devices_exec:
             th = SSHCommandThread(self.ssh_cfg, device, current_text)
             th.command_output.connect(self.append_output)
             th.command_finished.connect(self._device_finished)
             th.progress_signal.connect(self._update_progress)
-            self.command_threads[device] = th
-            th.start()
+            th.transfer_progress.connect(self.fleet_progress.update)
+            self.submit_device_job(device, th, priority)
 
     def start_logcat(self):
         selected_devices = [cb.text() for cb in self.device_checkboxes if cb.isChecked()]
@@ -112,12 +164,16 @@ class RemoteControlTab(ControlTab):
             return
         for device in selected_devices:
             if device not in self.logcat_threads:
-                logcat_thread = SSHLogcatThread(self.ssh_cfg, device, log_level=(self.selected_log_level or "V"))
+                logcat_thread = SSHLogcatThread(self.ssh_cfg, device, log_level=(self.selected_log_level or "V"),
+                                                binary=self.LOGCAT_BINARY, log_filter=self.logcat_filter,
+                                                store_logs=self.LOG_STORE)
                 logcat_thread.logcat_output.connect(self.append_logcat_output)
+                logcat_thread.logcat_records.connect(self.append_logcat_records)
                 logcat_thread.finished.connect(self.logcat_finished)
                 self.logcat_threads[device] = logcat_thread
                 logcat_thread.start()
-                self.output_text.append(f"<strong>Started logcat (SSH) for device: {device}</strong>\n")
+                self.append_html(f"<strong>Started logcat (SSH) for device: {device}</strong>{self.logcat_filter_note()}\n")
+                self.output_tabs.setCurrentWidget(self.logcat_view)
 
     def start_logcat_to_file(self):
         selected_devices = [cb.text() for cb in self.device_checkboxes if cb.isChecked()]
@@ -128,8 +184,8 @@ class RemoteControlTab(ControlTab):
         from PyQt6.QtWidgets import QFileDialog
         file_dialog = QFileDialog(self)
         file_dialog.setAcceptMode(QFileDialog.AcceptMode.AcceptSave)
-        file_dialog.setNameFilter("Text Files (*.txt);;All Files (*)")
-        file_dialog.setDefaultSuffix("txt")
+        file_dialog.setNameFilter("Logcat Capture (*.log.gz);;All Files (*)")
+        file_dialog.setDefaultSuffix("log.gz")
         file_dialog.setWindowTitle("Save Logcat Output")
         if file_dialog.exec():
             file_path = file_dialog.selectedFiles()[0]
@@ -138,49 +194,16 @@ class RemoteControlTab(ControlTab):
             for device in selected_devices:
                 if device not in self.logcat_threads:
                     log_level = self.selected_log_level or "V"
-                    logcat_thread = SSHLogcatThread(self.ssh_cfg, device, log_level=log_level, output_file=file_path)
+                    logcat_thread = SSHLogcatThread(self.ssh_cfg, device, log_level=log_level, output_file=file_path,
+                                                    binary=self.LOGCAT_BINARY, log_filter=self.logcat_filter)
                     self.logcat_threads[device] = logcat_thread
                     logcat_thread.finished.connect(self.logcat_finished)
+                    logcat_thread.capture_error.connect(self.logcat_capture_failed)
                     logcat_thread.start()
-                    self.output_text.append(f"<strong>Started logcat to file (SSH) for device: {device}</strong>\n")
-    
-    def _find_free_port(self) -> int:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.bind(("127.0.0.1", 0))
-            return s.getsockname()[1]
-    
-    def _start_ssh_tunnel_plink(self, adb_local_port: int, scrcpy_local_port: int, scrcpy_remote_port: int) -> QProcess:
-        host = self.ssh_cfg.get("host")
-        user = self.ssh_cfg.get("user")
-        port = int(self.ssh_cfg.get("port", 22))
-        key = self.ssh_cfg.get("keyfile")
-        pw = self.ssh_cfg.get("password")
-        fpr = self.ssh_cfg.get("hostkey")
-        
-        args = [
-            "-batch", "-ssh", "-N",
-            "-L", f"{adb_local_port}:127.0.0.1:5037",
-            "-L", f"{scrcpy_local_port}:127.0.0.1:{scrcpy_remote_port}",
-            "-P", str(port)
-        ]
-        if key:
-            args += ["-i", key]
-        if pw:
-            args += ["-pw", pw]
-        if fpr:
-            args += ["-hostkey", fpr]
-        args += [f"{user}@{host}"]
-        
-        proc = QProcess(self)
-        proc.setProgram("plink")
-        proc.setArguments(args)
-        proc.start()
-        return proc
+                    self.append_html(f"<strong>Started logcat to file (SSH) for device: {device}</strong>{self.logcat_filter_note()} "
+                                     f"-> {html.escape(segment_pattern(file_path, device))}\n")
     
     def view_screen_of_selected_devices(self):
-        if not shutil.which("plink"):
-            QMessageBox.critical(self, "Plink not found", "Не найден plink в PATH.")
-            return
         scrcpy_path = shutil.which("scrcpy")
         if not scrcpy_path:
             QMessageBox.critical(self, "scrcpy not found", "На локальной машине не найден scrcpy в PATH.")
@@ -191,153 +214,40 @@ class RemoteControlTab(ControlTab):
             QMessageBox.information(self, "No device selected", "Выберите хотя бы одно устройство.")
             return
         
-        adb_local_port = self._find_free_port()
-        ssh_adb = self._start_ssh_tunnel_plink(adb_local_port, self._find_free_port(), 27183)
-        if not ssh_adb.waitForStarted(4000):
-            QMessageBox.critical(self, "SSH tunnel", "Не удалось запустить plink-туннель (ADB).")
-            return
-        
-        env = QProcessEnvironment.systemEnvironment()
-        env.insert("ADB_SERVER_SOCKET", f"tcp:127.0.0.1:{adb_local_port}")
-        
-        self._ssh_scrcpy_processes = [p for p in getattr(self, "_ssh_scrcpy_processes", [])
-                                      if p.state() != QProcess.ProcessState.NotRunning]
-        
-        def _start_scrcpy_tunnel(local_port: int, remote_port: int) -> QProcess:
-            host = self.ssh_cfg.get("host")
-            user = self.ssh_cfg.get("user")
-            port = int(self.ssh_cfg.get("port", 22))
-            pw = self.ssh_cfg.get("password")
-            fpr = self.ssh_cfg.get("hostkey")
-            
-            args = ["-batch", "-ssh", "-N",
-                    "-L", f"{local_port}:127.0.0.1:{remote_port}",
-                    "-P", str(port)]
-            if pw:
-                args += ["-pw", pw]
-            if fpr:
-                args += ["-hostkey", fpr]
-            args += [f"{user}@{host}"]
-            
-            proc = QProcess(self)
-            proc.setProgram("plink")
-            proc.setArguments(args)
-            proc.start()
-            return proc
-        
-        device_titles: dict[str, str] = {}
-        for dev in selected:
-            rc, out, _ = self._plink_exec(["adb", "-s", dev, "shell", "getprop", "ro.product.model"], timeout_ms=6000)
-            model = (out or "").strip()
-            device_titles[dev] = f"{model} ({dev})" if model else dev
-        
-        base_x, base_y, step = 40, 40, 40
-        
-        from PyQt6.QtCore import QTimer
-        scrcpy_tunnels: dict[str, QProcess] = {}
-        retry_left: dict[str, int] = {dev: 2 for dev in selected}
-        
-        def maybe_close_all(_code, _status):
-            if all(p.state() == QProcess.ProcessState.NotRunning for p in self._ssh_scrcpy_processes):
-                for t in scrcpy_tunnels.values():
-                    if t.state() != QProcess.ProcessState.NotRunning:
-                        t.terminate()
-                        t.waitForFinished(1500)
-                ssh_adb.terminate()
-                ssh_adb.waitForFinished(2000)
-        
-        def start_one(idx: int, dev: str, delay_ms: int = 0):
-            def _do_start():
-                remote_port = 27183 + idx
-                local_port = self._find_free_port()
-                
-                tproc = _start_scrcpy_tunnel(local_port, remote_port)
-                if not tproc.waitForStarted(4000):
-                    QMessageBox.warning(self, "SSH tunnel", f"Не удалось запустить scrcpy-туннель для {dev}.")
-                    return
-                scrcpy_tunnels[dev] = tproc
-                
-                p = QProcess(self)
-                p.setProcessEnvironment(env)
-                p.setProgram(scrcpy_path)
-                p.setArguments([
-                    "-s", dev,
-                    "--port", str(remote_port),
-                    "--tunnel-host=127.0.0.1",
-                    "--tunnel-port", str(local_port),
-                    "--max-size=800",
-                    "--max-fps=30",
-                    "--video-bit-rate=3M",
-                    "--video-buffer=60",
-                    "--no-clipboard-autosync",
-                    "-V", "error",
-                    "--window-title", device_titles.get(dev, dev),
-                    "--window-x", str(base_x + step * idx),
-                    "--window-y", str(base_y + step * idx),
-                ])
-                
-                def _on_finished(code, status, d=dev):
-                    tail = (bytes(p.readAllStandardError()).decode(errors="ignore") +
-                            "\n" +
-                            bytes(p.readAllStandardOutput()).decode(errors="ignore")).lower()
-                    if code != 0 and "connection refused" in tail and retry_left.get(d, 0) > 0:
-                        left = retry_left[d] - 1
-                        retry_left[d] = left
-                        backoff = 700 * (2 - left)
-                        QTimer.singleShot(backoff, lambda: start_one(idx, d))
-                        return
-                    
-                    t = scrcpy_tunnels.get(d)
-                    if t and t.state() != QProcess.ProcessState.NotRunning:
-                        t.terminate()
-                        t.waitForFinished(1500)
-                    
-                    maybe_close_all(code, status)
-                
-                p.finished.connect(_on_finished)
-                p.start()
-                if p.waitForStarted(3000):
-                    self._ssh_scrcpy_processes.append(p)
-                else:
-                    if retry_left.get(dev, 0) > 0:
-                        left = retry_left[dev] - 1
-                        retry_left[dev] = left
-                        QTimer.singleShot(1000, lambda: start_one(idx, dev))
-                    else:
-                        QMessageBox.warning(self, "scrcpy (SSH)", f"Не удалось запустить scrcpy для {dev}.")
-            
-            if delay_ms > 0:
-                QTimer.singleShot(delay_ms, _do_start)
-            else:
-                _do_start()
-        
+        device_titles = self.device_titles(selected)
+        launcher = self.scrcpy_launcher(scrcpy_path)
         for idx, dev in enumerate(selected):
-            start_one(idx, dev, delay_ms=600 * idx)
+            launcher.submit(ScrcpyLaunch(
+                dev, self.scrcpy_args(dev, device_titles.get(dev, dev), idx),
+                prepare=self._prepare_scrcpy_tunnel, cleanup=self._release_scrcpy_tunnel,
+            ))
     
-    def _plink_exec(self, remote_argv: list[str], timeout_ms: int = 8000) -> tuple[int, str, str]:
-        host = self.ssh_cfg.get("host")
-        user = self.ssh_cfg.get("user")
-        port = int(self.ssh_cfg.get("port", 22))
-        pw = self.ssh_cfg.get("password")
-        fpr = self.ssh_cfg.get("hostkey")
-        
-        args = ["-batch", "-ssh", "-P", str(port)]
-        if pw:
-            args += ["-pw", pw]
-        if fpr:
-            args += ["-hostkey", fpr]
-        args += [f"{user}@{host}"]
-        args += remote_argv
-        
-        p = QProcess(self)
-        p.setProgram("plink")
-        p.setArguments(args)
-        p.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
-        p.start()
-        if not p.waitForStarted(4000):
-            return 255, "", "plink failed to start"
-        p.waitForFinished(timeout_ms)
-        rc = p.exitCode()
-        out = bytes(p.readAllStandardOutput()).decode(errors="ignore")
-        err = bytes(p.readAllStandardError()).decode(errors="ignore")
-        return rc, out, err
\ No newline at end of file
+    def _prepare_scrcpy_tunnel(self, launch: ScrcpyLaunch) -> bool:
+        # Runs on the launcher's prepare thread; a tunnel that fails to come up fails the launch.
+        self._prepare_scrcpy_title(launch)
+        env = QProcessEnvironment.systemEnvironment()
+        if self.adb_forward is not None and self.adb_forward.active:
+            env.insert("ADB_SERVER_SOCKET", self.adb_forward.server_socket)
+        else:
+            adb_local_port = self.ssh_tunnels.open(REMOTE_ADB_PORT)
+            launch.data["adb_port"] = adb_local_port
+            env.insert("ADB_SERVER_SOCKET", f"tcp:127.0.0.1:{adb_local_port}")
+        launch.env = env
+        base_args = launch.data.setdefault("base_args", list(launch.args))
+        remote_port = get_remote_port_pool(self.scheduler_host()).lease()
+        launch.data["remote_port"] = remote_port
+        local_port = self.ssh_tunnels.open(remote_port)
+        launch.data["local_port"] = local_port
+        launch.args = base_args + [
+            "--port", str(remote_port),
+            "--tunnel-host=127.0.0.1",
+            "--tunnel-port", str(local_port),
+        ]
+        return True
+    
+    def _release_scrcpy_tunnel(self, launch: ScrcpyLaunch):
+        for key in ("local_port", "adb_port"):
+            local_port = launch.data.pop(key, None)
+            if local_port is not None:
+                self.ssh_tunnels.close(local_port)
+        get_remote_port_pool(self.scheduler_host()).release(launch.data.pop("remote_port", None))
@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import codecs
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5037
+
+_SYNC_CHUNK = 64 * 1024
+
+_SHELL_V2_STDOUT = 1
+_SHELL_V2_STDERR = 2
+_SHELL_V2_EXIT = 3
+
+
+class AdbError(RuntimeError):
+    pass
+
+
+class AdbConnectionError(OSError):
+    pass
+
+
+def server_address() -> Tuple[str, int]:
+    spec = (os.environ.get("ADB_SERVER_SOCKET") or "").strip()
+    if spec.startswith("tcp:"):
+        host, _, port = spec[4:].rpartition(":")
+        try:
+            return host or DEFAULT_HOST, int(port)
+        except ValueError:
+            pass
+    try:
+        return DEFAULT_HOST, int(os.environ.get("ANDROID_ADB_SERVER_PORT") or DEFAULT_PORT)
+    except ValueError:
+        return DEFAULT_HOST, DEFAULT_PORT
+
+
+def native_shell_command(argv: List[str]) -> Optional[str]:
+    if len(argv) < 2 or argv[0].lower() != "shell":
+        return None
+    if argv[1].startswith("-"):
+        return None
+    return " ".join(argv[1:])
+
+
+def iter_lines(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+class ShellStream:
+
+    def __init__(self, sock: socket.socket, v2: bool):
+        self._sock = sock
+        self._v2 = v2
+        self.returncode: Optional[int] = None
+        self.stderr = bytearray()
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            if self._v2:
+                yield from self._iter_v2()
+            else:
+                while True:
+                    data = self._sock.recv(_SYNC_CHUNK)
+                    if not data:
+                        break
+                    yield data
+                self.returncode = 0
+        finally:
+            self.close()
+
+    def _iter_v2(self) -> Iterator[bytes]:
+        while True:
+            header = _recv_exact(self._sock, 5, allow_eof=True)
+            if not header:
+                break
+            kind, length = struct.unpack("<BI", header)
+            payload = _recv_exact(self._sock, length) if length else b""
+            if kind == _SHELL_V2_STDOUT:
+                yield payload
+            elif kind == _SHELL_V2_STDERR:
+                self.stderr += payload
+                yield payload
+            elif kind == _SHELL_V2_EXIT:
+                self.returncode = payload[0] if payload else 0
+                break
+        if self.returncode is None:
+            self.returncode = 255
+
+    def read_all(self) -> bytes:
+        return b"".join(self)
+
+    def close(self):
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+
+class DeviceTrackStream:
+
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+
+    def __iter__(self) -> Iterator[List[Tuple[str, str]]]:
+        try:
+            while True:
+                header = _recv_exact(self._sock, 4, allow_eof=True)
+                if not header:
+                    break
+                length = int(header, 16)
+                body = _recv_exact(self._sock, length).decode("utf-8", errors="replace") if length else ""
+                yield _parse_devices(body)
+        finally:
+            self.close()
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+
+def _parse_devices(text: str) -> List[Tuple[str, str]]:
+    result = []
+    for line in text.splitlines():
+        parts = line.strip().split("\t")
+        if len(parts) == 2:
+            result.append((parts[0], parts[1]))
+    return result
+
+
+def _recv_exact(sock: socket.socket, n: int, allow_eof: bool = False) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        data = sock.recv(n - len(buf))
+        if not data:
+            if allow_eof and not buf:
+                return b""
+            raise AdbError("connection closed by adb server")
+        buf += data
+    return bytes(buf)
+
+
+class AdbClient:
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, timeout: float = 10.0):
+        default_host, default_port = server_address()
+        self.host = host or default_host
+        self.port = int(port or default_port)
+        self.timeout = timeout
+        self._features: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as e:
+            raise AdbConnectionError(f"cannot connect to adb server at {self.host}:{self.port}: {e}") from e
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    @staticmethod
+    def _send(sock: socket.socket, request: str):
+        data = request.encode("utf-8")
+        sock.sendall(b"%04x" % len(data) + data)
+
+    @staticmethod
+    def _read_hex_string(sock: socket.socket) -> str:
+        length = int(_recv_exact(sock, 4), 16)
+        return _recv_exact(sock, length).decode("utf-8", errors="replace") if length else ""
+
+    def _read_status(self, sock: socket.socket):
+        status = _recv_exact(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(self._read_hex_string(sock))
+        raise AdbError(f"unexpected adb server response: {status!r}")
+
+    def _query(self, request: str) -> str:
+        with self._connect() as sock:
+            self._send(sock, request)
+            self._read_status(sock)
+            return self._read_hex_string(sock)
+
+    def _open_service(self, serial: str, service: str, timeout: Optional[float] = None) -> socket.socket:
+        sock = self._connect()
+        try:
+            self._send(sock, f"host:transport:{serial}" if serial else "host:transport-any")
+            self._read_status(sock)
+            self._send(sock, service)
+            self._read_status(sock)
+        except BaseException:
+            sock.close()
+            raise
+        sock.settimeout(timeout)
+        return sock
+
+    def version(self) -> int:
+        return int(self._query("host:version"), 16)
+
+    def devices(self) -> List[Tuple[str, str]]:
+        return _parse_devices(self._query("host:devices"))
+
+    def track_devices(self) -> DeviceTrackStream:
+        sock = self._connect()
+        try:
+            self._send(sock, "host:track-devices")
+            self._read_status(sock)
+        except BaseException:
+            sock.close()
+            raise
+        sock.settimeout(None)
+        return DeviceTrackStream(sock)
+
+    def features(self, serial: str) -> Set[str]:
+        with self._lock:
+            cached = self._features.get(serial)
+        if cached is not None:
+            return cached
+        try:
+            feats = set(filter(None, self._query(f"host-serial:{serial}:features").split(",")))
+        except AdbError:
+            return set()
+        with self._lock:
+            self._features[serial] = feats
+        return feats
+
+    def forget(self, serial: str):
+        with self._lock:
+            self._features.pop(serial, None)
+
+    def shell_stream(self, serial: str, command: str, timeout: Optional[float] = None) -> ShellStream:
+        v2 = "shell_v2" in self.features(serial)
+        service = f"shell,v2,raw:{command}" if v2 else f"shell:{command}"
+        return ShellStream(self._open_service(serial, service, timeout), v2)
+
+    def shell(self, serial: str, command: str, timeout: Optional[float] = None) -> Tuple[int, bytes]:
+        stream = self.shell_stream(serial, command, timeout)
+        data = stream.read_all()
+        return stream.returncode or 0, data
+
+    def exec_out(self, serial: str, command: str, timeout: Optional[float] = None) -> bytes:
+        with self._open_service(serial, f"exec:{command}", timeout) as sock:
+            chunks = []
+            while True:
+                data = sock.recv(_SYNC_CHUNK)
+                if not data:
+                    break
+                chunks.append(data)
+            return b"".join(chunks)
+
+    def exec_stream(self, serial: str, command: str, timeout: Optional[float] = None) -> ShellStream:
+        return ShellStream(self._open_service(serial, f"exec:{command}", timeout), False)
+
+    def exec_in(self, serial: str, command: str, local_path: str,
+                progress: Optional[Callable[[int, int], None]] = None) -> bytes:
+        total = os.path.getsize(local_path)
+        sent = 0
+        with self._open_service(serial, f"exec:{command}", None) as sock, open(local_path, "rb") as f:
+            while True:
+                chunk = f.read(_SYNC_CHUNK)
+                if not chunk:
+                    break
+                sock.sendall(chunk)
+                sent += len(chunk)
+                if progress:
+                    progress(sent, total)
+            chunks = []
+            while True:
+                data = sock.recv(_SYNC_CHUNK)
+                if not data:
+                    break
+                chunks.append(data)
+            return b"".join(chunks)
+
+    def _sync_request(self, sock: socket.socket, command: bytes, arg: bytes):
+        sock.sendall(command + struct.pack("<I", len(arg)) + arg)
+
+    def stat(self, serial: str, remote_path: str) -> Tuple[int, int, int]:
+        with self._open_service(serial, "sync:", self.timeout) as sock:
+            self._sync_request(sock, b"STAT", remote_path.encode("utf-8"))
+            reply = _recv_exact(sock, 16)
+            if reply[:4] != b"STAT":
+                raise AdbError(f"unexpected sync response: {reply[:4]!r}")
+            mode, size, mtime = struct.unpack("<III", reply[4:])
+            self._sync_request(sock, b"QUIT", b"")
+            return mode, size, mtime
+
+    def push(self, serial: str, local_path: str, remote_path: str, mode: int = 0o644,
+             progress: Optional[Callable[[int, int], None]] = None) -> int:
+        total = os.path.getsize(local_path)
+        sent = 0
+        with self._open_service(serial, "sync:", None) as sock, open(local_path, "rb") as f:
+            self._sync_request(sock, b"SEND", f"{remote_path},{mode}".encode("utf-8"))
+            while True:
+                chunk = f.read(_SYNC_CHUNK)
+                if not chunk:
+                    break
+                sock.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                sent += len(chunk)
+                if progress:
+                    progress(sent, total)
+            sock.sendall(b"DONE" + struct.pack("<I", int(time.time())))
+            reply = _recv_exact(sock, 8)
+            if reply[:4] == b"FAIL":
+                length = struct.unpack("<I", reply[4:])[0]
+                raise AdbError(_recv_exact(sock, length).decode("utf-8", errors="replace"))
+            if reply[:4] != b"OKAY":
+                raise AdbError(f"unexpected sync response: {reply[:4]!r}")
+            self._sync_request(sock, b"QUIT", b"")
+        return sent
+
+
+_default_client: Optional[AdbClient] = None
+_default_lock = threading.Lock()
+
+
+def get_client() -> AdbClient:
+    global _default_client
+    with _default_lock:
+        if _default_client is None or (_default_client.host, _default_client.port) != server_address():
+            _default_client = AdbClient()
+        return _default_client
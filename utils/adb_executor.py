@@ -1,24 +1,69 @@
+import codecs
 import os
 import shlex
 import shutil
 import sys
 import subprocess
 import time
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 
 import chardet
 from PyQt6.QtCore import QThread, pyqtSignal
 
+from utils.adb_client import AdbConnectionError, AdbError, get_client, native_shell_command
+from utils.process_flags import creationflags_no_window
 
-def _decode_bytes(output_bytes: Optional[bytes]) -> str:
-    if not output_bytes:
-        return ""
-    detected = chardet.detect(output_bytes) or {}
-    enc = detected.get("encoding") or "utf-8"
+
+_READ_CHUNK = 64 * 1024
+_DETECT_SAMPLE = 4096
+
+_encoding_cache: Dict[str, str] = {}
+
+
+def _detect_encoding(sample: bytes) -> str:
     try:
-        return output_bytes.decode(enc, errors="replace")
-    except Exception:
-        return output_bytes.decode("utf-8", errors="replace")
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        if e.reason == "unexpected end of data":
+            return "utf-8"
+    enc = (chardet.detect(sample[:_DETECT_SAMPLE]) or {}).get("encoding") or "utf-8"
+    try:
+        return codecs.lookup(enc).name
+    except LookupError:
+        return "utf-8"
+
+
+class StreamDecoder:
+
+    def __init__(self, cache_key: Optional[str] = None):
+        self.cache_key = cache_key
+        self.encoding: Optional[str] = _encoding_cache.get(cache_key) if cache_key else None
+        self._decoder = None
+        self._pending = ""
+
+    def feed(self, data: bytes) -> List[str]:
+        if self._decoder is None:
+            if self.encoding is None:
+                self.encoding = _detect_encoding(data)
+                if self.cache_key:
+                    _encoding_cache[self.cache_key] = self.encoding
+            self._decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        lines = (self._pending + self._decoder.decode(data)).split("\n")
+        self._pending = lines.pop()
+        return lines
+
+    def finish(self) -> List[str]:
+        tail = self._pending + (self._decoder.decode(b"", final=True) if self._decoder else "")
+        self._pending = ""
+        return [tail] if tail else []
+
+
+def _iter_decoded_lines(chunks: Iterable[bytes], cache_key: Optional[str] = None) -> Iterator[str]:
+    decoder = StreamDecoder(cache_key)
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.finish()
 
 
 def _adb_exists() -> bool:
@@ -32,12 +77,6 @@ def _windows_startupinfo():
     return None
 
 
-def _creationflags_no_window() -> int:
-    if sys.platform.startswith("win"):
-        return getattr(subprocess, "CREATE_NO_WINDOW", 0)
-    return 0
-
-
 def _build_adb_args(device: str, command) -> List[str]:
     if isinstance(command, list):
         cmd_parts = command
@@ -77,6 +116,38 @@ class ADBWorker(QThread):
     def cancel(self):
         self._cancel_requested = True
 
+    def _run_native_shell(self, argv: List[str], start_time: float) -> bool:
+        command = native_shell_command(argv) if self.device else None
+        if command is None:
+            return False
+        try:
+            stream = get_client().shell_stream(self.device, command, timeout=self.timeout)
+        except AdbConnectionError:
+            return False
+        except AdbError as e:
+            self.output_signal.emit(f"ERROR: {e}")
+            self.finished_signal.emit(round(time.time() - start_time, 2), False)
+            return True
+
+        try:
+            for line in _iter_decoded_lines(stream, self.device):
+                if self._cancel_requested:
+                    stream.close()
+                    self.output_signal.emit("Cancelled by user.")
+                    self.finished_signal.emit(round(time.time() - start_time, 2), False)
+                    return True
+                self.output_signal.emit(line.rstrip())
+            success = stream.returncode == 0
+        except TimeoutError:
+            self.output_signal.emit(f"ERROR: Timeout after {self.timeout}s")
+            success = False
+        except (AdbError, OSError) as e:
+            self.output_signal.emit(f"ERROR: {e}")
+            success = False
+
+        self.finished_signal.emit(round(time.time() - start_time, 2), success)
+        return True
+
     def run(self):
         if not _adb_exists():
             self.output_signal.emit("ERROR: adb executable not found in PATH.")
@@ -93,19 +164,19 @@ class ADBWorker(QThread):
                 return
 
         start_time = time.time()
+        if args[1:2] == ["-s"] and self._run_native_shell(args[3:], start_time):
+            return
         try:
             proc = subprocess.Popen(
                 args,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                bufsize=1,
-                universal_newlines=True,
                 startupinfo=_windows_startupinfo(),
-                creationflags=_creationflags_no_window(),
+                creationflags=creationflags_no_window(),
             )
             
-            for raw_line in proc.stdout:
-                line = _decode_bytes(raw_line.encode() if isinstance(raw_line, str) else raw_line)
+            chunks = iter(lambda: proc.stdout.read1(_READ_CHUNK), b"")
+            for line in _iter_decoded_lines(chunks, self.device or None):
                 if self._cancel_requested:
                     proc.kill()
                     self.output_signal.emit("Cancelled by user.")
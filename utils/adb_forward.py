@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from utils.adb_client import DEFAULT_HOST, AdbClient, AdbError
+from utils.port_pool import get_local_port_pool
+from utils.process_flags import creationflags_no_window
+from utils.ssh_exec import forward_command, mux_key, ssh_popen
+
+REMOTE_ADB_PORT = 5037
+
+_ADB_VERSION_RE = re.compile(r"version\s+\d+\.\d+\.(\d+)")
+
+
+_local_adb_version: Optional[int] = None
+_local_adb_lock = threading.Lock()
+
+
+def local_adb_version() -> int:
+    global _local_adb_version
+    with _local_adb_lock:
+        if _local_adb_version is None:
+            _local_adb_version = 0
+            if shutil.which("adb") or os.path.exists(os.path.join(os.getcwd(), "adb.exe")):
+                try:
+                    out = subprocess.run(["adb", "version"], capture_output=True, text=True, timeout=10,
+                                         creationflags=creationflags_no_window()).stdout
+                except (OSError, subprocess.TimeoutExpired):
+                    out = ""
+                m = _ADB_VERSION_RE.search(out or "")
+                if m:
+                    _local_adb_version = int(m.group(1))
+        return _local_adb_version
+
+
+class AdbForward:
+
+    HEALTH_INTERVAL_S = 10.0
+    MAX_BACKOFF_S = 60.0
+
+    def __init__(self, cfg: dict):
+        self.cfg = dict(cfg)
+        self.host = self.cfg["host"]
+        self.local_port: Optional[int] = None
+        self.active = False
+        # A local adb of another version would kill the remote server on first use.
+        self.local_adb = False
+        self._proc: Optional[subprocess.Popen] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def server_socket(self) -> str:
+        return f"tcp:{DEFAULT_HOST}:{self.local_port}"
+
+    def client(self, timeout: float = 10.0) -> AdbClient:
+        return AdbClient(DEFAULT_HOST, self.local_port, timeout=timeout)
+
+    def env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        env["ADB_SERVER_SOCKET"] = self.server_socket
+        return env
+
+    def _server_version(self) -> Optional[int]:
+        if self.local_port is None:
+            return None
+        try:
+            return self.client(timeout=5).version()
+        except (AdbError, OSError, ValueError):
+            return None
+
+    def healthy(self) -> bool:
+        with self._lock:
+            proc = self._proc
+        if proc is None or proc.poll() is not None:
+            return False
+        return self._server_version() is not None
+
+    def _spawn(self):
+        self._kill()
+        if self.local_port is None:
+            self.local_port = get_local_port_pool().lease()
+        try:
+            proc = subprocess.Popen(
+                forward_command(self.cfg, [(self.local_port, DEFAULT_HOST, REMOTE_ADB_PORT)]),
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                creationflags=creationflags_no_window(),
+            )
+        except OSError:
+            return
+        with self._lock:
+            self._proc = proc
+
+    def _kill(self):
+        with self._lock:
+            proc, self._proc = self._proc, None
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    def _set_active(self, active: bool):
+        if active == self.active:
+            return
+        if active:
+            self.local_adb = local_adb_version() == self._server_version()
+        self.active = active
+        if active:
+            _set_forward(self.cfg, self)
+        else:
+            _clear_forward(self.cfg, self)
+
+    def _wait_ready(self, timeout: float) -> bool:
+        waited = 0.0
+        while waited < timeout and not self._stop.is_set():
+            if self.healthy():
+                return True
+            with self._lock:
+                proc = self._proc
+            if proc is None or proc.poll() is not None:
+                return False
+            self._stop.wait(0.3)
+            waited += 0.3
+        return False
+
+    def _monitor(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            if self.healthy():
+                self._set_active(True)
+                backoff = 1.0
+                self._stop.wait(self.HEALTH_INTERVAL_S)
+                continue
+            self._set_active(False)
+            self._spawn()
+            if self._wait_ready(15.0):
+                self._set_active(True)
+                continue
+            # The port may have been taken while we were down; pick a fresh one next time.
+            get_local_port_pool().release(self.local_port)
+            self.local_port = None
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self.MAX_BACKOFF_S)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._monitor, name=f"adb-forward-{self.host}", daemon=True)
+        self._thread.start()
+
+    def reconnect(self):
+        self._set_active(False)
+        self._kill()
+
+    def close(self):
+        self._stop.set()
+        self._set_active(False)
+        self._kill()
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+        get_local_port_pool().release(self.local_port)
+
+
+_active: Dict[str, AdbForward] = {}
+_forwards: Dict[str, Tuple[AdbForward, int]] = {}
+_forwards_lock = threading.Lock()
+
+
+def _set_forward(cfg: dict, forward: AdbForward):
+    with _forwards_lock:
+        _active[mux_key(cfg)] = forward
+
+
+def _clear_forward(cfg: dict, forward: AdbForward):
+    with _forwards_lock:
+        if _active.get(mux_key(cfg)) is forward:
+            del _active[mux_key(cfg)]
+
+
+def active_forward(cfg: dict) -> Optional[AdbForward]:
+    with _forwards_lock:
+        forward = _active.get(mux_key(cfg))
+    return forward if forward is not None and forward.active else None
+
+
+def forwarded_client(cfg: dict) -> Optional[AdbClient]:
+    forward = active_forward(cfg)
+    return forward.client() if forward is not None else None
+
+
+def _local_arg(arg: str) -> str:
+    # Arguments are quoted for the remote shell ('...' from shlex.quote, or "..." around
+    # shell commands); a local exec takes them verbatim, so undo a whole-argument quote.
+    if len(arg) >= 2 and arg[0] in "'\"" and arg[-1] == arg[0]:
+        try:
+            parts = shlex.split(arg)
+        except ValueError:
+            parts = []
+        if len(parts) == 1:
+            return parts[0]
+        return arg.strip('"')
+    return arg
+
+
+def adb_popen(cfg: dict, adb_argv: List[str]):
+    forward = active_forward(cfg)
+    if forward is None or not forward.local_adb:
+        return ssh_popen(cfg, adb_argv)
+    try:
+        return subprocess.Popen(
+            ["adb"] + [_local_arg(a) for a in adb_argv[1:]],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            env=forward.env(),
+            creationflags=creationflags_no_window(),
+        )
+    except OSError:
+        return ssh_popen(cfg, adb_argv)
+
+
+def acquire_adb_forward(cfg: dict) -> AdbForward:
+    key = mux_key(cfg)
+    with _forwards_lock:
+        forward, refs = _forwards.get(key, (None, 0))
+        if forward is None:
+            forward = AdbForward(cfg)
+            forward.start()
+        _forwards[key] = (forward, refs + 1)
+        return forward
+
+
+def release_adb_forward(forward: AdbForward):
+    key = mux_key(forward.cfg)
+    with _forwards_lock:
+        current, refs = _forwards.get(key, (None, 0))
+        if current is not forward:
+            return
+        if refs > 1:
+            _forwards[key] = (forward, refs - 1)
+            return
+        del _forwards[key]
+    forward.close()
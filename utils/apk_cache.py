@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+STAGING_DIR = "/data/local/tmp/adbm_cache"
+DEFAULT_BUDGET_BYTES = 1024 * 1024 * 1024
+
+_HASH_CHUNK = 1024 * 1024
+
+ShellRunner = Callable[[str], Tuple[int, str]]
+PushRunner = Callable[[str, str], bool]
+
+_hash_memo: Dict[str, Tuple[int, int, str]] = {}
+_hash_lock = threading.Lock()
+
+
+def file_sha256(path: str) -> str:
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    with _hash_lock:
+        memo = _hash_memo.get(path)
+    if memo and memo[0] == st.st_mtime_ns and memo[1] == st.st_size:
+        return memo[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_HASH_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _hash_lock:
+        _hash_memo[path] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+
+def staged_path(digest: str) -> str:
+    return f"{STAGING_DIR}/{digest}.apk"
+
+
+class _Entry:
+    __slots__ = ("size", "last_used", "verified")
+
+    def __init__(self, size: int, last_used: float, verified: bool):
+        self.size = size
+        self.last_used = last_used
+        self.verified = verified
+
+
+class ApkStagingCache:
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = max(0, int(budget_bytes))
+        self._devices: Dict[str, Dict[str, _Entry]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _device_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _inventory(self, key: str, shell: ShellRunner) -> Dict[str, _Entry]:
+        entries = self._devices.get(key)
+        if entries is not None:
+            return entries
+        entries = {}
+        _rc, out = shell(f"stat -c %Y:%s:%n {STAGING_DIR}/*.apk 2>/dev/null")
+        for line in out.splitlines():
+            parts = line.strip().split(":", 2)
+            if len(parts) != 3 or not parts[2].startswith(STAGING_DIR + "/"):
+                continue
+            name = parts[2].rsplit("/", 1)[-1]
+            digest = name[:-4] if name.endswith(".apk") else ""
+            if len(digest) != 64:
+                continue
+            try:
+                entries[digest] = _Entry(int(parts[1]), float(parts[0]), verified=False)
+            except ValueError:
+                continue
+        self._devices[key] = entries
+        return entries
+
+    def _is_present(self, digest: str, entry: _Entry, size: int, shell: ShellRunner) -> bool:
+        remote = staged_path(digest)
+        if entry.verified:
+            _rc, out = shell(f"touch -c {remote}; stat -c %s {remote} 2>/dev/null")
+            return out.strip() == str(size)
+        _rc, out = shell(f"touch -c {remote}; sha256sum {remote} 2>/dev/null")
+        fields = out.split()
+        return bool(fields) and fields[0].lower() == digest
+
+    def _evict(self, entries: Dict[str, _Entry], incoming: int, shell: ShellRunner):
+        total = sum(e.size for e in entries.values())
+        victims: List[str] = []
+        for digest, entry in sorted(entries.items(), key=lambda kv: kv[1].last_used):
+            if total + incoming <= self.budget_bytes:
+                break
+            victims.append(digest)
+            total -= entry.size
+        if victims:
+            shell("rm -f " + " ".join(staged_path(d) for d in victims))
+            for digest in victims:
+                entries.pop(digest, None)
+
+    def _lookup_locked(self, key: str, digest: str, size: int, shell: ShellRunner) -> bool:
+        entries = self._inventory(key, shell)
+        entry = entries.get(digest)
+        if entry is None:
+            return False
+        if entry.size == size and self._is_present(digest, entry, size, shell):
+            entry.verified = True
+            entry.last_used = time.time()
+            return True
+        entries.pop(digest, None)
+        return False
+
+    def lookup(self, key: str, local_path: str, shell: ShellRunner) -> Optional[str]:
+        digest = file_sha256(local_path)
+        with self._device_lock(key):
+            if self._lookup_locked(key, digest, os.path.getsize(local_path), shell):
+                return staged_path(digest)
+        return None
+
+    def stage(self, key: str, local_path: str, shell: ShellRunner, push: PushRunner,
+              source: Optional[str] = None) -> Tuple[str, bool]:
+        digest = file_sha256(local_path)
+        size = os.path.getsize(local_path)
+        remote = staged_path(digest)
+        with self._device_lock(key):
+            if self._lookup_locked(key, digest, size, shell):
+                return remote, False
+
+            entries = self._devices[key]
+            self._evict(entries, size, shell)
+            shell(f"mkdir -p {STAGING_DIR}")
+            try:
+                ok = push(source or local_path, remote)
+            except BaseException:
+                shell(f"rm -f {remote}")
+                raise
+            if not ok:
+                shell(f"rm -f {remote}")
+                raise RuntimeError(f"push of {os.path.basename(local_path)} failed")
+            entries[digest] = _Entry(size, time.time(), verified=True)
+            return remote, True
+
+    def forget(self, key: str, digest: Optional[str] = None):
+        with self._device_lock(key):
+            if digest is None:
+                self._devices.pop(key, None)
+            else:
+                self._devices.get(key, {}).pop(digest, None)
+
+
+_cache: Optional[ApkStagingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_staging_cache() -> ApkStagingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ApkStagingCache()
+        return _cache
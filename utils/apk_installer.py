@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from typing import Callable, List, Optional, Tuple
+
+from utils.adb_client import AdbClient, AdbError
+from utils.apk_cache import file_sha256
+from utils.transfer_scheduler import get_transfer_scheduler
+
+ShellRunner = Callable[[str], Tuple[int, str]]
+Progress = Callable[[int, int], None]
+
+APK_SET_SUFFIXES = (".apks", ".xapk", ".apkm")
+
+_SESSION_RE = re.compile(r"\[(\d+)\]")
+
+_extract_lock = threading.Lock()
+
+
+def _extract_apk_set(archive: str) -> List[str]:
+    target = os.path.join(tempfile.gettempdir(), "adbm_apksets", file_sha256(archive))
+    with _extract_lock:
+        if not os.path.isdir(target):
+            with zipfile.ZipFile(archive) as zf:
+                names = [n for n in zf.namelist() if n.lower().endswith(".apk")]
+                universal = [n for n in names if os.path.basename(n) == "universal.apk"]
+                if universal:
+                    names = universal
+                else:
+                    splits = [n for n in names if n.startswith("splits/")]
+                    names = splits or [n for n in names if not n.startswith("standalones/")]
+                tmp = target + ".part"
+                os.makedirs(tmp, exist_ok=True)
+                for i, name in enumerate(names):
+                    with zf.open(name) as src, open(os.path.join(tmp, f"{i:03d}_{os.path.basename(name)}"), "wb") as dst:
+                        while True:
+                            chunk = src.read(1024 * 1024)
+                            if not chunk:
+                                break
+                            dst.write(chunk)
+                os.replace(tmp, target)
+    return sorted(os.path.join(target, n) for n in os.listdir(target) if n.lower().endswith(".apk"))
+
+
+def resolve_apk_set(paths: List[str]) -> List[str]:
+    apks: List[str] = []
+    for path in paths:
+        path = os.path.normpath(os.path.expanduser(path))
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"APK not found: {path}")
+        if os.path.isdir(path):
+            apks.extend(sorted(os.path.join(path, n) for n in os.listdir(path) if n.lower().endswith(".apk")))
+        elif path.lower().endswith(APK_SET_SUFFIXES):
+            apks.extend(_extract_apk_set(path))
+        else:
+            apks.append(path)
+    if not apks:
+        raise FileNotFoundError("no APK files found in " + ", ".join(paths))
+    return apks
+
+
+def supports_streaming(client: AdbClient, serial: str) -> bool:
+    return "cmd" in client.features(serial)
+
+
+def push_slot(link: str, device: str):
+    return get_transfer_scheduler().slot(link, device)
+
+
+def _session_id(output: str) -> str:
+    m = _SESSION_RE.search(output)
+    if not m:
+        raise RuntimeError(f"cannot create install session: {output.strip()}")
+    return m.group(1)
+
+
+def split_progress(apks: List[str], progress: Optional[Progress]):
+    sizes = [os.path.getsize(a) for a in apks]
+    total = sum(sizes)
+    offsets = [sum(sizes[:i]) for i in range(len(sizes))]
+
+    def _for(index: int) -> Optional[Progress]:
+        if progress is None:
+            return None
+        return lambda sent, _size: progress(offsets[index] + sent, total)
+    return sizes, _for
+
+
+def stream_install(client: AdbClient, serial: str, apks: List[str], flags: List[str],
+                   progress: Optional[Progress] = None) -> Tuple[int, str]:
+    opts = " ".join(flags)
+    sizes, progress_for = split_progress(apks, progress)
+    if len(apks) == 1:
+        out = client.exec_in(serial, f"cmd package install {opts} -S {sizes[0]}", apks[0],
+                             progress_for(0)).decode("utf-8", errors="replace")
+        return (0 if "Success" in out else 1), out
+
+    created = client.exec_out(serial, f"cmd package install-create {opts}").decode("utf-8", errors="replace")
+    session = _session_id(created)
+    try:
+        for i, apk in enumerate(apks):
+            out = client.exec_in(serial, f"cmd package install-write -S {sizes[i]} {session} {i}_split.apk -",
+                                 apk, progress_for(i)).decode("utf-8", errors="replace")
+            if "Success" not in out:
+                raise RuntimeError(out.strip() or f"install-write failed for {os.path.basename(apk)}")
+        out = client.exec_out(serial, f"cmd package install-commit {session}").decode("utf-8", errors="replace")
+    except BaseException:
+        try:
+            client.exec_out(serial, f"cmd package install-abandon {session}")
+        except (AdbError, OSError):
+            pass
+        raise
+    return (0 if "Success" in out else 1), out
+
+
+def pm_install_staged(shell: ShellRunner, remotes: List[str], sizes: List[int], flags: List[str]) -> Tuple[int, str]:
+    opts = " ".join(flags)
+    if len(remotes) == 1:
+        # Without shell_v2 the exit code is always 0; pm's own verdict is in the output.
+        rc, out = shell(f"pm install {opts} {remotes[0]}")
+        return (rc if "Success" in out else 1), out
+
+    _rc, created = shell(f"pm install-create {opts}")
+    session = _session_id(created)
+    for i, remote in enumerate(remotes):
+        rc, out = shell(f"pm install-write -S {sizes[i]} {session} {i}_split.apk {remote}")
+        if rc != 0 or "Success" not in out:
+            shell(f"pm install-abandon {session}")
+            return 1, out
+    rc, out = shell(f"pm install-commit {session}")
+    return (rc if "Success" in out else 1), out
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import os
 import sys
 import subprocess
-from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
+
+from utils.adb_client import AdbConnectionError, AdbError, get_client, native_shell_command
+from utils.apk_cache import get_staging_cache
+from utils.apk_installer import pm_install_staged, push_slot, resolve_apk_set
+from utils.job_scheduler import LOCAL_HOST
+from utils.process_flags import creationflags_no_window
 
 
 def _startupinfo():
@@ -14,20 +20,39 @@ def _startupinfo():
     return None
 
 
-def _creationflags_no_window() -> int:
-    if sys.platform.startswith("win"):
-        return getattr(subprocess, "CREATE_NO_WINDOW", 0)
-    return 0
+def _run_native(args: list[str], timeout: float) -> Optional[Tuple[int, str, str]]:
+    if len(args) < 4 or args[0] != "adb" or args[1] != "-s":
+        return None
+    device, rest = args[2], args[3:]
+    client = get_client()
+    try:
+        if rest[0] == "push" and len(rest) == 3:
+            sent = client.push(device, rest[1], rest[2])
+            return 0, f"{rest[1]}: 1 file pushed ({sent} bytes)", ""
+        command = native_shell_command(rest)
+        if command is None:
+            return None
+        rc, out_b = client.shell(device, command, timeout=timeout)
+        return rc, out_b.decode("utf-8", errors="replace"), ""
+    except AdbConnectionError:
+        return None
+    except TimeoutError:
+        return 1, "", f"adb: error: timeout after {timeout}s"
+    except (AdbError, OSError) as e:
+        return 1, "", f"adb: error: {e}"
 
 
 def _run(args: list[str], timeout: float = 600.0) -> Tuple[int, str, str]:
+    native = _run_native(args, timeout)
+    if native is not None:
+        return native
     proc = subprocess.Popen(
         args,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=False,
         startupinfo=_startupinfo(),
-        creationflags=_creationflags_no_window(),
+        creationflags=creationflags_no_window(),
     )
     try:
         out_b, err_b = proc.communicate(timeout=timeout)
@@ -44,28 +69,29 @@ class APKManager:
     @staticmethod
     def install(device: str, apk_path: str, reinstall: bool = False) -> str:
         device = (device or "").strip()
-        path = Path(apk_path).expanduser()
-        if not path.exists():
-            raise FileNotFoundError(f"APK not found: {path}")
+        apks = resolve_apk_set([apk_path])
 
-        remote = f"/data/local/tmp/{path.name}"
-        rc_p, out_p, err_p = _run(["adb", "-s", device, "push", str(path), remote])
-        if rc_p != 0:
-            raise RuntimeError(f"adb push failed:\n{out_p}\n{err_p}")
+        def _shell(command: str) -> Tuple[int, str]:
+            rc, out, _err = _run(["adb", "-s", device, "shell", command])
+            return rc, out
 
-        pm_args = ["adb", "-s", device, "shell", "pm", "install"]
-        if reinstall:
-            pm_args.append("-r")
-        pm_args.append(remote)
+        def _push(local: str, remote_path: str) -> bool:
+            rc_p, out_p, err_p = _run(["adb", "-s", device, "push", local, remote_path])
+            if rc_p != 0:
+                raise RuntimeError(f"adb push failed:\n{out_p}\n{err_p}")
+            return True
 
-        rc_i, out_i, err_i = _run(pm_args)
+        with push_slot(LOCAL_HOST, device) as transfer:
+            remotes = [get_staging_cache().stage(device, apk, _shell, _push)[0] for apk in apks]
+            transfer.update(sum(os.path.getsize(apk) for apk in apks))
 
-        _run(["adb", "-s", device, "shell", "rm", "-f", remote])
+        sizes = [os.path.getsize(apk) for apk in apks]
+        rc_i, out_i = pm_install_staged(_shell, remotes, sizes, ["-r"] if reinstall else [])
 
         if rc_i != 0:
-            raise RuntimeError(f"pm install failed:\n{out_i}\n{err_i}")
+            raise RuntimeError(f"pm install failed:\n{out_i}")
 
-        return out_i or err_i or "Install OK (via push + pm)"
+        return out_i or "Install OK (via push + pm)"
 
     @staticmethod
     def uninstall(device: str, package_name: str, keep_data: bool = False) -> str:
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import struct
+import threading
+import zipfile
+from typing import Dict, List, NamedTuple, Optional
+
+from utils.apk_cache import file_sha256
+
+_RES_STRING_POOL_TYPE = 0x0001
+_RES_XML_TYPE = 0x0003
+_RES_XML_START_ELEMENT_TYPE = 0x0102
+_RES_XML_RESOURCE_MAP_TYPE = 0x0180
+
+_UTF8_FLAG = 0x100
+
+_TYPE_STRING = 0x03
+_TYPE_INT_DEC = 0x10
+_TYPE_INT_HEX = 0x11
+
+_ATTR_VERSION_CODE = 0x0101021B
+_ATTR_VERSION_CODE_MAJOR = 0x01010576
+
+
+class ApkInfo(NamedTuple):
+    package: str
+    version_code: int
+    version_name: str
+
+
+class ManifestError(ValueError):
+    pass
+
+
+def _read_len_utf8(data: bytes, pos: int):
+    n = data[pos]
+    if n & 0x80:
+        return ((n & 0x7F) << 8) | data[pos + 1], pos + 2
+    return n, pos + 1
+
+
+def _read_len_utf16(data: bytes, pos: int):
+    n = struct.unpack_from("<H", data, pos)[0]
+    if n & 0x8000:
+        return ((n & 0x7FFF) << 16) | struct.unpack_from("<H", data, pos + 2)[0], pos + 4
+    return n, pos + 2
+
+
+def _parse_string_pool(data: bytes, start: int) -> List[str]:
+    header_size = struct.unpack_from("<H", data, start + 2)[0]
+    count, _styles, flags, strings_start = struct.unpack_from("<IIII", data, start + 8)
+    offsets = struct.unpack_from(f"<{count}I", data, start + header_size)
+    base = start + strings_start
+    strings = []
+    for off in offsets:
+        pos = base + off
+        if flags & _UTF8_FLAG:
+            _chars, pos = _read_len_utf8(data, pos)
+            nbytes, pos = _read_len_utf8(data, pos)
+            strings.append(data[pos:pos + nbytes].decode("utf-8", errors="replace"))
+        else:
+            nchars, pos = _read_len_utf16(data, pos)
+            strings.append(data[pos:pos + nchars * 2].decode("utf-16-le", errors="replace"))
+    return strings
+
+
+def parse_binary_manifest(data: bytes) -> ApkInfo:
+    if len(data) < 8 or struct.unpack_from("<H", data, 0)[0] != _RES_XML_TYPE:
+        raise ManifestError("not a binary AndroidManifest.xml")
+    strings: List[str] = []
+    res_ids: List[int] = []
+    pos = struct.unpack_from("<H", data, 2)[0]
+    while pos + 8 <= len(data):
+        chunk_type, header_size, chunk_size = struct.unpack_from("<HHI", data, pos)
+        if chunk_size < 8:
+            break
+        if chunk_type == _RES_STRING_POOL_TYPE:
+            strings = _parse_string_pool(data, pos)
+        elif chunk_type == _RES_XML_RESOURCE_MAP_TYPE:
+            res_ids = list(struct.unpack_from(f"<{(chunk_size - header_size) // 4}I", data, pos + header_size))
+        elif chunk_type == _RES_XML_START_ELEMENT_TYPE:
+            return _parse_manifest_element(data, pos + header_size, strings, res_ids)
+        pos += chunk_size
+    raise ManifestError("manifest element not found")
+
+
+def _parse_manifest_element(data: bytes, ext: int, strings: List[str], res_ids: List[int]) -> ApkInfo:
+    _ns, name_idx, attr_start, attr_size, attr_count = struct.unpack_from("<IIHHH", data, ext)
+    if strings[name_idx] != "manifest":
+        raise ManifestError(f"unexpected root element {strings[name_idx]!r}")
+    package, version_name = "", ""
+    code, major = 0, 0
+    for i in range(attr_count):
+        a = ext + attr_start + i * attr_size
+        _ans, aname, raw, _size, _res0, dtype, value = struct.unpack_from("<IIIHBBI", data, a)
+        name = strings[aname] if aname < len(strings) else ""
+        res_id = res_ids[aname] if aname < len(res_ids) else 0
+        text = strings[raw] if raw != 0xFFFFFFFF and raw < len(strings) else None
+        if dtype in (_TYPE_INT_DEC, _TYPE_INT_HEX):
+            number = value
+        elif text is not None and text.strip().lstrip("-").isdigit():
+            number = int(text.strip())
+        else:
+            number = None
+        if name == "package":
+            package = text or ""
+        elif name == "versionName":
+            version_name = text or ""
+        elif res_id == _ATTR_VERSION_CODE or name == "versionCode":
+            code = number or 0
+        elif res_id == _ATTR_VERSION_CODE_MAJOR or name == "versionCodeMajor":
+            major = number or 0
+    if not package:
+        raise ManifestError("package attribute is missing")
+    return ApkInfo(package, (major << 32) | code, version_name)
+
+
+_info_cache: Dict[str, ApkInfo] = {}
+_info_lock = threading.Lock()
+
+
+def read_apk_info(apk_path: str) -> ApkInfo:
+    digest = file_sha256(apk_path)
+    with _info_lock:
+        info = _info_cache.get(digest)
+    if info is not None:
+        return info
+    try:
+        with zipfile.ZipFile(apk_path) as zf:
+            data = zf.read("AndroidManifest.xml")
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise ManifestError(f"cannot read AndroidManifest.xml: {e}") from e
+    try:
+        info = parse_binary_manifest(data)
+    except (struct.error, IndexError) as e:
+        raise ManifestError(f"malformed AndroidManifest.xml: {e}") from e
+    with _info_lock:
+        _info_cache[digest] = info
+    return info
+
+
+def try_read_apk_info(apk_path: str) -> Optional[ApkInfo]:
+    try:
+        return read_apk_info(apk_path)
+    except (ManifestError, OSError):
+        return None
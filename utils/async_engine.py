@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import asyncio
+import codecs
+import itertools
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from utils.output_pipeline import LineBatcher
+from utils.process_flags import creationflags_no_window
+
+EVENT_OUTPUT = "output"
+EVENT_FINISHED = "finished"
+# Output of all jobs is coalesced into line batches, emitted under this job id.
+OUTPUT_JOB_ID = 0
+READ_CHUNK = 64 * 1024
+
+
+def _install_pidfd_watcher(loop: asyncio.AbstractEventLoop):
+    # Before 3.12 the default watcher on POSIX spawns one thread per child process.
+    if sys.platform.startswith("win") or sys.version_info >= (3, 12):
+        return
+    watcher_cls = getattr(asyncio, "PidfdChildWatcher", None)
+    if watcher_cls is None:
+        return
+    try:
+        watcher = watcher_cls()
+        watcher.attach_loop(loop)
+        asyncio.set_child_watcher(watcher)
+    except (OSError, NotImplementedError, RuntimeError):
+        pass
+
+
+class AsyncCommandRunner:
+
+    def __init__(self, emit: Callable[[int, str, object], None], max_in_flight: int = 2048):
+        self._emit = emit
+        self._max_in_flight = max(1, int(max_in_flight))
+        self._ids = itertools.count(1)
+        self._output = LineBatcher(lambda lines: self._emit(OUTPUT_JOB_ID, EVENT_OUTPUT, lines))
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._started: Dict[int, float] = {}
+        self._ready = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._thread = threading.Thread(target=self._loop_main, name="async-command-engine", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _loop_main(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        _install_pidfd_watcher(self._loop)
+        self._slots = asyncio.Semaphore(self._max_in_flight)
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def submit(self, args: List[str], timeout: float = 120.0) -> int:
+        job_id = next(self._ids)
+        self._loop.call_soon_threadsafe(self._start, job_id, list(args), timeout)
+        return job_id
+
+    def cancel(self, job_id: int):
+        def _cancel():
+            task = self._tasks.get(job_id)
+            if task:
+                task.cancel()
+        self._loop.call_soon_threadsafe(_cancel)
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def shutdown(self):
+        def _stop():
+            for task in list(self._tasks.values()):
+                task.cancel()
+            self._loop.stop()
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(_stop)
+        self._thread.join(3)
+
+    def _start(self, job_id: int, args: List[str], timeout: float):
+        task = self._loop.create_task(self._run(job_id, args, timeout))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda t: self._finish(job_id, t))
+
+    def _finish(self, job_id: int, task: asyncio.Task):
+        # Runs for every task, including ones cancelled while queued for a slot or before their
+        # first step, so each submitted job gets exactly one EVENT_FINISHED.
+        self._tasks.pop(job_id, None)
+        started = self._started.pop(job_id, None)
+        elapsed = round(time.monotonic() - started, 2) if started is not None else 0.0
+        success = False
+        if task.cancelled():
+            self._output.add("Cancelled.")
+        elif task.exception() is not None:
+            self._output.add(f"ERROR: {task.exception()}")
+        else:
+            success = task.result()
+        self._output.flush()
+        self._emit(job_id, EVENT_FINISHED, (success, elapsed))
+
+    async def _run(self, job_id: int, args: List[str], timeout: float) -> bool:
+        async with self._slots:
+            self._started[job_id] = time.monotonic()
+            proc = None
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *args,
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                    creationflags=creationflags_no_window(),
+                )
+                await asyncio.wait_for(self._pump(proc), timeout)
+                return proc.returncode == 0
+            except asyncio.TimeoutError:
+                self._output.add(f"ERROR: Timeout after {timeout}s")
+            except OSError as e:
+                self._output.add(f"ERROR: {e}")
+            finally:
+                if proc is not None and proc.returncode is None:
+                    try:
+                        proc.kill()
+                    except ProcessLookupError:
+                        pass
+                    await proc.wait()
+            return False
+
+    async def _pump(self, proc: asyncio.subprocess.Process):
+        # read() rather than readline(): a line longer than the stream limit must not kill the job.
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        while True:
+            chunk = await proc.stdout.read(READ_CHUNK)
+            if not chunk:
+                break
+            pending += decoder.decode(chunk)
+            lines = pending.split("\n")
+            pending = lines.pop()
+            for line in lines:
+                line = line.strip()
+                if line:
+                    self._output.add(line)
+        pending = (pending + decoder.decode(b"", final=True)).strip()
+        if pending:
+            self._output.add(pending)
+        await proc.wait()
+
+
+class AsyncCommandEngine(QObject):
+    event = pyqtSignal(int, str, object)
+
+    def __init__(self, max_in_flight: int = 2048, parent=None):
+        super().__init__(parent)
+        self._runner = AsyncCommandRunner(self.event.emit, max_in_flight)
+
+    def submit(self, args: List[str], timeout: float = 120.0) -> int:
+        return self._runner.submit(args, timeout)
+
+    def cancel(self, job_id: int):
+        self._runner.cancel(job_id)
+
+    def in_flight(self) -> int:
+        return self._runner.in_flight()
+
+    def shutdown(self):
+        self._runner.shutdown()
@@ -4,16 +4,33 @@ import os
 import shlex
 import subprocess
 import re
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from PyQt6.QtCore import QThread, pyqtSignal
 
+from utils.output_pipeline import LineBatcher
+from utils.shell_sessions import ShellSessionError, get_session_manager, is_one_shot
+from utils.adb_client import AdbConnectionError, AdbError, get_client, iter_lines, native_shell_command
+from utils.apk_cache import get_staging_cache
+from utils.apk_installer import (
+    pm_install_staged, push_slot, resolve_apk_set, split_progress, stream_install, supports_streaming
+)
+from utils.job_scheduler import LOCAL_HOST
+from utils.apk_manifest import try_read_apk_info
+from utils.package_inventory import get_package_inventory
+from utils.transfer_progress import TransferMeter
+
 
 class CommandThread(QThread):
     command_finished = pyqtSignal(str, str, bool, float)
-    command_output = pyqtSignal(str)
+    command_output = pyqtSignal(list)
     progress_signal = pyqtSignal(str, int)
+    transfer_progress = pyqtSignal(str, object, object, float)
+
+    USE_SHELL_SESSIONS = True
+    SKIP_CURRENT_INSTALLS = True
+    STREAMING_INSTALL = True
 
     def __init__(self, device: str, command: str, reinstall: bool = False, parent=None):
         super().__init__(parent)
@@ -24,6 +41,7 @@ class CommandThread(QThread):
         self._start_time: datetime | None = None
         self._elapsed_time: float = 0.0
         self._success: bool = False
+        self._output = LineBatcher(self.command_output.emit)
 
     def cancel(self):
         self._requested_cancel = True
@@ -35,9 +53,16 @@ class CommandThread(QThread):
         except ValueError:
             return cmd.split()
 
+    def _emit_output(self, line: str):
+        self._output.add(line)
+
+    def _emit_finished(self, success: bool, elapsed: float):
+        self._output.flush()
+        self.command_finished.emit(self.device, self.command, success, elapsed)
+
     def _emit_error_and_finish(self, message: str):
-        self.command_output.emit(message)
-        self.command_finished.emit(self.device, self.command, False, 0.0)
+        self._emit_output(message)
+        self._emit_finished(False, 0.0)
 
     def run(self):
         try:
@@ -58,9 +83,9 @@ class CommandThread(QThread):
                 self._handle_generic(self._split_command(self.command))
 
         except Exception as e:
-            self.command_output.emit(f"ERROR: {e}")
+            self._emit_output(f"ERROR: {e}")
             self._success = False
-            self.command_finished.emit(self.device, self.command, False, 0.0)
+            self._emit_finished(False, 0.0)
 
     def _handle_install(self, args: List[str]):
         if not args:
@@ -75,37 +100,116 @@ class CommandThread(QThread):
             self._success = False
             return
 
-        apk_path = non_flags[0].strip('"').strip("'")
-        apk_path = os.path.normpath(os.path.expanduser(apk_path))
-        if not os.path.exists(apk_path):
-            self._emit_error_and_finish(f"ERROR: APK file not found: {apk_path}")
+        try:
+            apks = resolve_apk_set([a.strip('"').strip("'") for a in non_flags])
+        except FileNotFoundError as e:
+            self._emit_error_and_finish(f"ERROR: {e}")
             self._success = False
             return
 
         reinstall = self._force_reinstall or any(f.lower() == "-r" for f in flags)
 
-        adb_cmd = ["adb", "-s", self.device, "install"]
+        adb_cmd = ["adb", "-s", self.device, "install-multiple" if len(apks) > 1 else "install"]
         if reinstall:
             adb_cmd.append("-r")
-        adb_cmd.append(apk_path)
+        adb_cmd.extend(apks)
 
         self._start_time = datetime.now()
 
+        apk_info = try_read_apk_info(apks[0]) if self.SKIP_CURRENT_INSTALLS and len(apks) == 1 else None
+        # An explicit reinstall (-r or the reinstall option) always reaches the device.
+        if apk_info and not reinstall and self._skip_if_current(apk_info):
+            return
+
         self.progress_signal.emit(self.device, 0)
 
+        rc = self._install_native(apks, ["-r"] if reinstall else [])
+        if rc is None:
+            rc = self._install_via_adb(adb_cmd)
+
+        if self._requested_cancel:
+            self._emit_error_and_finish("Cancelled.")
+            self._success = False
+            return
+
+        self.progress_signal.emit(self.device, 100)
+
+        self._success = (rc == 0)
+        if self._success and apk_info:
+            get_package_inventory().record_install(self.device, apk_info.package, apk_info.version_code)
+        self._elapsed_time = (datetime.now() - self._start_time).total_seconds()
+        self._emit_finished(self._success, self._elapsed_time)
+
+    def _report_transfer(self, sent: int, total: int, rate: float):
+        self.transfer_progress.emit(self.device, sent, total, rate)
+        self.progress_signal.emit(self.device, int(sent * 95 / total) if total else 95)
+
+    def _transfer_callback(self, transfer=None):
+        meter = TransferMeter(self._report_transfer)
+
+        def _progress(sent: int, total: int):
+            if self._requested_cancel:
+                raise InterruptedError("cancelled")
+            if transfer is not None:
+                transfer.update(sent)
+            meter.update(sent, total)
+        return _progress
+
+    def _native_shell(self, command: str):
+        rc, out = get_client().shell(self.device, command)
+        return rc, out.decode("utf-8", errors="replace")
+
+    def _install_native(self, apks: List[str], flags: List[str]) -> Optional[int]:
+        client = get_client()
+        cache = get_staging_cache()
+        try:
+            staged = [cache.lookup(self.device, apk, self._device_shell) for apk in apks]
+            if all(staged):
+                sizes = [os.path.getsize(apk) for apk in apks]
+                self._emit_output(f"{len(apks)} APK(s) already staged on device, push skipped")
+                self.transfer_progress.emit(self.device, sum(sizes), sum(sizes), 0.0)
+                self.progress_signal.emit(self.device, 95)
+                rc, out = pm_install_staged(self._native_shell, staged, sizes, flags)
+            elif self.STREAMING_INSTALL and supports_streaming(client, self.device):
+                with push_slot(LOCAL_HOST, self.device) as transfer:
+                    rc, out = stream_install(client, self.device, apks, flags, self._transfer_callback(transfer))
+            else:
+                remotes = []
+                with push_slot(LOCAL_HOST, self.device) as transfer:
+                    sizes, progress_for = split_progress(apks, self._transfer_callback(transfer))
+                    for i, apk in enumerate(apks):
+                        def _push(local: str, remote: str, progress=progress_for(i)) -> bool:
+                            client.push(self.device, local, remote, progress=progress)
+                            return True
+                        remotes.append(cache.stage(self.device, apk, self._device_shell, _push)[0])
+                self.progress_signal.emit(self.device, 95)
+                rc, out = pm_install_staged(self._native_shell, remotes, sizes, flags)
+        except AdbConnectionError:
+            return None
+        except (AdbError, OSError, RuntimeError) as e:
+            if not self._requested_cancel:
+                self._emit_output(f"ERROR: {e}")
+            return 1
+
+        for line in out.splitlines():
+            line = line.strip()
+            if line:
+                self._emit_output(line)
+        return rc
+
+    def _install_via_adb(self, adb_cmd: List[str]) -> int:
         proc = subprocess.Popen(adb_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
 
         last_percent = -1
         for line in proc.stdout:
             if self._requested_cancel:
                 proc.kill()
-                self._emit_error_and_finish("Cancelled.")
-                self._success = False
-                return
+                proc.wait()
+                return 1
 
             line = (line or "").strip()
             if line:
-                self.command_output.emit(line)
+                self._emit_output(line)
 
             m = re.search(r"(\d+)%", line)
             if m:
@@ -113,18 +217,28 @@ class CommandThread(QThread):
                 if percent != last_percent:
                     last_percent = percent
                     self.progress_signal.emit(self.device, percent)
-            else:
-                if last_percent < 90:
-                    last_percent += 5
-                    self.progress_signal.emit(self.device, last_percent)
 
         proc.wait()
+        return proc.returncode
 
+    def _device_shell(self, command: str):
+        lines: List[str] = []
+        try:
+            rc = get_session_manager().run(self.device, command, lines.append, timeout=30)
+        except (ShellSessionError, OSError):
+            return 1, ""
+        return rc, "\n".join(lines)
+
+    def _skip_if_current(self, apk_info) -> bool:
+        installed = get_package_inventory().installed_version(self.device, apk_info.package, self._device_shell)
+        if installed is None or installed != apk_info.version_code:
+            return False
+        self._emit_output(f"{apk_info.package} (versionCode {apk_info.version_code}) is already installed, skipped.")
         self.progress_signal.emit(self.device, 100)
-
-        self._success = (proc.returncode == 0)
+        self._success = True
         self._elapsed_time = (datetime.now() - self._start_time).total_seconds()
-        self.command_finished.emit(self.device, self.command, self._success, self._elapsed_time)
+        self._emit_finished(self._success, self._elapsed_time)
+        return True
 
     def _handle_uninstall(self, args: List[str]):
         if not args:
@@ -160,13 +274,15 @@ class CommandThread(QThread):
 
             line = (line or "").strip()
             if line:
-                self.command_output.emit(line)
+                self._emit_output(line)
 
         proc.wait()
 
         self._success = (proc.returncode == 0)
+        if self._success:
+            get_package_inventory().record_uninstall(self.device, package_name)
         self._elapsed_time = (datetime.now() - self._start_time).total_seconds()
-        self.command_finished.emit(self.device, self.command, self._success, self._elapsed_time)
+        self._emit_finished(self._success, self._elapsed_time)
 
     def _handle_generic(self, argv: List[str]):
         if not argv:
@@ -177,6 +293,8 @@ class CommandThread(QThread):
         adb_cmd = ["adb", "-s", self.device] + argv
 
         self._start_time = datetime.now()
+        if self._run_session_shell(argv) or self._run_native_shell(argv):
+            return
         try:
             proc = subprocess.Popen(
                 adb_cmd,
@@ -193,13 +311,75 @@ class CommandThread(QThread):
                     return
                 line = (line or "").strip()
                 if line:
-                    self.command_output.emit(line)
+                    self._emit_output(line)
 
             proc.wait()
             self._success = (proc.returncode == 0)
         except Exception as e:
-            self.command_output.emit(f"ERROR: {e}")
+            self._emit_output(f"ERROR: {e}")
+            self._success = False
+
+        self._elapsed_time = (datetime.now() - self._start_time).total_seconds()
+        self._emit_finished(self._success, self._elapsed_time)
+
+    def _run_session_shell(self, argv: List[str]) -> bool:
+        command = native_shell_command(argv) if self.USE_SHELL_SESSIONS else None
+        if command is None or not is_one_shot(command):
+            return False
+
+        def _on_line(line: str):
+            line = line.strip()
+            if line:
+                self._emit_output(line)
+
+        try:
+            rc = get_session_manager().run(self.device, command, _on_line,
+                                           cancelled=lambda: self._requested_cancel)
+            self._success = (rc == 0)
+        except FileNotFoundError:
+            return False
+        except ShellSessionError as e:
+            if self._requested_cancel:
+                self._emit_error_and_finish("Cancelled.")
+                self._success = False
+                return True
+            self._emit_output(f"ERROR: {e}")
+            self._success = False
+        except OSError as e:
+            self._emit_output(f"ERROR: {e}")
             self._success = False
 
         self._elapsed_time = (datetime.now() - self._start_time).total_seconds()
-        self.command_finished.emit(self.device, self.command, self._success, self._elapsed_time)
+        self._emit_finished(self._success, self._elapsed_time)
+        return True
+
+    def _run_native_shell(self, argv: List[str]) -> bool:
+        command = native_shell_command(argv)
+        if command is None:
+            return False
+        try:
+            stream = get_client().shell_stream(self.device, command)
+        except AdbConnectionError:
+            return False
+        except AdbError as e:
+            self._emit_output(f"adb: error: {e}")
+            self._success = False
+        else:
+            try:
+                for line in iter_lines(stream):
+                    if self._requested_cancel:
+                        stream.close()
+                        self._emit_error_and_finish("Cancelled.")
+                        self._success = False
+                        return True
+                    line = line.strip()
+                    if line:
+                        self._emit_output(line)
+                self._success = (stream.returncode == 0)
+            except (AdbError, OSError) as e:
+                self._emit_output(f"ERROR: {e}")
+                self._success = False
+
+        self._elapsed_time = (datetime.now() - self._start_time).total_seconds()
+        self._emit_finished(self._success, self._elapsed_time)
+        return True
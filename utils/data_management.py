@@ -1,9 +1,23 @@
+import functools
 import json
 import os
 import tempfile
+import threading
 import re as _re
 from typing import Dict, List, Tuple, Optional
 
+# Every read-modify-write of the data file goes through this lock: device props are saved
+# from a worker thread while the GUI saves groups/commands/connections.
+_write_lock = threading.RLock()
+
+
+def _serialized(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _write_lock:
+            return fn(*args, **kwargs)
+    return wrapper
+
 def _atomic_write_json(path: str, data: dict) -> None:
     dir_ = os.path.dirname(path) or "."
     os.makedirs(dir_, exist_ok=True)
@@ -38,6 +52,7 @@ class DataManager:
             return [], []
 
     @staticmethod
+    @_serialized
     def save_data(
         devices: Optional[List[str]] = None,
         commands: Optional[List[str]] = None,
@@ -103,6 +118,7 @@ class DataManager:
             return {}
 
     @staticmethod
+    @_serialized
     def save_device_groups(device_groups: Dict[str, str], filename: str = "adb_data.json") -> None:
         devices, commands = DataManager.load_data(filename)
         DataManager.save_data(
@@ -127,6 +143,7 @@ class DataManager:
         return [d for d, g in groups.items() if g == group]
 
     @staticmethod
+    @_serialized
     def assign_devices_to_group(devices_list: List[str], group_name: str, filename: str = "adb_data.json") -> None:
         if not DataManager.validate_group_name(group_name):
             raise ValueError("Invalid group name.")
@@ -136,6 +153,7 @@ class DataManager:
         DataManager.save_device_groups(groups, filename)
 
     @staticmethod
+    @_serialized
     def reset_devices_group(devices_list: List[str], filename: str = "adb_data.json") -> None:
         groups = DataManager.load_device_groups(filename)
         for d in devices_list:
@@ -143,6 +161,7 @@ class DataManager:
         DataManager.save_device_groups(groups, filename)
 
     @staticmethod
+    @_serialized
     def rename_group(old_name: str, new_name: str, filename: str = "adb_data.json") -> None:
         if not DataManager.validate_group_name(new_name):
             raise ValueError("Invalid new group name.")
@@ -156,6 +175,7 @@ class DataManager:
             DataManager.save_device_groups(groups, filename)
 
     @staticmethod
+    @_serialized
     def delete_group(group_name: str, reassign_to: str = "Ungrouped", filename: str = "adb_data.json") -> None:
         if not DataManager.validate_group_name(reassign_to):
             raise ValueError("Invalid target group name.")
@@ -169,6 +189,7 @@ class DataManager:
             DataManager.save_device_groups(groups, filename)
 
     @staticmethod
+    @_serialized
     def delete_command(command_to_delete: str, filename: str = "adb_data.json") -> None:
         devices, commands = DataManager.load_data(filename)
         if command_to_delete in commands:
@@ -184,6 +205,7 @@ class DataManager:
             print(f"Command '{command_to_delete}' not found in data.")
 
     @staticmethod
+    @_serialized
     def delete_device(device_to_delete: str, filename: str = "adb_data.json") -> None:
         devices, commands = DataManager.load_data(filename)
         groups = DataManager.load_device_groups(filename)
@@ -225,6 +247,7 @@ class DataManager:
             return []
 
     @staticmethod
+    @_serialized
     def save_ssh_connections(connections: list[dict], filename: str = "adb_data.json") -> None:
         try:
             with open(filename, "r", encoding="utf-8") as f:
@@ -234,3 +257,24 @@ class DataManager:
         existing["ssh_connections"] = connections or []
         _atomic_write_json(filename, existing)
         DataManager.log_file_contents(filename)
+
+    @staticmethod
+    def load_device_props(filename: str = "adb_data.json") -> Dict[str, dict]:
+        try:
+            with open(filename, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            props = data.get("device_props", {})
+            return props if isinstance(props, dict) else {}
+        except Exception:
+            return {}
+
+    @staticmethod
+    @_serialized
+    def save_device_props(device_props: Dict[str, dict], filename: str = "adb_data.json") -> None:
+        try:
+            with open(filename, "r", encoding="utf-8") as f:
+                existing = json.load(f)
+        except Exception:
+            existing = {}
+        existing["device_props"] = device_props or {}
+        _atomic_write_json(filename, existing)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.adb_client import AdbError, get_client
+from utils.adb_forward import forwarded_client
+from utils.data_management import DataManager
+from utils.process_flags import creationflags_no_window
+from utils.ssh_exec import ssh_popen
+
+PropsFetcher = Callable[[str, float], str]
+
+# Only identity/build properties are persisted; the full map stays in memory.
+PERSISTED_PROPS = (
+    "ro.product.model",
+    "ro.product.manufacturer",
+    "ro.product.brand",
+    "ro.product.device",
+    "ro.product.cpu.abilist",
+    "ro.build.version.release",
+    "ro.build.version.sdk",
+    "ro.build.fingerprint",
+    "ro.serialno",
+)
+
+_PROP_START_RE = re.compile(r"^\[[^\]]+\]:\s*\[")
+_PROP_RE = re.compile(r"^\[([^\]]+)\]:\s*\[(.*)\]\s*$", re.S)
+
+
+def parse_getprop(text: str) -> Dict[str, str]:
+    props: Dict[str, str] = {}
+    pending = ""
+    for line in (text or "").replace("\r", "").split("\n"):
+        if _PROP_START_RE.match(line):
+            pending = line
+        elif pending:
+            pending = f"{pending}\n{line}"
+        else:
+            continue
+        m = _PROP_RE.match(pending)
+        if m:
+            props[m.group(1)] = m.group(2)
+            pending = ""
+    return props
+
+
+def local_fetcher(device: str, timeout: float) -> str:
+    try:
+        _rc, out = get_client().shell(device, "getprop", timeout=timeout)
+        return out.decode("utf-8", errors="replace")
+    except (AdbError, OSError):
+        pass
+    res = subprocess.run(["adb", "-s", device, "shell", "getprop"], capture_output=True, text=True,
+                         timeout=timeout, creationflags=creationflags_no_window())
+    return res.stdout or ""
+
+
+def ssh_fetcher(cfg: dict) -> PropsFetcher:
+    def _fetch(device: str, timeout: float) -> str:
+        client = forwarded_client(cfg)
+        if client is not None:
+            try:
+                _rc, out = client.shell(device, "getprop", timeout=timeout)
+                return out.decode("utf-8", errors="replace")
+            except (AdbError, OSError):
+                pass
+        proc = ssh_popen(cfg, ["adb", "-s", device, "shell", "getprop"])
+        try:
+            out, _ = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            raise
+        return out or ""
+    return _fetch
+
+
+class DevicePropsCache:
+
+    TTL_S = 24 * 3600
+    FETCH_TIMEOUT_S = 6.0
+
+    def __init__(self, ttl: Optional[float] = None, max_workers: int = 32):
+        self.ttl = self.TTL_S if ttl is None else ttl
+        self._props: Dict[str, Dict[str, str]] = {}
+        self._fetched: Dict[str, float] = {}
+        self._in_flight: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="device-props")
+        self._load()
+
+    def _load(self):
+        for key, entry in DataManager.load_device_props().items():
+            try:
+                self._props[key] = dict(entry["props"])
+                self._fetched[key] = float(entry["fetched"])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    def save(self):
+        with self._lock:
+            data = {
+                key: {"fetched": self._fetched[key],
+                      "props": {p: v for p, v in props.items() if p in PERSISTED_PROPS}}
+                for key, props in self._props.items()
+            }
+        try:
+            DataManager.save_device_props(data)
+        except OSError:
+            pass
+
+    def get(self, key: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._props.get(key, {}))
+
+    def fresh(self, key: str) -> bool:
+        with self._lock:
+            fetched = self._fetched.get(key)
+        return fetched is not None and time.time() - fetched < self.ttl
+
+    def title(self, key: str, device: str) -> str:
+        model = self.get(key).get("ro.product.model", "").strip()
+        return f"{model} ({device})" if model else device
+
+    def _fetch(self, key: str, device: str, fetcher: PropsFetcher):
+        try:
+            props = parse_getprop(fetcher(device, self.FETCH_TIMEOUT_S))
+        except Exception:
+            props = {}
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if props:
+                self._props[key] = props
+                self._fetched[key] = time.time()
+        return bool(props)
+
+    def refresh(self, items: Iterable[Tuple[str, str, PropsFetcher]], force: bool = False) -> List[object]:
+        futures = []
+        with self._lock:
+            for key, device, fetcher in items:
+                future = self._in_flight.get(key)
+                if future is None:
+                    fetched = self._fetched.get(key)
+                    if not force and fetched is not None and time.time() - fetched < self.ttl:
+                        continue
+                    future = self._pool.submit(self._fetch, key, device, fetcher)
+                    self._in_flight[key] = future
+                futures.append(future)
+        if futures:
+            threading.Thread(target=self._save_when_done, args=(futures,), daemon=True).start()
+        return futures
+
+    def _save_when_done(self, futures: List[object]):
+        wait(futures)
+        if any(f.result() for f in futures):
+            self.save()
+
+    def fetch_many(self, items: Iterable[Tuple[str, str, PropsFetcher]],
+                   timeout: Optional[float] = None) -> Dict[str, Dict[str, str]]:
+        items = list(items)
+        futures = self.refresh(items)
+        if futures:
+            wait(futures, timeout=timeout)
+        return {key: self.get(key) for key, _device, _fetcher in items}
+
+    def forget(self, key: str):
+        with self._lock:
+            self._props.pop(key, None)
+            self._fetched.pop(key, None)
+
+
+_cache: Optional[DevicePropsCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_device_props() -> DevicePropsCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DevicePropsCache()
+        return _cache
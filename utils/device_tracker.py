@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import threading
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from utils.adb_client import AdbError, DeviceTrackStream, get_client
+
+
+class DeviceTracker(QThread):
+    devices_changed = pyqtSignal(dict, list, dict)
+
+    RECONNECT_MIN_S = 0.5
+    RECONNECT_MAX_S = 5.0
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._running = False
+        self._known: dict[str, str] = {}
+        self._stream: DeviceTrackStream | None = None
+        self._wake = threading.Event()
+
+    def snapshot(self) -> dict[str, str]:
+        return dict(self._known)
+
+    def run(self):
+        self._running = True
+        delay = self.RECONNECT_MIN_S
+        while self._running:
+            try:
+                self._stream = get_client().track_devices()
+                delay = self.RECONNECT_MIN_S
+                for entries in self._stream:
+                    if not self._running:
+                        break
+                    self._apply(dict(entries))
+            except (OSError, AdbError):
+                pass
+            finally:
+                self._stream = None
+
+            if not self._running:
+                break
+            self._apply({})
+            self._wake.wait(delay)
+            self._wake.clear()
+            delay = min(delay * 2, self.RECONNECT_MAX_S)
+
+    def _apply(self, current: dict[str, str]):
+        added = {dev: st for dev, st in current.items() if dev not in self._known}
+        removed = [dev for dev in self._known if dev not in current]
+        changed = {dev: st for dev, st in current.items()
+                   if dev in self._known and self._known[dev] != st}
+        self._known = current
+        if added or removed or changed:
+            self.devices_changed.emit(added, removed, changed)
+
+    def reconnect(self):
+        stream = self._stream
+        if stream:
+            stream.close()
+        self._wake.set()
+
+    def stop(self):
+        self._running = False
+        self.reconnect()
+        self.wait(2000)
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from utils.adb_client import AdbError, AdbClient
+from utils.adb_forward import forwarded_client
+from utils.process_flags import creationflags_no_window
+from utils.ssh_exec import ssh_popen
+
+Poller = Callable[[float], List[Tuple[str, str]]]
+
+
+class DeviceEntry(NamedTuple):
+    host: str
+    state: str
+    last_seen: float
+
+
+class HostState(NamedTuple):
+    ok: bool
+    polled_at: float
+    latency: float
+    error: str
+
+
+def parse_devices_output(text: str) -> List[Tuple[str, str]]:
+    devices = []
+    for line in (text or "").strip().splitlines():
+        line = line.strip()
+        if not line or line.lower().startswith("list of devices") or line.startswith("*"):
+            continue
+        parts = line.split("\t")
+        if len(parts) == 2:
+            devices.append((parts[0], parts[1]))
+    return devices
+
+
+def local_poller(timeout: float) -> List[Tuple[str, str]]:
+    try:
+        return AdbClient(timeout=timeout).devices()
+    except (OSError, AdbError):
+        pass
+    result = subprocess.run(["adb", "devices"], capture_output=True, text=True, timeout=timeout,
+                            creationflags=creationflags_no_window())
+    return parse_devices_output(result.stdout)
+
+
+def ssh_poller(cfg: dict) -> Poller:
+    def _poll(timeout: float) -> List[Tuple[str, str]]:
+        client = forwarded_client(cfg)
+        if client is not None:
+            client.timeout = timeout
+            try:
+                return client.devices()
+            except (OSError, AdbError):
+                pass
+        proc = ssh_popen(cfg, ["adb", "devices"])
+        try:
+            out, _ = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            raise
+        if proc.returncode != 0:
+            raise RuntimeError((out or "").strip() or "adb devices failed")
+        return parse_devices_output(out)
+    return _poll
+
+
+class _Host:
+
+    def __init__(self, key: str, poller: Poller, interval: float, timeout: float):
+        self.key = key
+        self.poller = poller
+        self.interval = interval
+        self.timeout = timeout
+        self.refs = 1
+        self.next_due = 0.0
+        self.in_flight = False
+        self.state = HostState(False, 0.0, 0.0, "not polled yet")
+
+
+class FleetStatus:
+
+    POLL_INTERVAL_S = 5.0
+    HOST_TIMEOUT_S = 8.0
+    STALE_AFTER_S = 30.0
+
+    def __init__(self, max_workers: int = 32):
+        self._hosts: Dict[str, _Host] = {}
+        self._table: Dict[Tuple[str, str], DeviceEntry] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fleet-poll")
+        self._thread: Optional[threading.Thread] = None
+
+    def register_host(self, key: str, poller: Poller, interval: Optional[float] = None,
+                      timeout: Optional[float] = None):
+        with self._lock:
+            host = self._hosts.get(key)
+            if host is not None:
+                host.refs += 1
+            else:
+                self._hosts[key] = _Host(key, poller, interval or self.POLL_INTERVAL_S,
+                                         timeout or self.HOST_TIMEOUT_S)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="fleet-status", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def unregister_host(self, key: str):
+        with self._lock:
+            host = self._hosts.get(key)
+            if host is None:
+                return
+            host.refs -= 1
+            if host.refs > 0:
+                return
+            del self._hosts[key]
+            for entry_key in [k for k in self._table if k[0] == key]:
+                del self._table[entry_key]
+        self._notify(key)
+
+    def add_listener(self, callback: Callable[[str], None]):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str], None]):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def poll_now(self, key: Optional[str] = None):
+        with self._lock:
+            for host in self._hosts.values():
+                if key is None or host.key == key:
+                    host.next_due = 0.0
+        self._wake.set()
+
+    def devices(self, key: str) -> Dict[str, str]:
+        now = time.monotonic()
+        with self._lock:
+            return {dev: (entry.state if now - entry.last_seen <= self.STALE_AFTER_S else "offline")
+                    for (host, dev), entry in self._table.items() if host == key}
+
+    def table(self) -> Dict[str, DeviceEntry]:
+        merged: Dict[str, DeviceEntry] = {}
+        with self._lock:
+            entries = list(self._table.items())
+        for (_host, dev), entry in entries:
+            current = merged.get(dev)
+            if current is None or entry.last_seen > current.last_seen:
+                merged[dev] = entry
+        return merged
+
+    def host_state(self, key: str) -> Optional[HostState]:
+        with self._lock:
+            host = self._hosts.get(key)
+            return host.state if host is not None else None
+
+    def _loop(self):
+        while True:
+            now = time.monotonic()
+            wait = 1.0
+            with self._lock:
+                due = [h for h in self._hosts.values() if not h.in_flight and h.next_due <= now]
+                for host in due:
+                    host.in_flight = True
+                pending = [h.next_due - now for h in self._hosts.values() if not h.in_flight]
+            try:
+                for host in due:
+                    self._pool.submit(self._poll, host)
+            except RuntimeError:
+                # Interpreter shutdown: the pool no longer accepts work.
+                return
+            if pending:
+                wait = max(0.05, min(pending + [wait]))
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def _poll(self, host: _Host):
+        started = time.monotonic()
+        try:
+            entries, error = host.poller(host.timeout), ""
+        except Exception as e:
+            entries, error = None, str(e) or type(e).__name__
+        now = time.monotonic()
+        with self._lock:
+            host.in_flight = False
+            host.next_due = now + host.interval
+            changed = host.state.ok != (entries is not None) or bool(error)
+            host.state = HostState(entries is not None, now, now - started, error)
+            if self._hosts.get(host.key) is not host:
+                return
+            if entries is not None:
+                seen = set()
+                for dev, state in entries:
+                    seen.add(dev)
+                    previous = self._table.get((host.key, dev))
+                    changed = changed or previous is None or previous.state != state
+                    self._table[(host.key, dev)] = DeviceEntry(host.key, state, now)
+                for entry_key in [k for k in self._table if k[0] == host.key and k[1] not in seen]:
+                    del self._table[entry_key]
+                    changed = True
+        if changed:
+            self._notify(host.key)
+
+    def _notify(self, key: str):
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(key)
+            except Exception:
+                pass
+
+
+_fleet: Optional[FleetStatus] = None
+_fleet_lock = threading.Lock()
+
+
+def get_fleet_status() -> FleetStatus:
+    global _fleet
+    with _fleet_lock:
+        if _fleet is None:
+            _fleet = FleetStatus()
+        return _fleet
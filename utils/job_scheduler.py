@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Optional
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 10
+PRIORITY_BULK = 20
+
+LOCAL_HOST = "local"
+
+_current = threading.local()
+
+
+class Job:
+
+    def __init__(self, job_id: int, fn: Callable[[], object], device: str, host: str, priority: int,
+                 on_cancelled: Optional[Callable[[], object]] = None):
+        self.id = job_id
+        self.fn = fn
+        self.on_cancelled = on_cancelled
+        self.device = device
+        self.host = host
+        self.priority = priority
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+
+class JobScheduler:
+
+    THROUGHPUT_WINDOW_S = 10.0
+
+    def __init__(self, max_workers: int = 16, per_host_limit: int = 8):
+        self.max_workers = max(1, int(max_workers))
+        self.per_host_limit = max(1, int(per_host_limit))
+        self._host_limits: Dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[Job]] = {}
+        self._busy_devices: set[str] = set()
+        self._host_running: Counter = Counter()
+        self._workers: list[threading.Thread] = []
+        self._idle_workers = 0
+        self._blocked_workers = 0
+        self._pending = 0
+        self._ids = itertools.count(1)
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._recent: Deque[float] = deque()
+        self._shutdown = False
+
+    def set_host_limit(self, host: str, limit: int):
+        with self._cond:
+            self._host_limits[host] = max(1, int(limit))
+            self._cond.notify_all()
+
+    def submit(self, fn: Callable[[], object], device: str, host: str = LOCAL_HOST,
+               priority: int = PRIORITY_NORMAL, on_cancelled: Optional[Callable[[], object]] = None) -> Job:
+        # on_cancelled runs, on a worker thread, for a job cancelled before it started.
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("scheduler is shut down")
+            job = Job(next(self._ids), fn, device, host, priority, on_cancelled)
+            self._queues.setdefault(device, deque()).append(job)
+            self._pending += 1
+            self._spawn_worker_locked()
+            self._cond.notify()
+            return job
+
+    def _spawn_worker_locked(self):
+        # Workers parked in blocked() don't count toward max_workers.
+        active = len(self._workers) - self._blocked_workers
+        if self._idle_workers < self._pending and active < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{len(self._workers) + 1}",
+                                      daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _block(self, job: Job):
+        with self._cond:
+            self._blocked_workers += 1
+            self._release_host_locked(job.host)
+            self._spawn_worker_locked()
+            self._cond.notify_all()
+
+    def _unblock(self, job: Job):
+        # The host slot was lent out in _block; take it back only once the host has room again.
+        with self._cond:
+            while self._host_running[job.host] >= self._host_limit(job.host):
+                self._cond.wait()
+            self._blocked_workers -= 1
+            self._host_running[job.host] += 1
+
+    def _release_host_locked(self, host: str):
+        self._host_running[host] -= 1
+        if self._host_running[host] <= 0:
+            del self._host_running[host]
+
+    def cancel_pending(self, device: Optional[str] = None) -> int:
+        count = 0
+        with self._cond:
+            for dev, queue in self._queues.items():
+                if device is not None and dev != device:
+                    continue
+                for job in queue:
+                    if not job.cancelled:
+                        job.cancel()
+                        count += 1
+        return count
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            self._trim_recent(now)
+            return {
+                "queued": self._pending,
+                "running": len(self._busy_devices),
+                "completed": self._completed,
+                "failed": self._failed,
+                "cancelled": self._cancelled,
+                "workers": len(self._workers),
+                "throughput": len(self._recent) / self.THROUGHPUT_WINDOW_S,
+                "per_host": dict(self._host_running),
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._shutdown = True
+            for queue in self._queues.values():
+                for job in queue:
+                    job.cancel()
+            self._cond.notify_all()
+
+    def _trim_recent(self, now: float):
+        while self._recent and now - self._recent[0] > self.THROUGHPUT_WINDOW_S:
+            self._recent.popleft()
+
+    def _host_limit(self, host: str) -> int:
+        return self._host_limits.get(host, self.per_host_limit)
+
+    def _next_job(self) -> Optional[Job]:
+        best: Optional[Job] = None
+        for device, queue in self._queues.items():
+            if device in self._busy_devices or not queue:
+                continue
+            head = queue[0]
+            if not head.cancelled and self._host_running[head.host] >= self._host_limit(head.host):
+                continue
+            if best is None or (head.priority, head.id) < (best.priority, best.id):
+                best = head
+        if best is not None:
+            queue = self._queues[best.device]
+            queue.popleft()
+            self._pending -= 1
+            if not queue:
+                del self._queues[best.device]
+        return best
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._idle_workers += 1
+                    self._cond.wait()
+                    self._idle_workers -= 1
+                    job = self._next_job()
+                skipped = job.cancelled
+                if skipped:
+                    job.finished_at = time.monotonic()
+                    self._cancelled += 1
+                else:
+                    self._busy_devices.add(job.device)
+                    self._host_running[job.host] += 1
+
+            if skipped:
+                if job.on_cancelled is not None:
+                    try:
+                        job.on_cancelled()
+                    except Exception:
+                        pass
+                continue
+
+            job.started_at = time.monotonic()
+            _current.job = (self, job)
+            try:
+                job.fn()
+            except BaseException as e:
+                job.error = e
+            finally:
+                _current.job = None
+
+            with self._cond:
+                job.finished_at = time.monotonic()
+                self._busy_devices.discard(job.device)
+                self._release_host_locked(job.host)
+                if job.error is None:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                self._recent.append(job.finished_at)
+                self._trim_recent(job.finished_at)
+                self._cond.notify_all()
+
+
+@contextmanager
+def blocked():
+    # Wrap waits on outside resources (transfer slots) made from inside a job: the job keeps its
+    # device, but its worker and host slot are lent out so queued interactive work isn't starved.
+    current = getattr(_current, "job", None)
+    if current is None:
+        yield
+        return
+    scheduler, job = current
+    scheduler._block(job)
+    try:
+        yield
+    finally:
+        scheduler._unblock(job)
+
+
+_scheduler: Optional[JobScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> JobScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+        return _scheduler
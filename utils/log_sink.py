@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import gzip
+import os
+import re
+import threading
+import time
+import weakref
+from datetime import datetime
+from typing import List, Optional
+
+WRITE_BUFFER_BYTES = 1024 * 1024
+FLUSH_BYTES = 256 * 1024
+FLUSH_INTERVAL_S = 1.0
+COMPRESS_LEVEL = 5
+
+_UNSAFE_CHARS_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def safe_name(text: str) -> str:
+    return _UNSAFE_CHARS_RE.sub("_", text).strip("_") or "device"
+
+
+def capture_stem(file_path: str) -> str:
+    # "capture.txt" / "capture.log.gz" -> ".../capture"; segments are named from this.
+    directory, name = os.path.split(file_path)
+    for suffix in (".log.gz", ".txt.gz", ".gz", ".txt", ".log"):
+        if name.lower().endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return os.path.join(directory, name or "logcat")
+
+
+def segment_pattern(file_path: str, device: str) -> str:
+    return f"{capture_stem(file_path)}-{safe_name(device)}-*.log.gz"
+
+
+class RotatingGzipSink:
+    # Callers append text from their reader thread; compression and disk writes happen on the
+    # shared writer thread, in large chunks, so a slow disk never stalls a logcat stream.
+
+    MAX_SEGMENT_BYTES = 64 * 1024 * 1024
+    MAX_SEGMENT_AGE_S = 3600
+
+    def __init__(self, file_path: str, device: str, max_bytes: Optional[int] = None,
+                 max_age_s: Optional[float] = None, compress_level: int = COMPRESS_LEVEL):
+        self.prefix = f"{capture_stem(file_path)}-{safe_name(device)}"
+        self.device = device
+        self.max_bytes = max_bytes or self.MAX_SEGMENT_BYTES
+        self.max_age_s = max_age_s or self.MAX_SEGMENT_AGE_S
+        self.compress_level = compress_level
+        self.segments: List[str] = []
+        self.bytes_in = 0
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._raw = None
+        self._gz: Optional[gzip.GzipFile] = None
+        self._segment_bytes = 0
+        self._segment_started = 0.0
+        self._closed = False
+        self.error: Optional[BaseException] = None
+        os.makedirs(os.path.dirname(self.prefix) or ".", exist_ok=True)
+        _writer.register(self)
+
+    def write(self, text: str):
+        if not text:
+            return
+        with self._lock:
+            if self.error is not None:
+                raise OSError(f"log capture to {self.prefix} failed: {self.error}") from self.error
+            if self._closed:
+                raise ValueError("write to closed log sink")
+            self._pending.append(text)
+            self._pending_size += len(text)
+            due = self._pending_size >= FLUSH_BYTES
+        if due:
+            _writer.wake()
+
+    def writelines(self, lines):
+        self.write("".join(lines))
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending_size
+
+    def _open_segment(self):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = f"{self.prefix}-{stamp}-{len(self.segments):03d}.log.gz"
+        self._raw = open(path, "wb", buffering=WRITE_BUFFER_BYTES)
+        self._gz = gzip.GzipFile(filename=os.path.basename(path)[:-3], mode="wb",
+                                 compresslevel=self.compress_level, fileobj=self._raw)
+        self._segment_bytes = 0
+        self._segment_started = time.monotonic()
+        self.segments.append(path)
+
+    def _close_segment(self):
+        gz, raw, self._gz, self._raw = self._gz, self._raw, None, None
+        if gz is not None:
+            gz.close()
+        if raw is not None:
+            raw.close()
+
+    def drain(self, final: bool = False):
+        with self._io_lock:
+            with self._lock:
+                chunks, self._pending, self._pending_size = self._pending, [], 0
+            if chunks:
+                data = "".join(chunks).encode("utf-8", errors="replace")
+                if self._gz is not None and (self._segment_bytes >= self.max_bytes
+                                             or time.monotonic() - self._segment_started >= self.max_age_s):
+                    self._close_segment()
+                if self._gz is None:
+                    self._open_segment()
+                self._gz.write(data)
+                self._segment_bytes += len(data)
+                self.bytes_in += len(data)
+            if final:
+                self._close_segment()
+            elif chunks:
+                # Sync-flush so everything written so far is readable even if the app dies.
+                self._gz.flush()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            self.drain(final=True)
+        finally:
+            _writer.unregister(self)
+
+    def fail(self, error: BaseException):
+        # A write error on the writer thread: keep it for the capturing thread, whose next
+        # write() raises it, and stop accepting data.
+        with self._lock:
+            if self.error is None:
+                self.error = error
+            self._closed = True
+            self._pending, self._pending_size = [], 0
+        _writer.unregister(self)
+        with self._io_lock:
+            try:
+                self._close_segment()
+            except (OSError, ValueError):
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _SinkWriter:
+
+    def __init__(self, interval: float = FLUSH_INTERVAL_S):
+        self._interval = interval
+        self._sinks: "weakref.WeakSet" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def register(self, sink):
+        with self._lock:
+            self._sinks.add(sink)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="log-sink-writer", daemon=True)
+                self._thread.start()
+
+    def unregister(self, sink):
+        with self._lock:
+            self._sinks.discard(sink)
+
+    def wake(self):
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self._interval)
+            self._wake.clear()
+            with self._lock:
+                sinks = list(self._sinks)
+            for sink in sinks:
+                try:
+                    sink.drain()
+                except (OSError, ValueError) as e:
+                    sink.fail(e)
+
+
+_writer = _SinkWriter()
+
+
+def open_log_sink(file_path: str, device: str) -> RotatingGzipSink:
+    return RotatingGzipSink(file_path, device)
@@ -0,0 +1,578 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import shlex
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utils.logcat_binary import LogRecord, PRIORITY_BY_LEVEL
+
+LOG_STORE_DIR = "logcat_store"
+
+# kind, ts, pid, tid, priority, device id, tag id, message length; then the UTF-8 message.
+_RECORD = struct.Struct("<BdiiBHHI")
+# Dictionary entries share the record layout (name in the message) so an unsealed
+# segment can be rebuilt from its data file alone.
+_KIND_ENTRY = 0
+_DEFINE_DEVICE = 1
+_DEFINE_TAG = 2
+_MAX_IDS = 0xFFFF + 1
+
+_FORMAT = 2
+_MAGIC = b"ADBMLOG2"
+
+_DATA_SUFFIX = ".dat"
+_INDEX_SUFFIX = ".idx"
+_TRIGRAM_SUFFIX = ".tri"
+
+StoredRecord = Tuple[str, LogRecord]
+
+
+def _bits(bitmap: int) -> Iterator[int]:
+    while bitmap:
+        low = bitmap & -bitmap
+        yield low.bit_length() - 1
+        bitmap ^= low
+
+
+_bucket_cache: Dict[str, int] = {}
+
+
+def _trigram_bucket(trigram: str, buckets: int) -> int:
+    bucket = _bucket_cache.get(trigram)
+    if bucket is None:
+        if len(_bucket_cache) > 262144:
+            _bucket_cache.clear()
+        bucket = _bucket_cache[trigram] = zlib.crc32(trigram.encode("utf-8"))
+    return bucket % buckets
+
+
+def _trigrams(text: str) -> set:
+    # Trigrams of distinct whitespace-separated tokens only: far fewer to hash than every
+    # character position, and any token of a query string lies inside a token of a matching message.
+    tokens = set(text.lower().split())
+    return {t[i:i + 3] for t in tokens for i in range(len(t) - 2)}
+
+
+class _Segment:
+
+    def __init__(self, path: str, trigram_buckets: int):
+        self.path = path
+        self.trigram_buckets = trigram_buckets
+        self.devices: List[str] = []
+        self.tags: List[str] = []
+        self._device_ids: Dict[str, int] = {}
+        self._tag_ids: Dict[str, int] = {}
+        self.offsets: List[int] = []
+        self.min_ts: List[float] = []
+        self.max_ts: List[float] = []
+        self.level_bm: Dict[int, int] = {}
+        self.tag_bm: Dict[int, int] = {}
+        self.pid_bm: Dict[int, int] = {}
+        self.device_bm: Dict[int, int] = {}
+        self.trigram_bm: Optional[Dict[int, int]] = {} if trigram_buckets else None
+        self.trigram_blocks = 0
+        self.records = 0
+        self.size = 0
+        self.sealed = False
+        self._block_records = 0
+        self._block_keys: set = set()
+        self._block_text: List[str] = []
+
+    @property
+    def data_path(self) -> str:
+        return self.path + _DATA_SUFFIX
+
+    def time_range(self) -> Tuple[float, float]:
+        if not self.min_ts:
+            return 0.0, 0.0
+        return min(self.min_ts), max(self.max_ts)
+
+    def has_room(self, device: str, tag: str) -> bool:
+        return ((device in self._device_ids or len(self.devices) < _MAX_IDS)
+                and (tag in self._tag_ids or len(self.tags) < _MAX_IDS))
+
+    def define(self, kind: int, name: str) -> Tuple[int, bool]:
+        ids, names = (self._device_ids, self.devices) if kind == _DEFINE_DEVICE else (self._tag_ids, self.tags)
+        ident = ids.get(name)
+        if ident is not None:
+            return ident, False
+        ident = ids[name] = len(names)
+        names.append(name)
+        return ident, True
+
+    def index(self, offset: int, ts: float, pid: int, priority: int, device_id: int, tag_id: int,
+              message: str, block_records: int):
+        if not self.offsets or self._block_records >= block_records:
+            self._close_block()
+            self.offsets.append(offset)
+            self.min_ts.append(ts)
+            self.max_ts.append(ts)
+            self._block_records = 0
+        block = len(self.offsets) - 1
+        bit = 1 << block
+        if ts < self.min_ts[block]:
+            self.min_ts[block] = ts
+        elif ts > self.max_ts[block]:
+            self.max_ts[block] = ts
+        keys = self._block_keys
+        for key, bitmaps in (((0, priority), self.level_bm), ((1, tag_id), self.tag_bm),
+                             ((2, pid), self.pid_bm), ((3, device_id), self.device_bm)):
+            if key not in keys:
+                keys.add(key)
+                bitmaps[key[1]] = bitmaps.get(key[1], 0) | bit
+        if self.trigram_bm is not None:
+            self._block_text.append(message)
+        self._block_records += 1
+        self.records += 1
+
+    def _close_block(self):
+        self._block_keys = set()
+        if self.trigram_bm is None or not self.offsets:
+            return
+        block = len(self.offsets) - 1
+        bit = 1 << block
+        buckets = self.trigram_buckets
+        bm = self.trigram_bm
+        for bucket in {_trigram_bucket(t, buckets) for t in _trigrams("\n".join(self._block_text))}:
+            bm[bucket] = bm.get(bucket, 0) | bit
+        self._block_text = []
+        self.trigram_blocks = block + 1
+
+    def seal(self):
+        self._close_block()
+        self.sealed = True
+        index = {
+            "records": self.records,
+            "size": self.size,
+            "devices": self.devices,
+            "tags": self.tags,
+            "offsets": self.offsets,
+            "min_ts": self.min_ts,
+            "max_ts": self.max_ts,
+            "levels": {str(k): format(v, "x") for k, v in self.level_bm.items()},
+            "tag_bitmaps": {str(k): format(v, "x") for k, v in self.tag_bm.items()},
+            "pids": {str(k): format(v, "x") for k, v in self.pid_bm.items()},
+            "device_bitmaps": {str(k): format(v, "x") for k, v in self.device_bm.items()},
+            "trigram_buckets": self.trigram_buckets if self.trigram_bm is not None else 0,
+            "format": _FORMAT,
+        }
+        if self.trigram_bm is not None:
+            width = (len(self.offsets) + 7) // 8
+            with open(self.path + _TRIGRAM_SUFFIX, "wb") as f:
+                for bucket in range(self.trigram_buckets):
+                    f.write(self.trigram_bm.get(bucket, 0).to_bytes(width, "little"))
+            # Reloaded on the first text query.
+            self.trigram_bm = None
+        tmp = self.path + _INDEX_SUFFIX + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp, self.path + _INDEX_SUFFIX)
+
+    @classmethod
+    def load(cls, path: str) -> "_Segment":
+        with open(path + _INDEX_SUFFIX, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("format") != _FORMAT:
+            raise ValueError(f"unsupported log store format in {path}")
+        segment = cls(path, int(index.get("trigram_buckets", 0)))
+        segment.records = index["records"]
+        segment.size = index["size"]
+        segment.devices = index["devices"]
+        segment.tags = index["tags"]
+        segment._device_ids = {name: i for i, name in enumerate(segment.devices)}
+        segment._tag_ids = {name: i for i, name in enumerate(segment.tags)}
+        segment.offsets = index["offsets"]
+        segment.min_ts = index["min_ts"]
+        segment.max_ts = index["max_ts"]
+        segment.level_bm = {int(k): int(v, 16) for k, v in index["levels"].items()}
+        segment.tag_bm = {int(k): int(v, 16) for k, v in index["tag_bitmaps"].items()}
+        segment.pid_bm = {int(k): int(v, 16) for k, v in index["pids"].items()}
+        segment.device_bm = {int(k): int(v, 16) for k, v in index["device_bitmaps"].items()}
+        segment.trigram_bm = None
+        segment.trigram_blocks = len(segment.offsets) if segment.trigram_buckets else 0
+        segment.sealed = True
+        return segment
+
+    def trigram_bitmaps(self) -> Optional[Dict[int, int]]:
+        if self.trigram_bm is not None or not self.trigram_buckets:
+            return self.trigram_bm
+        try:
+            with open(self.path + _TRIGRAM_SUFFIX, "rb") as f:
+                data = f.read()
+        except OSError:
+            self.trigram_buckets = 0
+            self.trigram_blocks = 0
+            return None
+        width = (len(self.offsets) + 7) // 8
+        self.trigram_bm = {
+            bucket: int.from_bytes(data[bucket * width:(bucket + 1) * width], "little")
+            for bucket in range(self.trigram_buckets)
+        }
+        return self.trigram_bm
+
+    def snapshot(self) -> "_Segment":
+        # Point-in-time copy of an active segment's index so queries run outside the store lock.
+        view = _Segment(self.path, self.trigram_buckets)
+        view.devices = list(self.devices)
+        view.tags = list(self.tags)
+        view._device_ids = dict(self._device_ids)
+        view._tag_ids = dict(self._tag_ids)
+        view.offsets = list(self.offsets)
+        view.min_ts = list(self.min_ts)
+        view.max_ts = list(self.max_ts)
+        view.level_bm = dict(self.level_bm)
+        view.tag_bm = dict(self.tag_bm)
+        view.pid_bm = dict(self.pid_bm)
+        view.device_bm = dict(self.device_bm)
+        view.trigram_bm = dict(self.trigram_bm) if self.trigram_bm is not None else None
+        view.trigram_blocks = self.trigram_blocks
+        view.records = self.records
+        view.size = self.size
+        view.sealed = True
+        return view
+
+    def candidate_blocks(self, devices, tags, min_priority, pids, start, end, text) -> int:
+        nblocks = len(self.offsets)
+        if not nblocks:
+            return 0
+        candidates = (1 << nblocks) - 1
+
+        def union(bitmaps: Dict[int, int], keys: Iterable[int]) -> int:
+            result = 0
+            for key in keys:
+                result |= bitmaps.get(key, 0)
+            return result
+
+        if devices is not None:
+            candidates &= union(self.device_bm, (self._device_ids[d] for d in devices if d in self._device_ids))
+        if tags is not None and candidates:
+            candidates &= union(self.tag_bm, (self._tag_ids[t] for t in tags if t in self._tag_ids))
+        if min_priority and candidates:
+            candidates &= union(self.level_bm, (p for p in self.level_bm if p >= min_priority))
+        if pids is not None and candidates:
+            candidates &= union(self.pid_bm, pids)
+        if text and candidates and self.trigram_buckets:
+            bitmaps = self.trigram_bitmaps()
+            if bitmaps is not None:
+                matched = (1 << self.trigram_blocks) - 1
+                for trigram in _trigrams(text):
+                    matched &= bitmaps.get(_trigram_bucket(trigram, self.trigram_buckets), 0)
+                # Blocks not yet covered by the trigram index (the open block) stay candidates.
+                matched |= ((1 << nblocks) - 1) ^ ((1 << self.trigram_blocks) - 1)
+                candidates &= matched
+        if (start is not None or end is not None) and candidates:
+            lo = float("-inf") if start is None else start
+            hi = float("inf") if end is None else end
+            in_range = 0
+            for block in _bits(candidates):
+                if self.max_ts[block] >= lo and self.min_ts[block] <= hi:
+                    in_range |= 1 << block
+            candidates = in_range
+        return candidates
+
+
+class LogStore:
+
+    SEGMENT_BYTES = 64 * 1024 * 1024
+    BLOCK_RECORDS = 256
+    MAX_BYTES = 4 * 1024 * 1024 * 1024
+    TRIGRAM_BUCKETS = 8192
+    WRITE_BUFFER_BYTES = 1024 * 1024
+
+    def __init__(self, directory: str = LOG_STORE_DIR, trigrams: bool = True, max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.trigram_buckets = self.TRIGRAM_BUCKETS if trigrams else 0
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self._segments: List[_Segment] = []
+        self._active: Optional[_Segment] = None
+        self._file = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._open_existing()
+
+    def _segment_paths(self) -> List[str]:
+        names = set()
+        for name in os.listdir(self.directory):
+            stem, ext = os.path.splitext(name)
+            if ext in (_DATA_SUFFIX, _INDEX_SUFFIX) and stem.startswith("seg-"):
+                names.add(stem)
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    def _open_existing(self):
+        for path in self._segment_paths():
+            try:
+                if os.path.exists(path + _INDEX_SUFFIX):
+                    self._segments.append(_Segment.load(path))
+                else:
+                    segment = self._rebuild(path)
+                    if segment is not None:
+                        self._segments.append(segment)
+            except (OSError, ValueError, KeyError):
+                continue
+
+    def _rebuild(self, path: str) -> Optional[_Segment]:
+        # A data file without an index was the active segment when the app stopped.
+        segment = _Segment(path, self.trigram_buckets)
+        with open(path + _DATA_SUFFIX, "rb") as f:
+            data = f.read()
+        if not data.startswith(_MAGIC):
+            raise ValueError(f"unsupported log store format in {path}")
+        pos = len(_MAGIC)
+        while pos + _RECORD.size <= len(data):
+            kind, ts, pid, tid, priority, device_id, tag_id, length = _RECORD.unpack_from(data, pos)
+            end = pos + _RECORD.size + length
+            if end > len(data):
+                break
+            text = data[pos + _RECORD.size:end].decode("utf-8", errors="replace")
+            if kind != _KIND_ENTRY:
+                segment.define(kind, text)
+            else:
+                segment.index(pos, ts, pid, priority, device_id, tag_id, text, self.BLOCK_RECORDS)
+            pos = end
+        if not segment.records:
+            self._remove_files(path)
+            return None
+        if pos < len(data):
+            with open(path + _DATA_SUFFIX, "r+b") as f:
+                f.truncate(pos)
+        segment.size = pos
+        segment.seal()
+        return segment
+
+    @staticmethod
+    def _remove_files(path: str):
+        for suffix in (_DATA_SUFFIX, _INDEX_SUFFIX, _TRIGRAM_SUFFIX):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+
+    def _next_path(self) -> str:
+        last = 0
+        for segment in self._segments:
+            try:
+                last = max(last, int(os.path.basename(segment.path)[4:]))
+            except ValueError:
+                continue
+        return os.path.join(self.directory, f"seg-{last + 1:08d}")
+
+    def _write(self, segment: _Segment, data: bytes) -> int:
+        offset = segment.size
+        self._file.write(data)
+        segment.size += len(data)
+        return offset
+
+    def _open_active(self) -> _Segment:
+        segment = _Segment(self._next_path(), self.trigram_buckets)
+        self._file = open(segment.data_path, "wb", buffering=self.WRITE_BUFFER_BYTES)
+        self._active = segment
+        self._segments.append(segment)
+        self._write(segment, _MAGIC)
+        return segment
+
+    def _seal_active(self):
+        segment, self._active = self._active, None
+        if segment is None:
+            return
+        self._file.close()
+        self._file = None
+        segment.seal()
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        total = sum(s.size for s in self._segments)
+        while total > self.max_bytes and len(self._segments) > 1 and self._segments[0].sealed:
+            oldest = self._segments.pop(0)
+            total -= oldest.size
+            self._remove_files(oldest.path)
+
+    def append(self, device: str, records: Sequence[LogRecord]):
+        if not records:
+            return
+        pack = _RECORD.pack
+        with self._lock:
+            segment = self._active or self._open_active()
+            if not segment.has_room(device, records[0].tag):
+                self._seal_active()
+                segment = self._open_active()
+            device_id = self._define(segment, _DEFINE_DEVICE, device)
+            for record in records:
+                # Device and tag ids are 16-bit; a segment that would need more rolls over.
+                if segment.size >= self.SEGMENT_BYTES or not segment.has_room(device, record.tag):
+                    self._seal_active()
+                    segment = self._open_active()
+                    device_id = self._define(segment, _DEFINE_DEVICE, device)
+                tag_id = self._define(segment, _DEFINE_TAG, record.tag)
+                message = record.message.encode("utf-8", errors="replace")
+                offset = self._write(segment, pack(_KIND_ENTRY, record.ts, record.pid, record.tid,
+                                                   record.priority & 0xFF, device_id, tag_id, len(message))
+                                     + message)
+                segment.index(offset, record.ts, record.pid, record.priority, device_id, tag_id,
+                              record.message, self.BLOCK_RECORDS)
+
+    def _define(self, segment: _Segment, kind: int, name: str) -> int:
+        ident, new = segment.define(kind, name)
+        if new:
+            encoded = name.encode("utf-8", errors="replace")
+            self._write(segment, _RECORD.pack(kind, 0.0, 0, 0, 0, 0, ident, len(encoded)) + encoded)
+        return ident
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._seal_active()
+
+    def _query_segments(self) -> List[_Segment]:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            return [s.snapshot() if s is self._active else s for s in self._segments]
+
+    def query(self, devices: Optional[Iterable[str]] = None, tags: Optional[Iterable[str]] = None,
+              min_priority: int = 0, pids: Optional[Iterable[int]] = None, start: Optional[float] = None,
+              end: Optional[float] = None, text: Optional[str] = None,
+              limit: Optional[int] = None) -> List[StoredRecord]:
+        devices = set(devices) if devices is not None else None
+        tags = set(tags) if tags is not None else None
+        pids = set(pids) if pids is not None else None
+        needle = text.lower() if text else None
+        results: List[StoredRecord] = []
+        for segment in self._query_segments():
+            seg_start, seg_end = segment.time_range()
+            if (start is not None and seg_end < start) or (end is not None and seg_start > end):
+                continue
+            candidates = segment.candidate_blocks(devices, tags, min_priority, pids, start, end, text)
+            if not candidates:
+                continue
+            device_ids = {segment._device_ids[d] for d in devices if d in segment._device_ids} \
+                if devices is not None else None
+            tag_ids = {segment._tag_ids[t] for t in tags if t in segment._tag_ids} if tags is not None else None
+            try:
+                f = open(segment.data_path, "rb")
+            except OSError:
+                continue
+            with f:
+                for block in _bits(candidates):
+                    begin = segment.offsets[block]
+                    stop = segment.offsets[block + 1] if block + 1 < len(segment.offsets) else segment.size
+                    f.seek(begin)
+                    data = f.read(stop - begin)
+                    pos = 0
+                    while pos + _RECORD.size <= len(data):
+                        kind, ts, pid, tid, priority, device_id, tag_id, length = _RECORD.unpack_from(data, pos)
+                        body = pos + _RECORD.size
+                        pos = body + length
+                        if kind != _KIND_ENTRY or priority < min_priority:
+                            continue
+                        if device_ids is not None and device_id not in device_ids:
+                            continue
+                        if tag_ids is not None and tag_id not in tag_ids:
+                            continue
+                        if pids is not None and pid not in pids:
+                            continue
+                        if (start is not None and ts < start) or (end is not None and ts > end):
+                            continue
+                        message = data[body:pos].decode("utf-8", errors="replace")
+                        if needle is not None and needle not in message.lower():
+                            continue
+                        results.append((segment.devices[device_id],
+                                        LogRecord(ts, pid, tid, priority, segment.tags[tag_id], message)))
+                        if limit is not None and len(results) >= limit:
+                            return results
+        return results
+
+    def devices(self) -> List[str]:
+        with self._lock:
+            return sorted({d for s in self._segments for d in s.devices})
+
+    def latest_ts(self) -> Optional[float]:
+        with self._lock:
+            ends = [max(s.max_ts) for s in self._segments if s.max_ts]
+        return max(ends) if ends else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "records": sum(s.records for s in self._segments),
+                "bytes": sum(s.size for s in self._segments),
+            }
+
+
+_CLOCK_RE = re.compile(r"^(?:(\d{1,2})-(\d{1,2})[ T])?(\d{1,2}):(\d{2})(?::(\d{2})(?:\.(\d{1,3}))?)?$")
+
+
+def parse_clock(text: str, reference: Optional[float] = None) -> float:
+    # "10:02", "10:02:30.5" or "10-17 10:02"; the date defaults to that of `reference`.
+    m = _CLOCK_RE.match(text.strip())
+    if not m:
+        raise ValueError(f"invalid time {text!r}")
+    month, day, hour, minute, second, fraction = m.groups()
+    base = datetime.fromtimestamp(reference if reference is not None else time.time())
+    moment = base.replace(month=int(month) if month else base.month, day=int(day) if day else base.day,
+                          hour=int(hour), minute=int(minute), second=int(second or 0), microsecond=0)
+    return moment.timestamp() + (int(fraction.ljust(3, "0")) / 1000 if fraction else 0.0)
+
+
+def parse_query(text: str, reference: Optional[float] = None) -> dict:
+    # level:E tag:ActivityManager device:SERIAL pid:123 from:10:02 to:10:05 free text...
+    kwargs: dict = {}
+    words: List[str] = []
+    for token in shlex.split(text or ""):
+        key, sep, value = token.partition(":")
+        key = key.lower()
+        if not sep or not value or key not in ("level", "tag", "device", "pid", "from", "to"):
+            words.append(token)
+            continue
+        if key == "level":
+            level = value.strip().upper()[:1]
+            if level not in PRIORITY_BY_LEVEL:
+                raise ValueError(f"invalid level {value!r}")
+            kwargs["min_priority"] = PRIORITY_BY_LEVEL[level]
+        elif key == "tag":
+            kwargs.setdefault("tags", set()).add(value)
+        elif key == "device":
+            kwargs.setdefault("devices", set()).add(value)
+        elif key == "pid":
+            try:
+                kwargs.setdefault("pids", set()).add(int(value))
+            except ValueError:
+                raise ValueError(f"invalid pid {value!r}") from None
+        elif key == "from":
+            kwargs["start"] = parse_clock(value, reference)
+        elif key == "to":
+            kwargs["end"] = parse_clock(value, reference)
+    if words:
+        kwargs["text"] = " ".join(words)
+    return kwargs
+
+
+_store: Optional[LogStore] = None
+_store_lock = threading.Lock()
+
+
+def get_log_store() -> LogStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LogStore()
+        return _store
+
+
+def close_log_store():
+    global _store
+    with _store_lock:
+        store, _store = _store, None
+    if store is not None:
+        store.close()
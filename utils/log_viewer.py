@@ -1,11 +1,25 @@
 import logging
-from PyQt6.QtCore import Qt, QRegularExpression
+import threading
+import time
+from PyQt6.QtCore import Qt, QRegularExpression, pyqtSignal
 from PyQt6.QtGui import QTextCursor, QTextCharFormat, QSyntaxHighlighter, QColor, QTextDocument
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTextEdit, QHBoxLayout, QLineEdit, QPushButton
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTextEdit, QHBoxLayout, QLineEdit, QPushButton, QLabel
+
+from utils.logcat_binary import format_timestamp
+from utils.log_store import parse_query
 
 class LogViewerDialog(QDialog):
-    def __init__(self, log_text, parent=None):
+    QUERY_LIMIT = 100000
+
+    query_finished = pyqtSignal(object, float)
+
+    def __init__(self, log_text, parent=None, store=None):
         super().__init__(parent)
+        # `store` returns the LogStore; it is only called, and the store only opened, on a query thread.
+        self.store = store
+        self.query_input = None
+        self.query_button = None
+        self.query_status = None
         self.prev_button = None
         self.next_button = None
         self.filter_button = None
@@ -29,6 +43,23 @@ class LogViewerDialog(QDialog):
     def init_ui(self):
         layout = QVBoxLayout(self)
 
+        if self.store is not None:
+            query_layout = QHBoxLayout()
+            self.query_input = QLineEdit(self)
+            self.query_input.setPlaceholderText(
+                "Query stored logcat: level:E tag:ActivityManager device:SERIAL pid:123 from:10:02 to:10:05 text…")
+            self.query_input.returnPressed.connect(self.run_query)
+            query_layout.addWidget(self.query_input)
+
+            self.query_button = QPushButton("Query")
+            self.query_button.clicked.connect(self.run_query)
+            query_layout.addWidget(self.query_button)
+            self.query_finished.connect(self.show_query_results)
+            layout.addLayout(query_layout)
+
+            self.query_status = QLabel(self)
+            layout.addWidget(self.query_status)
+
         self.log_viewer = QTextEdit(self)
         self.log_viewer.setReadOnly(True)
         self.log_viewer.setPlainText(self.log_text)
@@ -65,6 +96,43 @@ class LogViewerDialog(QDialog):
 
         layout.addLayout(search_layout)
 
+    def run_query(self):
+        if not self.query_button.isEnabled():
+            return
+        self.query_button.setEnabled(False)
+        self.query_status.setText("Querying…")
+        text = self.query_input.text()
+        threading.Thread(target=self._query_worker, args=(text,), name="log-query", daemon=True).start()
+
+    def _query_worker(self, text):
+        started = time.perf_counter()
+        try:
+            store = self.store()
+            results = store.query(limit=self.QUERY_LIMIT, **parse_query(text, store.latest_ts()))
+        except (ValueError, OSError) as e:
+            results = e
+        self.query_finished.emit(results, (time.perf_counter() - started) * 1000)
+
+    def show_query_results(self, results, elapsed_ms):
+        self.query_button.setEnabled(True)
+        if isinstance(results, ValueError):
+            self.query_status.setText(f"Invalid query: {results}")
+            return
+        if isinstance(results, OSError):
+            self.query_status.setText(f"Log store unavailable: {results}")
+            return
+        self.log_text = "\n".join(
+            f"{format_timestamp(r.ts)} {device} {r.pid:5d} {r.tid:5d} {r.level} {r.tag}: {r.message}"
+            for device, r in results
+        )
+        self.filtered_log_text = self.log_text
+        self.log_viewer.setPlainText(self.log_text)
+        self.highlight_positions = []
+        self.current_highlight_index = -1
+        more = " (limit reached)" if len(results) >= self.QUERY_LIMIT else ""
+        self.query_status.setText(f"{len(results)} lines in {elapsed_ms:.1f} ms{more}")
+        self.update_button_states()
+
     def update_button_states(self):
         has_text = bool(self.search_input.text().strip())
         self.search_button.setEnabled(has_text)
@@ -221,6 +289,6 @@ class LogHighlighter(QSyntaxHighlighter):
                                match.capturedLength(),
                                fmt)
 
-def run_log_viewer(log_text):
-    viewer = LogViewerDialog(log_text)
+def run_log_viewer(log_text, store=None):
+    viewer = LogViewerDialog(log_text, store=store)
     viewer.exec()
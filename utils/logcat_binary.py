@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import re
+import shlex
+import struct
+import time
+from typing import List, Sequence
+
+# struct logger_entry: len, hdr_size (0 on v1), pid, tid, sec, nsec [, lid [, uid]]
+_HEADER = struct.Struct("<HHiIII")
+_V4_HEADER = struct.Struct("<HHiIIII")
+_V1_HEADER_SIZE = 20
+_V4_HEADER_SIZE = 28
+_HEADER_SIZES = (20, 24, 28)
+
+LOG_ID_EVENTS = 2
+LOG_ID_STATS = 5
+LOG_ID_SECURITY = 6
+# These buffers carry binary event payloads, not priority/tag/message text.
+BINARY_LOG_IDS = (LOG_ID_EVENTS, LOG_ID_STATS, LOG_ID_SECURITY)
+
+PRIORITY_VERBOSE = 2
+PRIORITY_DEBUG = 3
+PRIORITY_INFO = 4
+PRIORITY_WARN = 5
+PRIORITY_ERROR = 6
+PRIORITY_FATAL = 7
+
+LEVEL_CHARS = "??VDIWEFS"
+PRIORITY_BY_LEVEL = {c: i for i, c in enumerate(LEVEL_CHARS) if c != "?"}
+
+
+def priority_for_level(level: str) -> int:
+    return PRIORITY_BY_LEVEL.get((level or "V").strip().upper()[:1], PRIORITY_VERBOSE)
+
+
+class LogRecord:
+    __slots__ = ("ts", "pid", "tid", "priority", "tag", "message")
+
+    def __init__(self, ts: float, pid: int, tid: int, priority: int, tag: str, message: str):
+        self.ts = ts
+        self.pid = pid
+        self.tid = tid
+        self.priority = priority
+        self.tag = tag
+        self.message = message
+
+    @property
+    def level(self) -> str:
+        return LEVEL_CHARS[self.priority] if 0 <= self.priority < len(LEVEL_CHARS) else "?"
+
+    def __repr__(self) -> str:
+        return f"LogRecord({self.ts:.3f}, {self.pid}, {self.tid}, {self.level}, {self.tag!r}, {self.message!r})"
+
+
+def format_timestamp(ts: float) -> str:
+    return time.strftime("%m-%d %H:%M:%S", time.localtime(ts)) + f".{int(ts * 1000) % 1000:03d}"
+
+
+def format_threadtime(record: LogRecord) -> str:
+    prefix = f"{format_timestamp(record.ts)} {record.pid:5d} {record.tid:5d} {record.level} {record.tag}: "
+    return "".join(f"{prefix}{line}\n" for line in record.message.split("\n"))
+
+
+_THREADTIME_RE = re.compile(
+    r"^(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)\.(\d{3})\s+(\d+)\s+(\d+) ([VDIWEFS]) (.*?)\s*: ?(.*)$")
+_epoch_cache: dict = {}
+
+
+def _local_epoch(month: int, day: int, hour: int, minute: int, second: int) -> float:
+    key = (month, day, hour, minute, second)
+    epoch = _epoch_cache.get(key)
+    if epoch is None:
+        if len(_epoch_cache) > 4096:
+            _epoch_cache.clear()
+        epoch = _epoch_cache[key] = time.mktime((time.localtime().tm_year, month, day, hour, minute, second,
+                                                 0, 0, -1))
+    return epoch
+
+
+def parse_threadtime(line: str) -> LogRecord:
+    # Text-mode fallback: lines that are not threadtime entries ("--------- beginning of main")
+    # are kept as priority-0 records so nothing is silently dropped.
+    line = line.rstrip("\r\n")
+    m = _THREADTIME_RE.match(line)
+    if not m:
+        return LogRecord(time.time(), 0, 0, 0, "", line)
+    mo, d, h, mi, s, ms, pid, tid, level, tag, message = m.groups()
+    ts = _local_epoch(int(mo), int(d), int(h), int(mi), int(s)) + int(ms) / 1000
+    return LogRecord(ts, int(pid), int(tid), PRIORITY_BY_LEVEL[level], tag, message)
+
+
+class BinaryLogParser:
+
+    def __init__(self, min_priority: int = PRIORITY_VERBOSE):
+        self.min_priority = min_priority
+        self.skipped_bytes = 0
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> List[LogRecord]:
+        buf = self._buf
+        buf += data
+        records: List[LogRecord] = []
+        append = records.append
+        min_priority = self.min_priority
+        end_of_data = len(buf)
+        pos = 0
+        while end_of_data - pos >= _V1_HEADER_SIZE:
+            # _V4_HEADER stops at lid (offset 20..24), which v3 headers carry too.
+            if end_of_data - pos >= _V4_HEADER.size:
+                length, hdr, pid, tid, sec, nsec, lid = _V4_HEADER.unpack_from(buf, pos)
+            else:
+                length, hdr, pid, tid, sec, nsec = _HEADER.unpack_from(buf, pos)
+                lid = 0
+            if hdr != _V4_HEADER_SIZE:
+                if hdr == 0:
+                    hdr, lid = _V1_HEADER_SIZE, 0
+                elif hdr not in _HEADER_SIZES:
+                    # Out of sync (e.g. text noise on the stream): slide forward one byte.
+                    pos += 1
+                    self.skipped_bytes += 1
+                    continue
+            end = pos + hdr + length
+            if end > end_of_data:
+                break
+            start = pos + hdr
+            pos = end
+            if lid in BINARY_LOG_IDS or length < 2:
+                continue
+            priority = buf[start]
+            if priority < min_priority:
+                continue
+            tag, _, message = bytes(buf[start + 1:end]).partition(b"\0")
+            append(LogRecord(sec + nsec / 1e9, pid, tid, priority,
+                             tag.decode("utf-8", "replace"),
+                             message.rstrip(b"\0\n").decode("utf-8", "replace")))
+        del buf[:pos]
+        return records
+
+    def pending(self) -> int:
+        return len(self._buf)
+
+
+def parse_records(data: bytes, min_priority: int = PRIORITY_VERBOSE) -> List[LogRecord]:
+    return BinaryLogParser(min_priority).feed(data)
+
+
+def logcat_command(args: Sequence[str] = ("-B",)) -> str:
+    return " ".join(["logcat"] + [shlex.quote(a) for a in args])
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import re
+import shlex
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.logcat_binary import LogRecord, PRIORITY_BY_LEVEL, PRIORITY_VERBOSE, priority_for_level
+
+LOG_BUFFERS = ("main", "system", "crash", "radio", "events", "kernel", "all", "default")
+# --pid and -e/--regex arrived with Android 7.0 (API 24).
+PID_FILTER_MIN_SDK = 24
+REGEX_FILTER_MIN_SDK = 24
+
+_TAG_SPEC_RE = re.compile(r"^([^\s:]+|\*):([VDIWEFS])$", re.I)
+
+ShellRunner = Callable[[str], str]
+
+
+class LogcatFilterError(ValueError):
+    pass
+
+
+class LogcatFilter:
+
+    def __init__(self, level: str = "V", tags: Optional[Dict[str, str]] = None, pid: Optional[int] = None,
+                 package: Optional[str] = None, regex: Optional[str] = None, buffers: Tuple[str, ...] = ()):
+        self.level = (level or "V").strip().upper()[:1]
+        self.tags = dict(tags or {})
+        self.pid = pid
+        self.package = package
+        self.regex = regex
+        self.buffers = tuple(buffers)
+        if regex:
+            try:
+                re.compile(regex)
+            except re.error as e:
+                raise LogcatFilterError(f"invalid regex {regex!r}: {e}") from e
+
+    @classmethod
+    def parse(cls, text: str, level: str = "V") -> "LogcatFilter":
+        # Same vocabulary as the logcat CLI: "Tag:L" specs, --pid=N, --package=name,
+        # -e/--regex PATTERN, -b/--buffer a,b. A bare word is a tag at the selected level.
+        try:
+            tokens = shlex.split(text or "")
+        except ValueError as e:
+            raise LogcatFilterError(str(e)) from e
+        level = (level or "V").strip().upper()[:1]
+        tags: Dict[str, str] = {}
+        pid = package = regex = None
+        buffers: List[str] = []
+        it = iter(tokens)
+        for token in it:
+            name, eq, value = token.partition("=")
+            if name in ("-e", "--regex", "--pid", "--package", "-b", "--buffer") and not eq:
+                value = next(it, None)
+                if value is None:
+                    raise LogcatFilterError(f"{name} needs a value")
+            if name in ("-e", "--regex"):
+                regex = value
+            elif name == "--pid":
+                try:
+                    pid = int(value)
+                except ValueError:
+                    raise LogcatFilterError(f"invalid pid {value!r}") from None
+            elif name == "--package":
+                package = value
+            elif name in ("-b", "--buffer"):
+                for buf in value.split(","):
+                    if buf not in LOG_BUFFERS:
+                        raise LogcatFilterError(f"unknown log buffer {buf!r}")
+                    if buf not in buffers:
+                        buffers.append(buf)
+            elif token.startswith("-"):
+                raise LogcatFilterError(f"unsupported option {token!r}")
+            else:
+                m = _TAG_SPEC_RE.match(token)
+                if m:
+                    tags[m.group(1)] = m.group(2).upper()
+                elif ":" not in token:
+                    tags[token] = level
+                else:
+                    raise LogcatFilterError(f"invalid filter spec {token!r}")
+        return cls(level, tags, pid, package, regex, tuple(buffers))
+
+    def is_empty(self) -> bool:
+        return not (self.tags or self.pid or self.package or self.regex or self.buffers)
+
+    def needs_target_pid(self) -> bool:
+        return self.pid is None and bool(self.package)
+
+    def needs_text_filtering(self) -> bool:
+        # `logcat -B` dumps entries before tag specs and -e are applied; only the logd-side
+        # selectors (buffers, --pid) reach the device in binary mode.
+        return bool(self.tags or self.regex)
+
+    def filterspecs(self) -> List[str]:
+        if not self.tags:
+            return [f"*:{self.level}"]
+        specs = [f"{tag}:{lvl}" for tag, lvl in self.tags.items()]
+        if "*" not in self.tags:
+            specs.append("*:S")
+        return specs
+
+    def describe(self) -> str:
+        parts = self.filterspecs()
+        if self.package:
+            parts.append(f"--package={self.package}")
+        if self.pid is not None:
+            parts.append(f"--pid={self.pid}")
+        if self.regex:
+            parts.append(f"-e {shlex.quote(self.regex)}")
+        if self.buffers:
+            parts.append(f"-b {','.join(self.buffers)}")
+        return " ".join(parts)
+
+    def resolve(self, shell: ShellRunner) -> "ResolvedFilter":
+        if self.pid is None and not self.package and not self.regex:
+            return ResolvedFilter(self, 0, None)
+        script = "getprop ro.build.version.sdk"
+        if self.needs_target_pid():
+            script += f"; pidof {shlex.quote(self.package)}"
+        try:
+            lines = [line.strip() for line in shell(script).splitlines() if line.strip()]
+        except Exception:
+            lines = []
+        try:
+            sdk = int(lines[0]) if lines else 0
+        except ValueError:
+            sdk = 0
+        pid = self.pid
+        if self.needs_target_pid():
+            pids = lines[1].split() if len(lines) > 1 else []
+            if not pids or not pids[0].isdigit():
+                raise LogcatFilterError(f"package {self.package} is not running")
+            pid = int(pids[0])
+        return ResolvedFilter(self, sdk, pid)
+
+
+class ResolvedFilter:
+    # What the target device can evaluate goes into the logcat arguments; the remainder
+    # is applied to records on this side.
+
+    def __init__(self, spec: LogcatFilter, sdk: int, pid: Optional[int]):
+        self.spec = spec
+        self.sdk = sdk
+        self.pid = pid
+        self.device_pid = pid is not None and sdk >= PID_FILTER_MIN_SDK
+        self.device_regex = bool(spec.regex) and sdk >= REGEX_FILTER_MIN_SDK
+        self._pattern = re.compile(spec.regex) if spec.regex else None
+        self._tag_priorities = {tag: PRIORITY_BY_LEVEL[lvl] for tag, lvl in spec.tags.items()}
+        if spec.tags:
+            self._default_priority = self._tag_priorities.pop("*", PRIORITY_BY_LEVEL["S"])
+        else:
+            self._default_priority = priority_for_level(spec.level)
+
+    @property
+    def min_priority(self) -> int:
+        priorities = list(self._tag_priorities.values()) + [self._default_priority]
+        return max(PRIORITY_VERBOSE, min(priorities))
+
+    def selector_args(self) -> List[str]:
+        args: List[str] = []
+        if self.spec.buffers:
+            args += ["-b", ",".join(self.spec.buffers)]
+        if self.device_pid:
+            args.append(f"--pid={self.pid}")
+        return args
+
+    def text_args(self) -> List[str]:
+        args = self.selector_args()
+        if self.device_regex:
+            args += ["-e", self.spec.regex]
+        return args + self.spec.filterspecs()
+
+    def binary_args(self) -> List[str]:
+        return ["-B"] + self.selector_args()
+
+    def residual(self, binary: bool) -> Optional[Callable[[LogRecord], bool]]:
+        check_pid = self.pid is not None and not self.device_pid
+        check_regex = self._pattern is not None and (binary or not self.device_regex)
+        check_tags = binary and bool(self._tag_priorities or self.spec.tags)
+        if not (check_pid or check_regex or check_tags):
+            return None
+        pid = self.pid
+        search = self._pattern.search if check_regex else None
+        tag_priorities = self._tag_priorities
+        default_priority = self._default_priority
+
+        def accepts(record: LogRecord) -> bool:
+            if check_pid and record.pid != pid:
+                return False
+            if check_tags and record.priority < tag_priorities.get(record.tag, default_priority):
+                return False
+            return search is None or search(record.message) is not None
+        return accepts
@@ -1,45 +1,60 @@
 import subprocess
 from PyQt6.QtCore import QThread, pyqtSignal
 
+from utils.adb_client import AdbError, get_client
+from utils.log_sink import open_log_sink
+from utils.log_store import get_log_store
+from utils.logcat_binary import BinaryLogParser, format_threadtime, logcat_command, parse_threadtime
+from utils.logcat_filter import LogcatFilter, LogcatFilterError
+from utils.output_pipeline import LineBatcher
+from utils.process_flags import creationflags_no_window
+
+_READ_CHUNK = 64 * 1024
+
 
 class LogcatThread(QThread):
-    logcat_output = pyqtSignal(str)
+    logcat_output = pyqtSignal(str, list)
+    logcat_records = pyqtSignal(str, list)
     finished = pyqtSignal(str)
+    capture_error = pyqtSignal(str, str)
 
-    def __init__(self, device: str, log_level: str = "V", output_file: str | None = None):
+    BINARY = True
+
+    def __init__(self, device: str, log_level: str = "V", output_file: str | None = None,
+                 binary: bool | None = None, log_filter: LogcatFilter | None = None, store_logs: bool = False):
         super().__init__()
         self.device = device
         self.log_level = (log_level or "V").strip().upper()
         self.output_file = output_file
+        self.binary = self.BINARY if binary is None else binary
+        self.log_filter = log_filter or LogcatFilter(self.log_level)
+        self.store_logs = store_logs
+        self.log_store = None
         self._running = False
         self._proc: subprocess.Popen | None = None
+        self._stream = None
 
     def run(self):
         self._running = True
 
-        cmd = ["adb", "-s", self.device, "logcat", f"*:{self.log_level}"]
-
         try:
-            self._proc = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                bufsize=1,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
-            )
-
-            if self.output_file:
-                with open(self.output_file, "w", encoding="utf-8", newline="") as f:
-                    for line in self._iter_lines():
-                        f.write(line)
+            try:
+                resolved = self.log_filter.resolve(self._shell)
+            except LogcatFilterError as e:
+                self.logcat_output.emit(self.device, [f"logcat filter: {e}\n"])
+                return
+            if self.store_logs:
+                # First capture opens (and, after a crash, re-indexes) the store here, not on the GUI thread.
+                try:
+                    self.log_store = get_log_store()
+                except OSError as e:
+                    self.logcat_output.emit(self.device, [f"log store unavailable: {e}\n"])
+            if self.binary and not self.log_filter.needs_text_filtering():
+                self._run_binary(resolved)
             else:
-                for line in self._iter_lines():
-                    self.logcat_output.emit(line)
-
+                self._run_text(resolved)
         finally:
+            self._close_stream()
             if self._proc:
                 try:
                     if self._proc.poll() is None:
@@ -54,6 +69,94 @@ class LogcatThread(QThread):
             self._running = False
             self.finished.emit(self.device)
 
+    def _shell(self, script: str) -> str:
+        try:
+            _rc, out = get_client().shell(self.device, script, timeout=5)
+            return out.decode("utf-8", errors="replace")
+        except (AdbError, OSError):
+            pass
+        res = subprocess.run(["adb", "-s", self.device, "shell", script], capture_output=True, text=True,
+                             timeout=5, creationflags=creationflags_no_window())
+        return res.stdout or ""
+
+    def _run_text(self, resolved):
+        cmd = ["adb", "-s", self.device, "logcat"] + resolved.text_args()
+        accepts = resolved.residual(binary=False)
+
+        self._proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=1,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            creationflags=creationflags_no_window()
+        )
+
+        lines = self._iter_lines()
+        if accepts is not None:
+            lines = (line for line in lines if accepts(parse_threadtime(line)))
+        if self.log_store is not None:
+            lines = self._stored_lines(lines)
+        if self.output_file:
+            self._capture(lines, lambda f, line: f.write(line))
+        else:
+            batcher = LineBatcher(lambda lines: self.logcat_output.emit(self.device, lines))
+            for line in lines:
+                batcher.add(line)
+            batcher.flush()
+
+    def _run_binary(self, resolved):
+        command = logcat_command(resolved.binary_args())
+        try:
+            self._stream = get_client().exec_stream(self.device, command)
+        except (AdbError, OSError):
+            self._proc = subprocess.Popen(
+                ["adb", "-s", self.device, "exec-out", command],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                creationflags=creationflags_no_window()
+            )
+        parser = BinaryLogParser(resolved.min_priority)
+        accepts = resolved.residual(binary=True)
+        batches = (parser.feed(chunk) for chunk in self._iter_chunks())
+        if accepts is not None:
+            batches = ([r for r in records if accepts(r)] for records in batches)
+        if self.log_store is not None:
+            batches = self._stored_batches(batches)
+
+        if self.output_file:
+            self._capture(batches, lambda f, records: f.writelines(format_threadtime(r) for r in records))
+        else:
+            batcher = LineBatcher(lambda records: self.logcat_records.emit(self.device, records))
+            for records in batches:
+                batcher.extend(records)
+            batcher.flush()
+
+    def _capture(self, items, write):
+        try:
+            with open_log_sink(self.output_file, self.device) as f:
+                for item in items:
+                    write(f, item)
+        except OSError as e:
+            self.capture_error.emit(self.device, str(e))
+
+    def _stored_lines(self, lines):
+        store_batcher = LineBatcher(
+            lambda batch: self.log_store.append(self.device, [parse_threadtime(line) for line in batch]))
+        try:
+            for line in lines:
+                store_batcher.add(line)
+                yield line
+        finally:
+            store_batcher.flush()
+
+    def _stored_batches(self, batches):
+        for records in batches:
+            self.log_store.append(self.device, records)
+            yield records
+
     def _iter_lines(self):
         if not self._proc or not self._proc.stdout:
             return
@@ -62,10 +165,34 @@ class LogcatThread(QThread):
                 break
             yield line
 
+    def _iter_chunks(self):
+        try:
+            if self._stream is not None:
+                for chunk in self._stream:
+                    if not self._running:
+                        break
+                    yield chunk
+            elif self._proc and self._proc.stdout:
+                while self._running:
+                    chunk = self._proc.stdout.read1(_READ_CHUNK)
+                    if not chunk:
+                        break
+                    yield chunk
+        except (OSError, ValueError):
+            # stop() closes the stream under a blocking read.
+            if self._running:
+                raise
+
+    def _close_stream(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.close()
+
     def stop(self):
         self._running = False
+        self._close_stream()
         if self._proc and self._proc.poll() is None:
             try:
                 self._proc.terminate()
             except Exception:
-                pass
\ No newline at end of file
+                pass
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Callable, Deque, List, Tuple
+
+from PyQt6.QtCore import QObject, QTimer
+from PyQt6.QtGui import QTextBlockFormat, QTextCharFormat, QTextCursor, QTextDocumentFragment
+from PyQt6.QtWidgets import QTextEdit
+
+FLUSH_INTERVAL_S = 0.033
+MAX_BATCH_LINES = 2000
+
+
+class LineBatcher:
+
+    def __init__(self, emit: Callable[[list], None], interval: float = FLUSH_INTERVAL_S,
+                 max_lines: int = MAX_BATCH_LINES):
+        self._emit = emit
+        self._interval = interval
+        self._max_lines = max_lines
+        self._lines: List[str] = []
+        self._first_at = 0.0
+        self._lock = threading.Lock()
+        _flusher.register(self)
+
+    def add(self, line: str):
+        with self._lock:
+            if not self._lines:
+                self._first_at = time.monotonic()
+            self._lines.append(line)
+            if len(self._lines) >= self._max_lines:
+                self._flush_locked()
+
+    def extend(self, lines: list):
+        if not lines:
+            return
+        with self._lock:
+            if not self._lines:
+                self._first_at = time.monotonic()
+            self._lines.extend(lines)
+            if len(self._lines) >= self._max_lines:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def flush_if_due(self, now: float):
+        with self._lock:
+            if self._lines and now - self._first_at >= self._interval:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._lines:
+            lines, self._lines = self._lines, []
+            self._emit(lines)
+
+
+class _BatchFlusher:
+
+    def __init__(self, interval: float = FLUSH_INTERVAL_S):
+        self._interval = interval
+        self._batchers: "weakref.WeakSet[LineBatcher]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def register(self, batcher: LineBatcher):
+        with self._lock:
+            self._batchers.add(batcher)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="output-batch-flusher", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self._interval)
+            now = time.monotonic()
+            with self._lock:
+                batchers = list(self._batchers)
+            for batcher in batchers:
+                try:
+                    batcher.flush_if_due(now)
+                except RuntimeError:
+                    pass
+
+
+_flusher = _BatchFlusher()
+
+
+class OutputModel:
+
+    def __init__(self, max_lines: int = 20000):
+        self.max_lines = max_lines
+        self._lines: Deque[Tuple[str, bool]] = deque(maxlen=max_lines)
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def extend(self, entries: List[Tuple[str, bool]]):
+        overflow = len(self._lines) + len(entries) - self.max_lines
+        if overflow > 0:
+            self.evicted += overflow
+        self._lines.extend(entries)
+
+    def clear(self):
+        self._lines.clear()
+        self.evicted = 0
+
+    def plain_text(self) -> str:
+        return "\n".join(
+            QTextDocumentFragment.fromHtml(text).toPlainText() if html else text
+            for text, html in self._lines
+        )
+
+
+class OutputPipeline(QObject):
+
+    def __init__(self, text_edit: QTextEdit, max_lines: int = 20000, interval_ms: int = 33):
+        super().__init__(text_edit)
+        self._view = text_edit
+        self._view.document().setMaximumBlockCount(max_lines)
+        self.model = OutputModel(max_lines)
+        self._pending: List[Tuple[str, bool]] = []
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def append(self, text: str, html: bool = False):
+        self._pending.append((text, html))
+
+    def extend(self, lines: List[str], html: bool = False):
+        self._pending.extend((line, html) for line in lines)
+
+    def clear(self):
+        self._pending.clear()
+        self.model.clear()
+        self._view.clear()
+
+    def plain_text(self) -> str:
+        self.flush()
+        return self.model.plain_text()
+
+    def flush(self):
+        if not self._pending:
+            return
+        entries, self._pending = self._pending, []
+        self.model.extend(entries)
+        entries = entries[-self.model.max_lines:]
+
+        bar = self._view.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum() - 2
+
+        doc = self._view.document()
+        cursor = QTextCursor(doc)
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.beginEditBlock()
+        first = doc.isEmpty()
+        for text, html in entries:
+            if first:
+                first = False
+            else:
+                cursor.insertBlock(QTextBlockFormat(), QTextCharFormat())
+            if html:
+                cursor.insertHtml(text)
+            else:
+                cursor.setCharFormat(QTextCharFormat())
+                cursor.insertText(text)
+        cursor.endEditBlock()
+
+        if at_bottom:
+            bar.setValue(bar.maximum())
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+ShellRunner = Callable[[str], Tuple[int, str]]
+
+
+def parse_package_list(text: str) -> Dict[str, int]:
+    versions: Dict[str, int] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith("package:"):
+            continue
+        package, version = line[len("package:"):], ""
+        if " versionCode:" in package:
+            package, _, version = package.partition(" versionCode:")
+        try:
+            versions[package.strip()] = int(version.split()[0]) if version.strip() else -1
+        except ValueError:
+            versions[package.strip()] = -1
+    return versions
+
+
+class PackageInventory:
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._devices: Dict[str, Tuple[float, Dict[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    def versions(self, key: str, shell: ShellRunner) -> Optional[Dict[str, int]]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._devices.get(key)
+        if cached and now - cached[0] < self.ttl:
+            return cached[1]
+        rc, out = shell("pm list packages --show-versioncode")
+        if rc != 0 or "package:" not in out:
+            return None
+        versions = parse_package_list(out)
+        with self._lock:
+            self._devices[key] = (now, versions)
+        return versions
+
+    def installed_version(self, key: str, package: str, shell: ShellRunner) -> Optional[int]:
+        versions = self.versions(key, shell)
+        if not versions:
+            return None
+        version = versions.get(package)
+        return version if version is not None and version >= 0 else None
+
+    def record_install(self, key: str, package: str, version_code: int):
+        with self._lock:
+            cached = self._devices.get(key)
+            if cached:
+                cached[1][package] = version_code
+
+    def record_uninstall(self, key: str, package: str):
+        with self._lock:
+            cached = self._devices.get(key)
+            if cached:
+                cached[1].pop(package, None)
+
+    def invalidate(self, key: Optional[str] = None):
+        with self._lock:
+            if key is None:
+                self._devices.clear()
+            else:
+                self._devices.pop(key, None)
+
+
+_inventory: Optional[PackageInventory] = None
+_inventory_lock = threading.Lock()
+
+
+def get_package_inventory() -> PackageInventory:
+    global _inventory
+    with _inventory_lock:
+        if _inventory is None:
+            _inventory = PackageInventory()
+        return _inventory
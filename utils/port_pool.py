@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import socket
+import threading
+from typing import Dict, Optional, Set
+
+LOCAL_PORT_RANGE = (28200, 28999)
+SCRCPY_REMOTE_PORT_RANGE = (27183, 27299)
+
+
+def _bindable(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.bind(("127.0.0.1", port))
+        except OSError:
+            return False
+    return True
+
+
+class PortPool:
+
+    def __init__(self, first: int, last: int, probe: bool = True):
+        if first > last:
+            raise ValueError(f"empty port range {first}-{last}")
+        self.first = first
+        self.last = last
+        self.probe = probe
+        self._leased: Set[int] = set()
+        self._next = first
+        self._lock = threading.Lock()
+
+    def lease(self) -> int:
+        with self._lock:
+            size = self.last - self.first + 1
+            # Round-robin so a just-released port (possibly in TIME_WAIT) is reused last.
+            for _ in range(size):
+                port = self._next
+                self._next = self.first if port >= self.last else port + 1
+                if port in self._leased:
+                    continue
+                if self.probe and not _bindable(port):
+                    continue
+                self._leased.add(port)
+                return port
+        raise RuntimeError(f"no free port in {self.first}-{self.last}")
+
+    def release(self, port: Optional[int]):
+        with self._lock:
+            self._leased.discard(port)
+
+    def leased(self) -> Set[int]:
+        with self._lock:
+            return set(self._leased)
+
+
+_local_pool: Optional[PortPool] = None
+_local_pool_lock = threading.Lock()
+
+
+def get_local_port_pool() -> PortPool:
+    global _local_pool
+    with _local_pool_lock:
+        if _local_pool is None:
+            _local_pool = PortPool(*LOCAL_PORT_RANGE)
+        return _local_pool
+
+
+_remote_pools: Dict[str, PortPool] = {}
+
+
+def get_remote_port_pool(host: str) -> PortPool:
+    # Ports on another machine cannot be probed from here; leases only keep our own users apart.
+    with _local_pool_lock:
+        pool = _remote_pools.get(host)
+        if pool is None:
+            pool = _remote_pools[host] = PortPool(*SCRCPY_REMOTE_PORT_RANGE, probe=False)
+        return pool
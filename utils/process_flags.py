@@ -0,0 +1,8 @@
+import subprocess
+import sys
+
+
+def creationflags_no_window() -> int:
+    if sys.platform.startswith("win"):
+        return getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    return 0
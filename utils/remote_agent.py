@@ -0,0 +1,385 @@
+# Standard library only: this file is also shipped verbatim to the remote host and executed there.
+from __future__ import annotations
+
+import codecs
+import inspect
+import itertools
+import json
+import os
+import queue
+import struct
+import subprocess
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+PROTOCOL = b"adbm-agent 1"
+
+_HEADER = struct.Struct(">IIB")
+_READ_CHUNK = 64 * 1024
+
+FRAME_HELLO = 0
+FRAME_OPEN = 1
+FRAME_CANCEL = 2
+FRAME_STDOUT = 10
+FRAME_STDERR = 11
+FRAME_EXIT = 12
+FRAME_ERROR = 13
+
+BOOTSTRAP = (
+    "import sys;g={'__name__':'adbm_agent'};"
+    "exec(sys.stdin.buffer.read(int(sys.stdin.buffer.readline())),g);g['serve']()"
+)
+
+
+def _read_exact(f, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        data = f.read(n - len(buf))
+        if not data:
+            raise EOFError("agent channel closed")
+        buf += data
+    return buf
+
+
+def read_frame(f) -> Tuple[int, int, bytes]:
+    length, req_id, kind = _HEADER.unpack(_read_exact(f, _HEADER.size))
+    return req_id, kind, _read_exact(f, length) if length else b""
+
+
+class FrameWriter:
+
+    def __init__(self, f):
+        self._f = f
+        self._lock = threading.Lock()
+
+    def send(self, req_id: int, kind: int, payload: bytes = b""):
+        with self._lock:
+            self._f.write(_HEADER.pack(len(payload), req_id, kind) + payload)
+            self._f.flush()
+
+
+# Same as utils.process_flags; kept local because this module runs on hosts without the package.
+def _creationflags_no_window() -> int:
+    if sys.platform.startswith("win"):
+        return getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    return 0
+
+
+def _kill_tree(proc: subprocess.Popen):
+    if proc.poll() is not None:
+        return
+    try:
+        if sys.platform.startswith("win"):
+            subprocess.call(["taskkill", "/T", "/F", "/PID", str(proc.pid)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            creationflags=_creationflags_no_window())
+        else:
+            os.killpg(proc.pid, 9)
+    except OSError:
+        proc.kill()
+
+
+class _AgentServer:
+
+    def __init__(self, rfile, wfile):
+        self._rfile = rfile
+        self._out = FrameWriter(wfile)
+        # None marks a request whose process is not started yet; a cancel for it goes to _cancelled.
+        self._procs: Dict[int, Optional[subprocess.Popen]] = {}
+        self._cancelled: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def _pump(self, req_id: int, stream, kind: int):
+        try:
+            while True:
+                data = stream.read1(_READ_CHUNK) if hasattr(stream, "read1") else stream.read(_READ_CHUNK)
+                if not data:
+                    break
+                self._out.send(req_id, kind, data)
+        except (OSError, ValueError):
+            pass
+
+    def _take_cancel(self, req_id: int) -> bool:
+        with self._lock:
+            if req_id in self._cancelled:
+                self._cancelled.discard(req_id)
+                self._procs.pop(req_id, None)
+                return True
+            return False
+
+    def _run(self, req_id: int, command: str):
+        if self._take_cancel(req_id):
+            self._out.send(req_id, FRAME_EXIT, struct.pack(">i", -9))
+            return
+        try:
+            proc = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, creationflags=_creationflags_no_window(),
+                                    start_new_session=not sys.platform.startswith("win"))
+        except OSError as e:
+            with self._lock:
+                self._procs.pop(req_id, None)
+                self._cancelled.discard(req_id)
+            self._out.send(req_id, FRAME_ERROR, str(e).encode("utf-8"))
+            self._out.send(req_id, FRAME_EXIT, struct.pack(">i", 127))
+            return
+        with self._lock:
+            cancelled = req_id in self._cancelled
+            self._cancelled.discard(req_id)
+            self._procs[req_id] = proc
+        if cancelled:
+            _kill_tree(proc)
+        err = threading.Thread(target=self._pump, args=(req_id, proc.stderr, FRAME_STDERR), daemon=True)
+        err.start()
+        self._pump(req_id, proc.stdout, FRAME_STDOUT)
+        err.join()
+        rc = proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+        with self._lock:
+            self._procs.pop(req_id, None)
+        self._out.send(req_id, FRAME_EXIT, struct.pack(">i", rc))
+
+    def serve(self):
+        self._out.send(0, FRAME_HELLO, PROTOCOL)
+        try:
+            while True:
+                req_id, kind, payload = read_frame(self._rfile)
+                if kind == FRAME_OPEN:
+                    command = json.loads(payload.decode("utf-8"))["command"]
+                    with self._lock:
+                        self._procs[req_id] = None
+                    threading.Thread(target=self._run, args=(req_id, command), daemon=True).start()
+                elif kind == FRAME_CANCEL:
+                    with self._lock:
+                        if req_id in self._procs and self._procs[req_id] is None:
+                            self._cancelled.add(req_id)
+                        proc = self._procs.get(req_id)
+                    if proc is not None:
+                        _kill_tree(proc)
+        except EOFError:
+            pass
+        finally:
+            with self._lock:
+                procs = [proc for proc in self._procs.values() if proc is not None]
+                self._cancelled.update(req_id for req_id, proc in self._procs.items() if proc is None)
+            for proc in procs:
+                _kill_tree(proc)
+
+
+def serve(rfile=None, wfile=None):
+    _AgentServer(rfile or sys.stdin.buffer, wfile or sys.stdout.buffer).serve()
+
+
+class _LineStream:
+
+    def __init__(self):
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+
+    def feed(self, data: bytes):
+        self._pending += self._decoder.decode(data)
+        *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            self._lines.put(line + "\n")
+
+    def close(self):
+        self._pending += self._decoder.decode(b"", final=True)
+        if self._pending:
+            self._lines.put(self._pending)
+            self._pending = ""
+        self._lines.put(None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self._lines.get()
+        if line is None:
+            self._lines.put(None)
+            raise StopIteration
+        return line
+
+    def read(self) -> str:
+        return "".join(self)
+
+
+class AgentProcess:
+
+    def __init__(self, conn: "AgentConnection", req_id: int):
+        self._conn = conn
+        self.req_id = req_id
+        self.stdout = _LineStream()
+        self.returncode: Optional[int] = None
+        self._done = threading.Event()
+
+    def _on_frame(self, kind: int, payload: bytes):
+        if kind in (FRAME_STDOUT, FRAME_STDERR, FRAME_ERROR):
+            self.stdout.feed(payload + (b"\n" if kind == FRAME_ERROR else b""))
+        elif kind == FRAME_EXIT:
+            self._finish(struct.unpack(">i", payload)[0])
+
+    def _finish(self, rc: int):
+        if self._done.is_set():
+            return
+        self.returncode = rc
+        self.stdout.close()
+        self._done.set()
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired(f"agent request {self.req_id}", timeout)
+        return self.returncode
+
+    def communicate(self, timeout: Optional[float] = None) -> Tuple[str, None]:
+        self.wait(timeout)
+        return self.stdout.read(), None
+
+    def kill(self):
+        if not self._done.is_set():
+            self._conn.cancel(self.req_id)
+
+    terminate = kill
+
+
+class AgentConnection:
+
+    def __init__(self, proc: subprocess.Popen, hello_timeout: float = 15.0):
+        self._proc = proc
+        self._out = FrameWriter(proc.stdin)
+        self._ids = itertools.count(1)
+        self._requests: Dict[int, AgentProcess] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._hello = threading.Event()
+        self._reader = threading.Thread(target=self._read_loop, name="remote-agent-reader", daemon=True)
+        source = agent_source()
+        proc.stdin.write(b"%d\n" % len(source) + source)
+        proc.stdin.flush()
+        self._reader.start()
+        if not self._hello.wait(hello_timeout):
+            self.close()
+            raise ConnectionError("remote agent did not start")
+        if self._closed:
+            raise ConnectionError("remote agent exited during start-up")
+
+    @property
+    def alive(self) -> bool:
+        return not self._closed and self._proc.poll() is None
+
+    def _read_loop(self):
+        try:
+            while True:
+                req_id, kind, payload = read_frame(self._proc.stdout)
+                if kind == FRAME_HELLO:
+                    if payload == PROTOCOL:
+                        self._hello.set()
+                    continue
+                with self._lock:
+                    request = self._requests.get(req_id)
+                    if kind == FRAME_EXIT:
+                        self._requests.pop(req_id, None)
+                if request is not None:
+                    request._on_frame(kind, payload)
+        except (EOFError, OSError, ValueError, struct.error):
+            pass
+        finally:
+            self._fail_all()
+
+    def _fail_all(self):
+        with self._lock:
+            self._closed = True
+            pending, self._requests = list(self._requests.values()), {}
+        for request in pending:
+            request._finish(255)
+        self._hello.set()
+
+    def popen(self, command: str) -> AgentProcess:
+        with self._lock:
+            if self._closed:
+                raise ConnectionError("remote agent is not running")
+            request = AgentProcess(self, next(self._ids))
+            self._requests[request.req_id] = request
+        try:
+            self._out.send(request.req_id, FRAME_OPEN, json.dumps({"command": command}).encode("utf-8"))
+        except (OSError, ValueError) as e:
+            self._fail_all()
+            raise ConnectionError(f"remote agent channel failed: {e}") from e
+        return request
+
+    def cancel(self, req_id: int):
+        try:
+            self._out.send(req_id, FRAME_CANCEL)
+        except (OSError, ValueError):
+            self._fail_all()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._requests)
+
+    def close(self):
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.wait(timeout=3)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+        self._fail_all()
+
+
+def agent_source() -> bytes:
+    # Through the module's loader rather than __file__, so zipped and frozen builds that keep the
+    # source still work.
+    try:
+        return inspect.getsource(sys.modules[__name__]).encode("utf-8")
+    except (OSError, TypeError) as e:
+        raise ConnectionError(f"remote agent source is not available: {e}") from e
+
+
+def _discard_launcher(proc: subprocess.Popen):
+    if proc.poll() is None:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+    try:
+        proc.wait(timeout=3)
+    except subprocess.TimeoutExpired:
+        pass
+    for stream in (proc.stdin, proc.stdout, proc.stderr):
+        if stream is not None:
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+def bootstrap_argv(python: str = "python3") -> List[str]:
+    return [python, "-u", "-c", f'"{BOOTSTRAP}"']
+
+
+def start_agent(launcher: Callable[[List[str]], subprocess.Popen], pythons=("python3", "python")) -> AgentConnection:
+    last_error: Optional[Exception] = None
+    for python in pythons:
+        proc = None
+        try:
+            proc = launcher(bootstrap_argv(python))
+            return AgentConnection(proc)
+        except (ConnectionError, OSError) as e:
+            last_error = e
+            if proc is not None:
+                _discard_launcher(proc)
+    raise ConnectionError(f"cannot start remote agent: {last_error}")
+
+
+def spawn_local_agent() -> AgentConnection:
+    def _launch(_argv: List[str]) -> subprocess.Popen:
+        return subprocess.Popen([sys.executable, "-u", "-c", BOOTSTRAP], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, creationflags=_creationflags_no_window())
+    return start_agent(_launch, pythons=(sys.executable,))
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from utils.apk_cache import file_sha256
+from utils.process_flags import creationflags_no_window
+from utils.ssh_exec import scp_command, ssh_popen
+
+REMOTE_CACHE_DIR = "adbm_cache"
+_SHA256_RE = re.compile(r"\b[0-9a-fA-F]{64}\b")
+UPLOAD_POLL_S = 1.0
+
+
+def host_key(cfg: dict) -> str:
+    return f"ssh:{cfg.get('host')}:{cfg.get('port', 22)}"
+
+
+def ssh_run(cfg: dict, remote_argv: list[str], timeout: float = 30.0) -> Tuple[int, str]:
+    proc = ssh_popen(cfg, remote_argv)
+    try:
+        out, _ = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        out, _ = proc.communicate()
+    return proc.returncode, out or ""
+
+
+class RemoteApkStager:
+
+    def __init__(self):
+        self._files: Dict[str, Dict[str, str]] = {}
+        self._windows: Dict[str, bool] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _file_lock(self, host: str, digest: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault((host, digest), threading.Lock())
+
+    def is_windows(self, cfg: dict) -> bool:
+        host = host_key(cfg)
+        with self._lock:
+            cached = self._windows.get(host)
+        if cached is None:
+            _rc, out = ssh_run(cfg, ["echo", "%OS%"])
+            cached = "Windows_NT" in out
+            with self._lock:
+                self._windows[host] = cached
+        return cached
+
+    def _native(self, cfg: dict, path: str) -> str:
+        return path.replace("/", "\\") if self.is_windows(cfg) else path
+
+    def remote_size(self, cfg: dict, path: str) -> Optional[int]:
+        if self.is_windows(cfg):
+            _rc, out = ssh_run(cfg, ["for", "%I", "in", f"({self._native(cfg, path)})", "do", "@echo", "%~zI"])
+        else:
+            # stderr is merged into the output; silence it before the input redirect can fail.
+            _rc, out = ssh_run(cfg, ["wc", "-c", "2>/dev/null", "<", path])
+        for token in out.split():
+            if token.isdigit():
+                return int(token)
+        return None
+
+    def remote_sha256(self, cfg: dict, path: str) -> Optional[str]:
+        if self.is_windows(cfg):
+            rc, out = ssh_run(cfg, ["certutil", "-hashfile", self._native(cfg, path), "SHA256"])
+            # Older certutil prints the digest as space-separated byte pairs.
+            lines = [line.replace(" ", "") for line in out.splitlines()]
+        else:
+            rc, out = ssh_run(cfg, ["sha256sum", "2>/dev/null", "<", path, "||",
+                                    "shasum", "-a", "256", "2>/dev/null", "<", path])
+            lines = out.splitlines()
+        if rc != 0:
+            return None
+        for line in lines:
+            m = _SHA256_RE.search(line)
+            if m:
+                return m.group(0).lower()
+        return None
+
+    def _mkdir(self, cfg: dict):
+        if self.is_windows(cfg):
+            ssh_run(cfg, ["if", "not", "exist", REMOTE_CACHE_DIR, "mkdir", REMOTE_CACHE_DIR])
+        else:
+            ssh_run(cfg, ["mkdir", "-p", REMOTE_CACHE_DIR])
+
+    def _rename(self, cfg: dict, src: str, dst: str) -> bool:
+        if self.is_windows(cfg):
+            rc, _out = ssh_run(cfg, ["move", "/Y", self._native(cfg, src), self._native(cfg, dst)])
+        else:
+            rc, _out = ssh_run(cfg, ["mv", "-f", src, dst])
+        return rc == 0
+
+    def _upload(self, cfg: dict, local_path: str, remote_path: str,
+                cancelled: Optional[Callable[[], bool]],
+                progress: Optional[Callable[[int, int], None]] = None) -> bool:
+        total = os.path.getsize(local_path)
+        next_poll = time.monotonic() + UPLOAD_POLL_S
+        proc = subprocess.Popen(
+            scp_command(cfg, local_path, remote_path),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            creationflags=creationflags_no_window(),
+        )
+        while proc.poll() is None:
+            if cancelled and cancelled():
+                proc.kill()
+                proc.wait()
+                return False
+            if progress and time.monotonic() >= next_poll:
+                # scp reports nothing without a tty; the partial file's size on the host is the progress.
+                sent = self.remote_size(cfg, remote_path)
+                if sent is not None:
+                    progress(min(sent, total), total)
+                next_poll = time.monotonic() + UPLOAD_POLL_S
+            time.sleep(0.2)
+        if proc.returncode == 0 and progress:
+            progress(total, total)
+        return proc.returncode == 0
+
+    def ensure(self, cfg: dict, local_path: str, cancelled: Optional[Callable[[], bool]] = None,
+               progress: Optional[Callable[[int, int], None]] = None) -> Tuple[str, bool]:
+        host = host_key(cfg)
+        digest = file_sha256(local_path)
+        size = os.path.getsize(local_path)
+        remote = f"{REMOTE_CACHE_DIR}/{digest}.apk"
+        with self._file_lock(host, digest):
+            with self._lock:
+                known = self._files.get(host, {}).get(digest)
+            if known:
+                return known, False
+            # The name is the digest, but a stray or damaged file can sit under it; check the content.
+            if self.remote_sha256(cfg, remote) != digest:
+                self._mkdir(cfg)
+                part = remote + ".part"
+                if not self._upload(cfg, local_path, part, cancelled, progress):
+                    raise RuntimeError(f"upload of {os.path.basename(local_path)} to {cfg.get('host')} failed")
+                if not self._rename(cfg, part, remote) or self.remote_size(cfg, remote) != size:
+                    raise RuntimeError(f"cannot finalize {remote} on {cfg.get('host')}")
+                uploaded = True
+            else:
+                uploaded = False
+            with self._lock:
+                self._files.setdefault(host, {})[digest] = remote
+            return remote, uploaded
+
+    def forget(self, cfg: dict):
+        with self._lock:
+            self._files.pop(host_key(cfg), None)
+            self._windows.pop(host_key(cfg), None)
+
+
+_stager: Optional[RemoteApkStager] = None
+_stager_lock = threading.Lock()
+
+
+def get_remote_stager() -> RemoteApkStager:
+    global _stager
+    with _stager_lock:
+        if _stager is None:
+            _stager = RemoteApkStager()
+        return _stager
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional
+
+from PyQt6.QtCore import QObject, QProcess, QProcessEnvironment, QTimer, pyqtSignal
+
+# scrcpy logs these at info level once the window has a renderer / first frame.
+READY_MARKERS = ("texture:", "renderer:")
+RETRYABLE_ERRORS = ("connection refused", "connection reset", "could not connect", "server connection failed")
+
+_OUTPUT_TAIL = 4096
+
+
+class ScrcpyLaunch:
+
+    def __init__(self, device: str, args: List[str], env: Optional[QProcessEnvironment] = None,
+                 prepare: Optional[Callable[["ScrcpyLaunch"], bool]] = None,
+                 cleanup: Optional[Callable[["ScrcpyLaunch"], None]] = None):
+        self.device = device
+        self.args = list(args)
+        self.env = env
+        self.prepare = prepare
+        self.cleanup = cleanup
+        self.attempts = 0
+        self.process: Optional[QProcess] = None
+        self.ready = False
+        self.output = ""
+        self.started_at = 0.0
+        self.data: dict = {}
+
+    def last_line(self) -> str:
+        lines = [line.strip() for line in self.output.splitlines() if line.strip()]
+        return lines[-1] if lines else ""
+
+
+class ScrcpyLauncher(QObject):
+    launch_ready = pyqtSignal(str, float)
+    launch_failed = pyqtSignal(str, str)
+    idle = pyqtSignal()
+    _prepared = pyqtSignal(object, bool)
+
+    MAX_STARTING = 3
+    READY_TIMEOUT_MS = 10000
+    MAX_RETRIES = 2
+    RETRY_BACKOFF_MS = 700
+
+    def __init__(self, scrcpy_path: str, parent=None, max_starting: Optional[int] = None):
+        super().__init__(parent)
+        self.scrcpy_path = scrcpy_path
+        self.max_starting = max_starting or self.MAX_STARTING
+        self._queue: Deque[ScrcpyLaunch] = deque()
+        self._starting: List[ScrcpyLaunch] = []
+        self._running: List[ScrcpyLaunch] = []
+        self._retrying = 0
+        self._busy = False
+        self._closing = False
+        self._prepared.connect(self._on_prepared)
+
+    def submit(self, launch: ScrcpyLaunch):
+        self._closing = False
+        self._queue.append(launch)
+        self._busy = True
+        self._pump()
+
+    def running(self) -> int:
+        return len(self._running)
+
+    def pending(self) -> int:
+        return len(self._queue) + len(self._starting) + self._retrying
+
+    def _pump(self):
+        while self._queue and len(self._starting) < self.max_starting:
+            self._start(self._queue.popleft())
+        self._check_idle()
+
+    def _start(self, launch: ScrcpyLaunch):
+        launch.attempts += 1
+        launch.ready = False
+        launch.output = ""
+        self._starting.append(launch)
+        if launch.prepare is None:
+            self._spawn(launch)
+            return
+        # Preparing can block for seconds (SSH tunnels), so it runs off the GUI thread.
+        threading.Thread(target=self._prepare, args=(launch,), name="scrcpy-prepare", daemon=True).start()
+
+    def _prepare(self, launch: ScrcpyLaunch):
+        try:
+            prepared = launch.prepare(launch)
+        except Exception as e:
+            launch.output = str(e)
+            prepared = False
+        self._prepared.emit(launch, bool(prepared))
+
+    def _on_prepared(self, launch: ScrcpyLaunch, prepared: bool):
+        if launch in self._starting:
+            self._starting.remove(launch)
+        if not prepared:
+            self._fail(launch, launch.last_line() or "cannot prepare scrcpy connection")
+        elif self._closing:
+            self._release(launch)
+            self._check_idle()
+        else:
+            self._starting.append(launch)
+            self._spawn(launch)
+
+    def _spawn(self, launch: ScrcpyLaunch):
+        p = QProcess(self)
+        p.setProgram(self.scrcpy_path)
+        p.setArguments(launch.args)
+        if launch.env is not None:
+            p.setProcessEnvironment(launch.env)
+        p.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+        launch.process = p
+        launch.started_at = time.monotonic()
+
+        p.readyReadStandardOutput.connect(lambda l=launch, proc=p: self._on_output(l, proc))
+        p.finished.connect(lambda code, _status, l=launch, proc=p: self._on_finished(l, proc, code))
+        p.errorOccurred.connect(lambda error, l=launch, proc=p: self._on_error(l, proc, error))
+        QTimer.singleShot(self.READY_TIMEOUT_MS, lambda l=launch, proc=p: self._on_ready_timeout(l, proc))
+        p.start()
+
+    def _on_output(self, launch: ScrcpyLaunch, proc: QProcess):
+        text = bytes(proc.readAllStandardOutput()).decode(errors="ignore")
+        launch.output = (launch.output + text)[-_OUTPUT_TAIL:]
+        if launch.process is proc and not launch.ready and any(m in text.lower() for m in READY_MARKERS):
+            self._mark_ready(launch)
+
+    def _mark_ready(self, launch: ScrcpyLaunch):
+        launch.ready = True
+        if launch in self._starting:
+            self._starting.remove(launch)
+        self._running.append(launch)
+        self.launch_ready.emit(launch.device, time.monotonic() - launch.started_at)
+        self._pump()
+
+    def _on_ready_timeout(self, launch: ScrcpyLaunch, proc: QProcess):
+        # No readiness line (older scrcpy, quiet build): a process still alive by now counts as started.
+        if launch.process is proc and not launch.ready and proc.state() != QProcess.ProcessState.NotRunning:
+            self._mark_ready(launch)
+
+    def _on_error(self, launch: ScrcpyLaunch, proc: QProcess, error):
+        if error == QProcess.ProcessError.FailedToStart:
+            launch.output += f"\nscrcpy failed to start: {proc.errorString()}"
+            self._on_finished(launch, proc, -1)
+
+    def _on_finished(self, launch: ScrcpyLaunch, proc: QProcess, code: int):
+        if launch.process is not proc:
+            return
+        launch.process = None
+        try:
+            launch.output = (launch.output + bytes(proc.readAllStandardOutput()).decode(errors="ignore"))[-_OUTPUT_TAIL:]
+        except RuntimeError:
+            pass
+        proc.deleteLater()
+        if launch in self._starting:
+            self._starting.remove(launch)
+        if launch in self._running:
+            self._running.remove(launch)
+
+        if launch.ready or code == 0 or self._closing:
+            self._release(launch)
+        elif launch.attempts <= self.MAX_RETRIES and self._retryable(launch):
+            self._release(launch)
+            self._retrying += 1
+            QTimer.singleShot(self.RETRY_BACKOFF_MS * launch.attempts, lambda l=launch: self._requeue(l))
+        else:
+            self._fail(launch, launch.last_line() or f"scrcpy exited with code {code}")
+            return
+        self._pump()
+
+    @staticmethod
+    def _retryable(launch: ScrcpyLaunch) -> bool:
+        text = launch.output.lower()
+        return (launch.attempts == 1 and not text.strip()) or any(e in text for e in RETRYABLE_ERRORS)
+
+    def _requeue(self, launch: ScrcpyLaunch):
+        self._retrying -= 1
+        if self._closing:
+            self._check_idle()
+            return
+        self._queue.appendleft(launch)
+        self._pump()
+
+    def _release(self, launch: ScrcpyLaunch):
+        if launch.cleanup is not None:
+            try:
+                launch.cleanup(launch)
+            except Exception:
+                pass
+
+    def _fail(self, launch: ScrcpyLaunch, message: str):
+        self._release(launch)
+        self.launch_failed.emit(launch.device, message)
+        self._pump()
+
+    def _check_idle(self):
+        if self._busy and not self._queue and not self._starting and not self._running and not self._retrying:
+            self._busy = False
+            self.idle.emit()
+
+    def close_all(self):
+        self._closing = True
+        self._queue.clear()
+        for launch in list(self._starting) + list(self._running):
+            proc = launch.process
+            if proc is not None and proc.state() != QProcess.ProcessState.NotRunning:
+                proc.terminate()
+                if not proc.waitForFinished(1500):
+                    proc.kill()
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import queue
+import re
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.process_flags import creationflags_no_window
+
+
+# Programs that print a bounded amount of text and exit. Anything else (logcat, top, monkey,
+# screenrecord, interactive shells, binary output) keeps its own native shell stream.
+ONE_SHOT_PROGRAMS = frozenset({
+    "getprop", "setprop", "settings", "pm", "wm", "input", "svc", "dumpsys", "ps", "pidof", "id",
+    "whoami", "uname", "date", "df", "du", "ls", "stat", "echo", "printf", "grep", "head", "wc",
+    "mkdir", "rm", "rmdir", "mv", "cp", "touch", "chmod", "ln", "getenforce", "ip", "ifconfig",
+    "uptime", "free", "true", "false", "sync", "which",
+})
+_LONG_RUNNING_ARGS = {
+    "am": {"instrument", "monitor", "profile", "trace-ipc"},
+}
+_SEGMENT_SPLIT_RE = re.compile(r"\|\||&&|[|;]")
+
+
+def is_one_shot(command: str) -> bool:
+    for segment in _SEGMENT_SPLIT_RE.split(command):
+        try:
+            words = shlex.split(segment)
+        except ValueError:
+            return False
+        if not words:
+            return False
+        program = words[0].rsplit("/", 1)[-1]
+        if program == "am":
+            if len(words) < 2 or words[1] in _LONG_RUNNING_ARGS["am"] or "-W" in words[2:]:
+                return False
+            continue
+        if program not in ONE_SHOT_PROGRAMS:
+            return False
+    return True
+
+
+class ShellSessionError(RuntimeError):
+    pass
+
+
+class ShellSession:
+
+    def __init__(self, argv: List[str]):
+        self.argv = list(argv)
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        self._lines: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._proc = subprocess.Popen(
+            self.argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+            creationflags=creationflags_no_window(),
+        )
+        self._reader = threading.Thread(target=self._read_loop, name="shell-session-reader", daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        try:
+            for raw in iter(self._proc.stdout.readline, b""):
+                self._lines.put(raw)
+        except (OSError, ValueError):
+            pass
+        self._lines.put(None)
+
+    def alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def run(self, command: str, on_line: Optional[Callable[[str], None]] = None,
+            timeout: Optional[float] = None, cancelled: Optional[Callable[[], bool]] = None) -> int:
+        if not self.alive():
+            raise ShellSessionError("shell session is not running")
+        marker = f"__ADBM_{uuid.uuid4().hex}__"
+        script = f"{{ {command}\n}} </dev/null 2>&1; printf '%s %d\\n' {marker} $?\n"
+        try:
+            self._proc.stdin.write(script.encode("utf-8"))
+            self._proc.stdin.flush()
+        except OSError as e:
+            self.close()
+            raise ShellSessionError(f"shell session closed: {e}") from e
+
+        token = marker.encode("ascii")
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            if cancelled and cancelled():
+                self.close()
+                raise ShellSessionError("cancelled")
+            wait = 0.25
+            if deadline is not None:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    self.close()
+                    raise TimeoutError(f"shell command timed out after {timeout}s")
+                wait = min(wait, left)
+            try:
+                raw = self._lines.get(timeout=wait)
+            except queue.Empty:
+                continue
+            if raw is None:
+                self.close()
+                raise ShellSessionError("shell session exited")
+            idx = raw.find(token)
+            if idx < 0:
+                if on_line:
+                    on_line(raw.decode("utf-8", errors="replace").rstrip("\r\n"))
+                continue
+            if idx > 0 and on_line:
+                on_line(raw[:idx].decode("utf-8", errors="replace"))
+            self.last_used = time.monotonic()
+            try:
+                return int(raw[idx + len(token):].strip() or b"0")
+            except ValueError:
+                return 255
+
+    def close(self):
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        if self._proc.poll() is None:
+            try:
+                self._proc.terminate()
+                self._proc.wait(timeout=2)
+            except (OSError, subprocess.TimeoutExpired):
+                try:
+                    self._proc.kill()
+                except OSError:
+                    pass
+        # Only once the reader has seen EOF; a grandchild may still hold the pipe open.
+        self._reader.join(2)
+        if not self._reader.is_alive():
+            self._proc.stdout.close()
+
+
+class ShellSessionManager:
+
+    def __init__(self, idle_timeout: float = 120.0, max_sessions: int = 256,
+                 shell_argv: Optional[Callable[[str], List[str]]] = None):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._shell_argv = shell_argv or (lambda device: ["adb", "-s", device, "shell"])
+        self._sessions: Dict[str, ShellSession] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _reap_loop(self):
+        interval = max(1.0, self.idle_timeout / 4)
+        while not self._stop.wait(interval):
+            with self._lock:
+                self._evict_idle_locked(time.monotonic())
+
+    def _evict_idle_locked(self, now: float):
+        for device, session in list(self._sessions.items()):
+            idle = now - session.last_used > self.idle_timeout
+            if (idle and not session.lock.locked()) or not session.alive():
+                session.close()
+                del self._sessions[device]
+
+    def _session_for(self, device: str) -> Tuple[ShellSession, bool]:
+        # Returns (session, pooled). At max_sessions only a session nobody is running a command on
+        # is evicted; when all are busy the caller gets a one-shot session it must close itself.
+        with self._lock:
+            self._evict_idle_locked(time.monotonic())
+            session = self._sessions.get(device)
+            if session is None:
+                if len(self._sessions) >= self.max_sessions:
+                    free = [d for d, s in self._sessions.items() if not s.lock.locked()]
+                    if not free:
+                        return ShellSession(self._shell_argv(device)), False
+                    oldest = min(free, key=lambda d: self._sessions[d].last_used)
+                    self._sessions.pop(oldest).close()
+                session = ShellSession(self._shell_argv(device))
+                self._sessions[device] = session
+                if self._reaper is None:
+                    self._stop.clear()
+                    self._reaper = threading.Thread(target=self._reap_loop, name="shell-session-reaper",
+                                                    daemon=True)
+                    self._reaper.start()
+            return session, True
+
+    def run(self, device: str, command: str, on_line: Optional[Callable[[str], None]] = None,
+            timeout: Optional[float] = None, cancelled: Optional[Callable[[], bool]] = None) -> int:
+        for _ in range(2):
+            session, pooled = self._session_for(device)
+            if not pooled:
+                try:
+                    return session.run(command, on_line, timeout, cancelled)
+                finally:
+                    session.close()
+            with session.lock:
+                if session.alive():
+                    return session.run(command, on_line, timeout, cancelled)
+            with self._lock:
+                if self._sessions.get(device) is session:
+                    del self._sessions[device]
+        raise ShellSessionError(f"cannot open a shell session for {device}")
+
+    def close(self, device: str):
+        with self._lock:
+            session = self._sessions.pop(device, None)
+        if session:
+            session.close()
+
+    def close_all(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+            self._stop.set()
+            self._reaper = None
+        for session in sessions:
+            session.close()
+
+
+_manager: Optional[ShellSessionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_session_manager() -> ShellSessionManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ShellSessionManager()
+        return _manager
@@ -4,11 +4,19 @@ from datetime import datetime
 from typing import List
 from PyQt6.QtCore import QThread, pyqtSignal
 from utils.ssh_exec import ssh_popen
+from utils.adb_client import AdbError, iter_lines, native_shell_command
+from utils.adb_forward import adb_popen, forwarded_client
+from utils.output_pipeline import LineBatcher
+from utils.apk_cache import get_staging_cache
+from utils.transfer_scheduler import get_transfer_scheduler
+from utils.remote_staging import get_remote_stager
+from utils.transfer_progress import TransferMeter
 
 class SSHCommandThread(QThread):
     command_finished = pyqtSignal(str, str, bool, float)
-    command_output = pyqtSignal(str)
+    command_output = pyqtSignal(list)
     progress_signal = pyqtSignal(str, int)
+    transfer_progress = pyqtSignal(str, int, int, float)
 
     def __init__(self, ssh_cfg: dict, device: str, command: str, reinstall: bool = False, parent=None):
         super().__init__(parent)
@@ -20,6 +28,7 @@ class SSHCommandThread(QThread):
         self._start_time: datetime | None = None
         self._elapsed_time: float = 0.0
         self._success: bool = False
+        self._output = LineBatcher(self.command_output.emit)
 
     def cancel(self):
         self._requested_cancel = True
@@ -31,9 +40,16 @@ class SSHCommandThread(QThread):
         except ValueError:
             return cmd.split()
 
+    def _emit_output(self, line: str):
+        self._output.add(line)
+
+    def _emit_finished(self, success: bool, elapsed: float):
+        self._output.flush()
+        self.command_finished.emit(self.device, self.command, success, elapsed)
+
     def _emit_error_and_finish(self, message: str):
-        self.command_output.emit(message)
-        self.command_finished.emit(self.device, self.command, False, 0.0)
+        self._emit_output(message)
+        self._emit_finished(False, 0.0)
 
     def run(self):
         try:
@@ -50,8 +66,8 @@ class SSHCommandThread(QThread):
             else:
                 self._handle_generic(self._split_command(self.command))
         except Exception as e:
-            self.command_output.emit(f"ERROR: {e}")
-            self.command_finished.emit(self.device, self.command, False, 0.0)
+            self._emit_output(f"ERROR: {e}")
+            self._emit_finished(False, 0.0)
 
     def _handle_install(self, args: List[str]):
         if not args:
@@ -68,33 +84,86 @@ class SSHCommandThread(QThread):
             self._emit_error_and_finish(f"ERROR: APK file not found: {apk_path}")
             return
 
-        remote_tmp = f"/data/local/tmp/{os.path.basename(apk_path)}"
         self._start_time = datetime.now()
-        push_proc = ssh_popen(self.ssh, ["adb", "-s", self.device, "push", apk_path, remote_tmp])
-        for line in push_proc.stdout:
+        size = os.path.getsize(apk_path)
+        try:
+            remote_tmp = get_staging_cache().lookup(self._cache_key(), apk_path, self._device_shell)
+            if remote_tmp is None:
+                meter = TransferMeter(self._report_transfer)
+                with get_transfer_scheduler().slot(self._link(), self.device) as transfer:
+                    def _uploading(sent: int, total: int):
+                        transfer.update(sent)
+                        meter.update(sent, total)
+                    host_apk, uploaded = get_remote_stager().ensure(
+                        self.ssh, apk_path, cancelled=lambda: self._requested_cancel, progress=_uploading)
+                    if uploaded:
+                        transfer.update(size)
+                        self._emit_output(f"{os.path.basename(apk_path)}: uploaded to {self.ssh.get('host')}:{host_apk}")
+                    else:
+                        self._report_transfer(size, size, 0.0)
+                with get_transfer_scheduler().slot(f"{self._link()}/usb", self.device) as transfer:
+                    remote_tmp, _pushed = get_staging_cache().stage(
+                        self._cache_key(), apk_path, self._device_shell, self._push, source=host_apk)
+                    transfer.update(size)
+            else:
+                self._emit_output(f"{os.path.basename(apk_path)}: already staged on device, push skipped")
+                self._report_transfer(size, size, 0.0)
+        except RuntimeError as e:
             if self._requested_cancel:
-                push_proc.kill(); self._emit_error_and_finish("Cancelled."); return
-            self.command_output.emit(line.strip())
-        push_proc.wait()
+                self._emit_error_and_finish("Cancelled."); return
+            self._emit_error_and_finish(f"ERROR: {e}"); return
+        self.progress_signal.emit(self.device, 50)
 
         reinstall = self._force_reinstall or any(f.lower() == "-r" for f in flags)
         pm = ["adb", "-s", self.device, "shell", "pm", "install"] + (["-r"] if reinstall else []) + [remote_tmp]
-        inst_proc = ssh_popen(self.ssh, pm)
+        inst_proc = adb_popen(self.ssh, pm)
         for line in inst_proc.stdout:
             if self._requested_cancel:
                 inst_proc.kill(); self._emit_error_and_finish("Cancelled."); return
-            self.command_output.emit(line.strip())
+            self._emit_output(line.strip())
             m = re.search(r"(\d+)%", line)
             if m:
                 self.progress_signal.emit(self.device, int(m.group(1)))
         inst_proc.wait()
         self.progress_signal.emit(self.device, 100)
 
-        ssh_popen(self.ssh, ["adb", "-s", self.device, "shell", "rm", "-f", remote_tmp]).wait()
-
         ok = (inst_proc.returncode == 0)
         self._elapsed_time = (datetime.now() - self._start_time).total_seconds()
-        self.command_finished.emit(self.device, self.command, ok, self._elapsed_time)
+        self._emit_finished(ok, self._elapsed_time)
+
+    def _report_transfer(self, sent: int, total: int, rate: float):
+        self.transfer_progress.emit(self.device, sent, total, rate)
+        self.progress_signal.emit(self.device, int(sent * 45 / total) if total else 45)
+
+    def _link(self) -> str:
+        return f"ssh:{self.ssh.get('host')}:{self.ssh.get('port', 22)}"
+
+    def _cache_key(self) -> str:
+        return f"{self._link()}/{self.device}"
+
+    def _device_shell(self, command: str):
+        client = forwarded_client(self.ssh)
+        if client is not None:
+            try:
+                rc, out = client.shell(self.device, command)
+                return rc, out.decode("utf-8", errors="replace")
+            except (AdbError, OSError):
+                pass
+        proc = ssh_popen(self.ssh, ["adb", "-s", self.device, "shell", f'"{command}"'])
+        out = proc.stdout.read()
+        proc.wait()
+        return proc.returncode, out
+
+    def _push(self, local: str, remote: str) -> bool:
+        # `local` is the copy on the SSH host, so this push has to run there.
+        proc = ssh_popen(self.ssh, ["adb", "-s", self.device, "push", local, remote])
+        for line in proc.stdout:
+            if self._requested_cancel:
+                proc.kill(); proc.wait()
+                return False
+            self._emit_output(line.strip())
+        proc.wait()
+        return proc.returncode == 0
 
     def _handle_uninstall(self, args: List[str]):
         if not args:
@@ -105,26 +174,52 @@ class SSHCommandThread(QThread):
         pkg = non_flags[0] if non_flags else ""
         keep = any(f.lower() == "-k" for f in flags)
         cmd = ["adb", "-s", self.device, "uninstall"] + (["-k"] if keep else []) + [pkg]
-        proc = ssh_popen(self.ssh, cmd)
+        proc = adb_popen(self.ssh, cmd)
         out = []
         for line in proc.stdout:
             if self._requested_cancel:
                 proc.kill(); self._emit_error_and_finish("Cancelled."); return
-            out.append(line.strip()); self.command_output.emit(line.strip())
+            out.append(line.strip()); self._emit_output(line.strip())
         proc.wait()
         ok = (proc.returncode == 0)
-        self.command_finished.emit(self.device, self.command, ok, 0.0)
+        self._emit_finished(ok, 0.0)
 
     def _handle_generic(self, argv: List[str]):
         cmd = ["adb", "-s", self.device] + argv
         self._start_time = datetime.now()
-        proc = ssh_popen(self.ssh, cmd)
+        if self._run_forwarded_shell(argv):
+            return
+        proc = adb_popen(self.ssh, cmd)
         for line in proc.stdout:
             if self._requested_cancel:
                 proc.kill(); self._emit_error_and_finish("Cancelled."); return
             s = (line or "").strip()
-            if s: self.command_output.emit(s)
+            if s: self._emit_output(s)
         proc.wait()
         ok = (proc.returncode == 0)
         self._elapsed_time = (datetime.now() - self._start_time).total_seconds()
-        self.command_finished.emit(self.device, self.command, ok, self._elapsed_time)
+        self._emit_finished(ok, self._elapsed_time)
+
+    def _run_forwarded_shell(self, argv: List[str]) -> bool:
+        command = native_shell_command([a.strip('"') for a in argv])
+        client = forwarded_client(self.ssh)
+        if command is None or client is None:
+            return False
+        try:
+            stream = client.shell_stream(self.device, command)
+        except (AdbError, OSError):
+            return False
+        try:
+            for line in iter_lines(stream):
+                if self._requested_cancel:
+                    self._emit_error_and_finish("Cancelled."); return True
+                if line.strip():
+                    self._emit_output(line.strip())
+        except OSError as e:
+            self._emit_output(f"ERROR: {e}")
+        finally:
+            stream.close()
+        ok = (stream.returncode in (None, 0))
+        self._elapsed_time = (datetime.now() - self._start_time).total_seconds()
+        self._emit_finished(ok, self._elapsed_time)
+        return True
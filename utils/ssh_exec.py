@@ -3,11 +3,8 @@ import subprocess
 import sys
 import shutil
 
-
-def _creationflags_no_window() -> int:
-    if sys.platform.startswith("win"):
-        return getattr(subprocess, "CREATE_NO_WINDOW", 0)
-    return 0
+from utils.process_flags import creationflags_no_window
+from utils.remote_agent import AgentConnection, start_agent
 
 
 def _find_plink() -> str:
@@ -23,6 +20,38 @@ def _find_plink() -> str:
     )
 
 
+_mux_args: dict[str, list[str]] = {}
+
+
+def mux_key(cfg: dict) -> str:
+    return f"{(cfg.get('user') or 'admin').strip()}@{cfg.get('host')}:{int(cfg.get('port', 22))}"
+
+
+def set_mux_args(cfg: dict, args: list[str]) -> None:
+    _mux_args[mux_key(cfg)] = list(args)
+
+
+def clear_mux_args(cfg: dict) -> None:
+    _mux_args.pop(mux_key(cfg), None)
+
+
+def mux_args(cfg: dict) -> list[str]:
+    return list(_mux_args.get(mux_key(cfg), ()))
+
+
+def _find_pscp() -> str:
+    base_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+    local = os.path.join(base_dir, "pscp.exe")
+    if os.path.exists(local):
+        return local
+    exe = shutil.which("pscp.exe") or shutil.which("pscp")
+    if exe:
+        return exe
+    raise FileNotFoundError(
+        "Не найден pscp.exe. Положите pscp.exe рядом с программой или добавьте его в PATH."
+    )
+
+
 def _ensure_remote(remote_argv: list[str]) -> str:
     if not remote_argv or not any(part.strip() for part in remote_argv):
         raise ValueError("Пустая удалённая команда: интерактивная SSH/Plink-сессия запрещена.")
@@ -49,6 +78,7 @@ def ssh_command(cfg: dict, remote_argv: list[str]) -> list[str]:
         ]
         if hostkey:
             cmd += ["-hostkey", hostkey]
+        cmd += mux_args(cfg)
         cmd += [host, remote]
         return cmd
 
@@ -60,12 +90,108 @@ def ssh_command(cfg: dict, remote_argv: list[str]) -> list[str]:
         "-o", "BatchMode=yes",
         "-o", "NumberOfPasswordPrompts=0",
         "-o", "ConnectTimeout=10",
+        *mux_args(cfg),
         f"{user}@{host}",
         remote,
     ]
 
 
-def ssh_popen(cfg: dict, remote_argv: list[str]) -> subprocess.Popen:
+def scp_command(cfg: dict, local_path: str, remote_path: str) -> list[str]:
+    host = cfg["host"]
+    port = int(cfg.get("port", 22))
+    user = (cfg.get("user") or "admin").strip()
+    password = (cfg.get("password") or "").strip()
+    hostkey = (cfg.get("hostkey") or "").strip()
+
+    if password:
+        cmd = [_find_pscp(), "-batch", "-C", "-P", str(port), "-l", user, "-pw", password]
+        if hostkey:
+            cmd += ["-hostkey", hostkey]
+        return cmd + [local_path, f"{host}:{remote_path}"]
+
+    return [
+        "scp",
+        "-C",
+        "-P", str(port),
+        "-o", "StrictHostKeyChecking=no",
+        "-o", "UserKnownHostsFile=/dev/null",
+        "-o", "BatchMode=yes",
+        "-o", "ConnectTimeout=10",
+        *mux_args(cfg),
+        local_path,
+        f"{user}@{host}:{remote_path}",
+    ]
+
+
+def forward_command(cfg: dict, forwards: list[tuple[int, str, int]]) -> list[str]:
+    host = cfg["host"]
+    port = int(cfg.get("port", 22))
+    user = (cfg.get("user") or "admin").strip()
+    password = (cfg.get("password") or "").strip()
+    hostkey = (cfg.get("hostkey") or "").strip()
+
+    specs: list[str] = []
+    for local_port, remote_host, remote_port in forwards:
+        specs += ["-L", f"127.0.0.1:{local_port}:{remote_host}:{remote_port}"]
+
+    if password:
+        cmd = [_find_plink(), "-batch", "-N", "-P", str(port), "-l", user, "-pw", password]
+        if hostkey:
+            cmd += ["-hostkey", hostkey]
+        return cmd + mux_args(cfg) + specs + [host]
+
+    return [
+        "ssh", "-N",
+        "-p", str(port),
+        "-o", "StrictHostKeyChecking=no",
+        "-o", "UserKnownHostsFile=/dev/null",
+        "-o", "BatchMode=yes",
+        "-o", "ConnectTimeout=10",
+        "-o", "ExitOnForwardFailure=yes",
+        "-o", "ServerAliveInterval=15",
+        *mux_args(cfg),
+        *specs,
+        f"{user}@{host}",
+    ]
+
+
+_agents: dict[str, AgentConnection] = {}
+
+
+def set_agent(cfg: dict, agent: AgentConnection) -> None:
+    _agents[mux_key(cfg)] = agent
+
+
+def clear_agent(cfg: dict, agent: AgentConnection | None = None) -> None:
+    key = mux_key(cfg)
+    if agent is None or _agents.get(key) is agent:
+        _agents.pop(key, None)
+
+
+def get_agent(cfg: dict) -> AgentConnection | None:
+    agent = _agents.get(mux_key(cfg))
+    return agent if agent is not None and agent.alive else None
+
+
+def start_remote_agent(cfg: dict) -> AgentConnection:
+    def _launch(argv: list[str]) -> subprocess.Popen:
+        return subprocess.Popen(
+            ssh_command(cfg, argv),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            creationflags=creationflags_no_window(),
+        )
+    return start_agent(_launch)
+
+
+def ssh_popen(cfg: dict, remote_argv: list[str]):
+    agent = get_agent(cfg)
+    if agent is not None:
+        try:
+            return agent.popen(_ensure_remote(remote_argv))
+        except ConnectionError:
+            clear_agent(cfg, agent)
     args = ssh_command(cfg, remote_argv)
     return subprocess.Popen(
         args,
@@ -74,5 +200,5 @@ def ssh_popen(cfg: dict, remote_argv: list[str]) -> subprocess.Popen:
         text=True,
         encoding="utf-8",
         errors="replace",
-        creationflags=_creationflags_no_window(),
+        creationflags=creationflags_no_window(),
     )
@@ -1,32 +1,61 @@
+import shlex
+
 from PyQt6.QtCore import QThread, pyqtSignal
+from utils.adb_client import AdbError
+from utils.adb_forward import adb_popen, forwarded_client
+from utils.log_sink import open_log_sink
+from utils.log_store import get_log_store
+from utils.logcat_binary import BinaryLogParser, format_threadtime, logcat_command, parse_threadtime
+from utils.logcat_filter import LogcatFilter, LogcatFilterError
 from utils.ssh_exec import ssh_popen
+from utils.output_pipeline import LineBatcher
 
 class SSHLogcatThread(QThread):
-    logcat_output = pyqtSignal(str)
+    logcat_output = pyqtSignal(str, list)
+    logcat_records = pyqtSignal(str, list)
     finished = pyqtSignal(str)
+    capture_error = pyqtSignal(str, str)
+
+    BINARY = True
 
-    def __init__(self, ssh_cfg: dict, device: str, log_level: str = "V", output_file: str | None = None):
+    def __init__(self, ssh_cfg: dict, device: str, log_level: str = "V", output_file: str | None = None,
+                 binary: bool | None = None, log_filter: LogcatFilter | None = None, store_logs: bool = False):
         super().__init__()
         self.ssh = ssh_cfg
         self.device = device
         self.log_level = (log_level or "V").strip().upper()
         self.output_file = output_file
+        self.binary = self.BINARY if binary is None else binary
+        self.log_filter = log_filter or LogcatFilter(self.log_level)
+        self.store_logs = store_logs
+        self.log_store = None
         self._running = False
         self._proc = None
+        self._stream = None
 
     def run(self):
         self._running = True
-        cmd = ["adb", "-s", self.device, "logcat", f"*:{self.log_level}"]
         try:
-            self._proc = ssh_popen(self.ssh, cmd)
-            if self.output_file:
-                with open(self.output_file, "w", encoding="utf-8", newline="") as f:
-                    for line in self._iter_lines():
-                        f.write(line)
+            try:
+                resolved = self.log_filter.resolve(self._shell)
+            except LogcatFilterError as e:
+                self.logcat_output.emit(self.device, [f"logcat filter: {e}\n"])
+                return
+            if self.store_logs:
+                # First capture opens (and, after a crash, re-indexes) the store here, not on the GUI thread.
+                try:
+                    self.log_store = get_log_store()
+                except OSError as e:
+                    self.logcat_output.emit(self.device, [f"log store unavailable: {e}\n"])
+            # Binary entries need a clean byte stream, which only the forwarded adb socket gives;
+            # over a plain ssh pipe, or when tags/regex must be matched on the device, text stays.
+            if (self.binary and not self.log_filter.needs_text_filtering()
+                    and self._open_stream(resolved)):
+                self._run_binary(resolved)
             else:
-                for line in self._iter_lines():
-                    self.logcat_output.emit(line)
+                self._run_text(resolved)
         finally:
+            self._close_stream()
             try:
                 if self._proc and self._proc.poll() is None:
                     self._proc.terminate()
@@ -40,6 +69,88 @@ class SSHLogcatThread(QThread):
             self._running = False
             self.finished.emit(self.device)
 
+    def _shell(self, script: str) -> str:
+        client = forwarded_client(self.ssh)
+        if client is not None:
+            try:
+                _rc, out = client.shell(self.device, script, timeout=5)
+                return out.decode("utf-8", errors="replace")
+            except (AdbError, OSError):
+                pass
+        proc = ssh_popen(self.ssh, ["adb", "-s", self.device, "shell", f'"{script}"'])
+        try:
+            out, _ = proc.communicate(timeout=10)
+        except Exception:
+            proc.kill()
+            raise
+        return out or ""
+
+    def _open_stream(self, resolved) -> bool:
+        client = forwarded_client(self.ssh)
+        if client is None:
+            return False
+        try:
+            self._stream = client.exec_stream(self.device, logcat_command(resolved.binary_args()))
+        except (AdbError, OSError):
+            return False
+        return True
+
+    def _run_text(self, resolved):
+        args = [shlex.quote(a) for a in resolved.text_args()]
+        self._proc = adb_popen(self.ssh, ["adb", "-s", self.device, "logcat"] + args)
+        accepts = resolved.residual(binary=False)
+        lines = self._iter_lines()
+        if accepts is not None:
+            lines = (line for line in lines if accepts(parse_threadtime(line)))
+        if self.log_store is not None:
+            lines = self._stored_lines(lines)
+        if self.output_file:
+            self._capture(lines, lambda f, line: f.write(line))
+        else:
+            batcher = LineBatcher(lambda lines: self.logcat_output.emit(self.device, lines))
+            for line in lines:
+                batcher.add(line)
+            batcher.flush()
+
+    def _run_binary(self, resolved):
+        parser = BinaryLogParser(resolved.min_priority)
+        accepts = resolved.residual(binary=True)
+        batches = (parser.feed(chunk) for chunk in self._iter_chunks())
+        if accepts is not None:
+            batches = ([r for r in records if accepts(r)] for records in batches)
+        if self.log_store is not None:
+            batches = self._stored_batches(batches)
+        if self.output_file:
+            self._capture(batches, lambda f, records: f.writelines(format_threadtime(r) for r in records))
+        else:
+            batcher = LineBatcher(lambda records: self.logcat_records.emit(self.device, records))
+            for records in batches:
+                batcher.extend(records)
+            batcher.flush()
+
+    def _capture(self, items, write):
+        try:
+            with open_log_sink(self.output_file, self.device) as f:
+                for item in items:
+                    write(f, item)
+        except OSError as e:
+            self.capture_error.emit(self.device, str(e))
+
+    def _stored_lines(self, lines):
+        store_batcher = LineBatcher(
+            lambda batch: self.log_store.append(self.device, [parse_threadtime(line) for line in batch]))
+        try:
+            for line in lines:
+                store_batcher.add(line)
+                yield line
+        finally:
+            store_batcher.flush()
+
+    def _stored_batches(self, batches):
+        for records in batches:
+            self.log_store.append(self.device, records)
+            yield records
+
     def _iter_lines(self):
         if not self._proc or not self._proc.stdout:
             return
@@ -48,8 +159,24 @@ class SSHLogcatThread(QThread):
                 break
             yield line
 
+    def _iter_chunks(self):
+        try:
+            for chunk in self._stream:
+                if not self._running:
+                    break
+                yield chunk
+        except (OSError, ValueError):
+            if self._running:
+                raise
+
+    def _close_stream(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.close()
+
     def stop(self):
         self._running = False
+        self._close_stream()
         if self._proc and self._proc.poll() is None:
             try:
                 self._proc.terminate()
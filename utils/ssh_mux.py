@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from utils.process_flags import creationflags_no_window
+from utils.ssh_exec import _find_plink, mux_key, clear_mux_args, set_mux_args
+
+
+class SshMux:
+
+    HEALTH_INTERVAL_S = 15.0
+    MAX_BACKOFF_S = 60.0
+
+    def __init__(self, cfg: dict):
+        self.cfg = dict(cfg)
+        self.host = self.cfg["host"]
+        self.port = int(self.cfg.get("port", 22))
+        self.user = (self.cfg.get("user") or "admin").strip()
+        self.password = (self.cfg.get("password") or "").strip()
+        self.hostkey = (self.cfg.get("hostkey") or "").strip()
+        digest = hashlib.sha1(mux_key(self.cfg).encode("utf-8")).hexdigest()[:12]
+        self.control_path = os.path.join(tempfile.gettempdir(), f"adbm-{digest}.sock")
+        self.active = False
+        self._proc: Optional[subprocess.Popen] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def supported(self) -> bool:
+        # Windows OpenSSH has no ControlMaster; plink sharing works everywhere.
+        return bool(self.password) or not sys.platform.startswith("win")
+
+    def _master_command(self) -> List[str]:
+        if self.password:
+            cmd = [_find_plink(), "-batch", "-share", "-N", "-P", str(self.port), "-l", self.user,
+                   "-pw", self.password]
+            if self.hostkey:
+                cmd += ["-hostkey", self.hostkey]
+            return cmd + [self.host]
+        return [
+            "ssh", "-M", "-N",
+            "-p", str(self.port),
+            "-o", "StrictHostKeyChecking=no",
+            "-o", "UserKnownHostsFile=/dev/null",
+            "-o", "BatchMode=yes",
+            "-o", "ConnectTimeout=10",
+            "-o", "ServerAliveInterval=15",
+            "-o", "ServerAliveCountMax=3",
+            "-o", "ControlMaster=yes",
+            "-o", "ControlPersist=no",
+            "-o", f"ControlPath={self.control_path}",
+            f"{self.user}@{self.host}",
+        ]
+
+    def _client_args(self) -> List[str]:
+        if self.password:
+            return ["-share"]
+        return ["-o", "ControlMaster=no", "-o", f"ControlPath={self.control_path}"]
+
+    def healthy(self) -> bool:
+        with self._lock:
+            proc = self._proc
+        if proc is None or proc.poll() is not None:
+            return False
+        if self.password:
+            return True
+        try:
+            check = subprocess.run(
+                ["ssh", "-O", "check", "-o", f"ControlPath={self.control_path}", f"{self.user}@{self.host}"],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                timeout=5, creationflags=creationflags_no_window(),
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return check.returncode == 0
+
+    def _spawn(self):
+        self._kill()
+        try:
+            proc = subprocess.Popen(
+                self._master_command(),
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                creationflags=creationflags_no_window(),
+            )
+        except OSError:
+            return
+        with self._lock:
+            self._proc = proc
+
+    def _kill(self):
+        with self._lock:
+            proc, self._proc = self._proc, None
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    def _set_active(self, active: bool):
+        if active == self.active:
+            return
+        self.active = active
+        if active:
+            set_mux_args(self.cfg, self._client_args())
+        else:
+            clear_mux_args(self.cfg)
+
+    def _wait_ready(self, timeout: float) -> bool:
+        if self.password:
+            # plink gives no readiness signal; an upstream that survives auth keeps running.
+            self._stop.wait(1.5)
+            return self.healthy()
+        waited = 0.0
+        while waited < timeout and not self._stop.is_set():
+            if self.healthy():
+                return True
+            with self._lock:
+                proc = self._proc
+            if proc is None or proc.poll() is not None:
+                return False
+            self._stop.wait(0.2)
+            waited += 0.2
+        return False
+
+    def _monitor(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            if self.healthy():
+                self._set_active(True)
+                backoff = 1.0
+                self._stop.wait(self.HEALTH_INTERVAL_S)
+                continue
+            self._set_active(False)
+            self._spawn()
+            if self._wait_ready(15.0):
+                self._set_active(True)
+                continue
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self.MAX_BACKOFF_S)
+
+    def start(self):
+        if not self.supported or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._monitor, name=f"ssh-mux-{self.host}", daemon=True)
+        self._thread.start()
+
+    def reconnect(self):
+        self._set_active(False)
+        self._kill()
+
+    def close(self):
+        self._stop.set()
+        self._set_active(False)
+        self._kill()
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+        if not self.password:
+            try:
+                os.unlink(self.control_path)
+            except OSError:
+                pass
+
+
+_muxes: Dict[str, Tuple[SshMux, int]] = {}
+_muxes_lock = threading.Lock()
+
+
+def acquire_mux(cfg: dict) -> SshMux:
+    key = mux_key(cfg)
+    with _muxes_lock:
+        mux, refs = _muxes.get(key, (None, 0))
+        if mux is None:
+            mux = SshMux(cfg)
+            mux.start()
+        _muxes[key] = (mux, refs + 1)
+        return mux
+
+
+def release_mux(mux: SshMux):
+    key = mux_key(mux.cfg)
+    with _muxes_lock:
+        current, refs = _muxes.get(key, (None, 0))
+        if current is not mux:
+            return
+        if refs > 1:
+            _muxes[key] = (mux, refs - 1)
+            return
+        del _muxes[key]
+    mux.close()
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import socket
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.port_pool import get_local_port_pool
+from utils.process_flags import creationflags_no_window
+from utils.ssh_exec import forward_command, mux_key
+from utils.ssh_mux import SshMux, acquire_mux, release_mux
+
+VIA_MASTER = "master"
+VIA_PROCESS = "process"
+
+
+def _listening(port: int) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+class _Forward:
+
+    def __init__(self, local_port: int, remote_host: str, remote_port: int):
+        self.local_port = local_port
+        self.remote_host = remote_host
+        self.remote_port = remote_port
+        self.refs = 1
+        self.via = VIA_PROCESS
+        self.proc: Optional[subprocess.Popen] = None
+
+    @property
+    def spec(self) -> str:
+        return f"127.0.0.1:{self.local_port}:{self.remote_host}:{self.remote_port}"
+
+
+class TunnelManager:
+
+    READY_TIMEOUT_S = 5.0
+
+    def __init__(self, cfg: dict):
+        self.cfg = dict(cfg)
+        self.mux: SshMux = acquire_mux(self.cfg)
+        self._forwards: Dict[Tuple[str, int], _Forward] = {}
+        self._lock = threading.Lock()
+
+    def _control(self, op: str, forward: _Forward) -> bool:
+        mux = self.mux
+        try:
+            res = subprocess.run(
+                ["ssh", "-O", op, "-o", f"ControlPath={mux.control_path}", "-L", forward.spec,
+                 f"{mux.user}@{mux.host}"],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                timeout=5, creationflags=creationflags_no_window(),
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return res.returncode == 0
+
+    def _start(self, forward: _Forward):
+        # An OpenSSH master takes forwards in place; otherwise a -N process carries it,
+        # riding the shared connection (plink -share / ControlPath) when one is up.
+        if self.mux.active and not self.mux.password and self._control("forward", forward):
+            forward.via = VIA_MASTER
+            return
+        forward.via = VIA_PROCESS
+        forward.proc = subprocess.Popen(
+            forward_command(self.cfg, [(forward.local_port, forward.remote_host, forward.remote_port)]),
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            creationflags=creationflags_no_window(),
+        )
+        deadline = time.monotonic() + self.READY_TIMEOUT_S
+        while time.monotonic() < deadline:
+            if forward.proc.poll() is not None:
+                raise RuntimeError(f"ssh forward to port {forward.remote_port} exited ({forward.proc.returncode})")
+            if _listening(forward.local_port):
+                return
+            time.sleep(0.1)
+        raise RuntimeError(f"ssh forward to port {forward.remote_port} not ready after {self.READY_TIMEOUT_S:.0f}s")
+
+    def _stop(self, forward: _Forward):
+        if forward.via == VIA_MASTER:
+            self._control("cancel", forward)
+        proc, forward.proc = forward.proc, None
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        get_local_port_pool().release(forward.local_port)
+
+    def open(self, remote_port: int, remote_host: str = "127.0.0.1") -> int:
+        key = (remote_host, int(remote_port))
+        with self._lock:
+            forward = self._forwards.get(key)
+            if forward is not None and (forward.proc is None or forward.proc.poll() is None):
+                forward.refs += 1
+                return forward.local_port
+            if forward is not None:
+                self._stop(forward)
+            forward = _Forward(get_local_port_pool().lease(), remote_host, int(remote_port))
+            try:
+                self._start(forward)
+            except BaseException:
+                self._stop(forward)
+                raise
+            self._forwards[key] = forward
+            return forward.local_port
+
+    def close(self, local_port: Optional[int]):
+        with self._lock:
+            for key, forward in list(self._forwards.items()):
+                if forward.local_port != local_port:
+                    continue
+                forward.refs -= 1
+                if forward.refs <= 0:
+                    del self._forwards[key]
+                    self._stop(forward)
+                return
+
+    def forwards(self) -> List[Tuple[int, str, int, str]]:
+        with self._lock:
+            return [(f.local_port, f.remote_host, f.remote_port, f.via) for f in self._forwards.values()]
+
+    def shutdown(self):
+        with self._lock:
+            forwards, self._forwards = list(self._forwards.values()), {}
+        for forward in forwards:
+            self._stop(forward)
+        release_mux(self.mux)
+
+
+_managers: Dict[str, Tuple[TunnelManager, int]] = {}
+_managers_lock = threading.Lock()
+
+
+def acquire_tunnels(cfg: dict) -> TunnelManager:
+    key = mux_key(cfg)
+    with _managers_lock:
+        manager, refs = _managers.get(key, (None, 0))
+        if manager is None:
+            manager = TunnelManager(cfg)
+        _managers[key] = (manager, refs + 1)
+        return manager
+
+
+def release_tunnels(manager: TunnelManager):
+    key = mux_key(manager.cfg)
+    with _managers_lock:
+        current, refs = _managers.get(key, (None, 0))
+        if current is not manager:
+            return
+        if refs > 1:
+            _managers[key] = (manager, refs - 1)
+            return
+        del _managers[key]
+    manager.shutdown()
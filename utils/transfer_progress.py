@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+REPORT_INTERVAL_S = 0.1
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+    return f"{n:.1f} GB"
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class TransferMeter:
+
+    def __init__(self, emit: Callable[[int, int, float], None], interval: float = REPORT_INTERVAL_S,
+                 smoothing: float = 0.3):
+        self._emit = emit
+        self._interval = interval
+        self._smoothing = smoothing
+        self._last_t = time.monotonic()
+        self._last_sent = 0
+        self.rate = 0.0
+
+    def update(self, sent: int, total: int):
+        now = time.monotonic()
+        dt = now - self._last_t
+        if dt < self._interval and sent < total:
+            return
+        if dt > 0:
+            instant = (sent - self._last_sent) / dt
+            self.rate = instant if self.rate == 0.0 else self._smoothing * instant + (1 - self._smoothing) * self.rate
+        self._last_t, self._last_sent = now, sent
+        self._emit(sent, total, self.rate)
+
+
+class FleetProgress:
+
+    def __init__(self):
+        self._devices: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._devices.clear()
+
+    def update(self, device: str, sent: int, total: int, rate: float):
+        with self._lock:
+            self._devices[device] = [sent, total, rate]
+
+    def finish(self, device: str):
+        with self._lock:
+            entry = self._devices.get(device)
+            if entry:
+                entry[0] = entry[1]
+                entry[2] = 0.0
+
+    def device(self, device: str) -> Optional[Tuple[int, int, float]]:
+        with self._lock:
+            entry = self._devices.get(device)
+            return (int(entry[0]), int(entry[1]), entry[2]) if entry else None
+
+    def totals(self) -> Tuple[int, int, float, Optional[float]]:
+        with self._lock:
+            sent = sum(e[0] for e in self._devices.values())
+            total = sum(e[1] for e in self._devices.values())
+            rate = sum(e[2] for e in self._devices.values())
+        eta = (total - sent) / rate if rate > 0 else None
+        return int(sent), int(total), rate, eta
+
+    def summary(self) -> str:
+        sent, total, rate, eta = self.totals()
+        if not total:
+            return ""
+        return (f"{format_bytes(sent)} / {format_bytes(total)} at {format_bytes(rate)}/s, "
+                f"ETA {format_eta(eta)}")
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from utils.job_scheduler import LOCAL_HOST, blocked
+
+
+class TransferHandle:
+
+    def __init__(self, link: "LinkController", device: str):
+        self._link = link
+        self.device = device
+        self.sent = 0
+
+    def update(self, sent: int):
+        delta = sent - self.sent
+        if delta > 0:
+            self.sent = sent
+            self._link.record(self.device, delta)
+
+
+class LinkController:
+
+    ADJUST_PERIOD_S = 2.0
+    GROW_RATIO = 1.05
+    BACKOFF_RATIO = 0.85
+
+    def __init__(self, name: str, initial: int = 2, min_limit: int = 1, max_limit: int = 16):
+        self.name = name
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = min(max(int(initial), self.min_limit), self.max_limit)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._period_start = time.monotonic()
+        self._period_bytes = 0
+        self._saturated = True
+        self._best_rate: Optional[float] = None
+        self.rate = 0.0
+        self._device_bytes: Dict[str, int] = {}
+        self._device_rates: Dict[str, float] = {}
+
+    @contextmanager
+    def slot(self, device: str) -> Iterator[TransferHandle]:
+        with self._cond:
+            if self._active >= self.limit:
+                with blocked():
+                    self._wait_locked()
+            self._active += 1
+        try:
+            yield TransferHandle(self, device)
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._adjust_locked(time.monotonic())
+                self._cond.notify_all()
+
+    def _wait_locked(self):
+        self._waiting += 1
+        try:
+            while self._active >= self.limit:
+                self._cond.wait(0.5)
+                self._adjust_locked(time.monotonic())
+        finally:
+            self._waiting -= 1
+
+    def record(self, device: str, nbytes: int):
+        with self._cond:
+            self._period_bytes += nbytes
+            self._device_bytes[device] = self._device_bytes.get(device, 0) + nbytes
+            if self._active < self.limit or not self._waiting:
+                self._saturated = False
+            self._adjust_locked(time.monotonic())
+
+    def _adjust_locked(self, now: float):
+        elapsed = now - self._period_start
+        if elapsed < self.ADJUST_PERIOD_S:
+            return
+        rate = self._period_bytes / elapsed
+        self.rate = rate
+        self._device_rates = {d: b / elapsed for d, b in self._device_bytes.items()}
+        saturated = self._saturated and self._period_bytes > 0
+        self._period_start, self._period_bytes = now, 0
+        self._device_bytes = {}
+        self._saturated = True
+        if not saturated:
+            return
+        if self._best_rate is None or rate > self._best_rate * self.GROW_RATIO:
+            self._best_rate = rate
+            if self.limit < self.max_limit:
+                self.limit += 1
+                self._cond.notify_all()
+        elif rate < self._best_rate * self.BACKOFF_RATIO:
+            self.limit = max(self.min_limit, self.limit - 1)
+            self._best_rate = rate
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "active": self._active,
+                "waiting": self._waiting,
+                "rate": self.rate,
+                "devices": dict(self._device_rates),
+            }
+
+
+class TransferScheduler:
+
+    def __init__(self, initial: int = 2, max_limit: int = 16):
+        self.initial = initial
+        self.max_limit = max_limit
+        self._links: Dict[str, LinkController] = {}
+        self._lock = threading.Lock()
+
+    def link(self, name: str = LOCAL_HOST) -> LinkController:
+        with self._lock:
+            controller = self._links.get(name)
+            if controller is None:
+                controller = LinkController(name, self.initial, max_limit=self.max_limit)
+                self._links[name] = controller
+            return controller
+
+    def slot(self, link: str, device: str):
+        return self.link(link).slot(device)
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            links = list(self._links.values())
+        return {link.name: link.stats() for link in links}
+
+
+_scheduler: Optional[TransferScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_transfer_scheduler() -> TransferScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = TransferScheduler()
+        return _scheduler